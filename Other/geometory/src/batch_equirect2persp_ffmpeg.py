@@ -1,6 +1,23 @@
 """
 ffmpeg を使って、Equirect 360 画像を複数の直線的パースペクティブ画像に変換するスクリプト
 設定は config.py から読み込む
+
+変換エンジン（config.CONVERT_ENGINE / --engine）:
+    ffmpeg       : 方向ごとに ffmpeg の v360 フィルタを実行（従来どおり）
+    ffmpeg-split : 1フレームにつき ffmpeg を1回だけ起動し、split=N で全方向を出力する
+    remap        : equirect_remap.py（NumPy/OpenCV）で同じ幾何の変換を行う。
+                   各フレームのデコードは1回、座標マップは方向ごとに1回だけ計算する
+
+process_video() は動画から直接（temp/frames を作らずに）全方向の画像を出力する。
+
+差分変換（config.OVERWRITE = False）:
+    出力フォルダのマニフェスト（convert_manifest.py）で、元フレームの内容と
+    v360 パラメータが前回と同じ出力はスキップし、古くなった出力だけを作り直す。
+
+並列実行（config.CONVERT_JOBS / --jobs N）:
+    作業単位（ffmpeg は 画像×方向、ffmpeg-split / remap は画像1枚）を N 並列で処理する。
+    同時に投入する作業単位は config.BATCH_SIZE（None なら N×2）まで。
+    Ctrl-C で中断すると、実行中の ffmpeg もすべて停止する。
 """
 
 import os
@@ -9,10 +26,17 @@ import shutil
 import subprocess
 import argparse
 import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
 
 # config から設定を読み込む
 import config
+from convert_manifest import ConvertManifest, params_fingerprint
+from detection_index import DetectionIndex
+
+ENGINES = ("ffmpeg", "ffmpeg-split", "remap")
+
 
 def ensure_ffmpeg():
     if shutil.which("ffmpeg") is None:
@@ -26,6 +50,29 @@ def parse_args():
         "subdir",
         help="output/<subdir> を生成先にする。例: test_145frames_0min4sec_20260122_211204"
     )
+    p.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default=None,
+        help="変換エンジン（デフォルト: config.CONVERT_ENGINE）"
+    )
+    p.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="並列数（0 = CPU コア数、デフォルト: config.CONVERT_JOBS）"
+    )
+    p.add_argument(
+        "--views",
+        default=None,
+        help="方向の組を計画する: cube / fibonacci / rings / auto（デフォルト: config.VIEW_SET）"
+    )
+    p.add_argument(
+        "--overlap",
+        type=float,
+        default=None,
+        help="--views の方向ごとの重なり率の目標 0-1（デフォルト: config.VIEW_OVERLAP。cube では使わない）"
+    )
     return p.parse_args()
 
 def validate_subdir(subdir: str) -> str:
@@ -77,6 +124,25 @@ def build_transforms_dense(ring_step=None):
     transforms += ring(ring_step, -45)
     return transforms
 
+
+def select_transforms(use_dense_ring, views=None, overlap=None):
+    """
+    変換方向のリストとプリセット名（ファイル名に入る）を返す
+
+    views（なければ config.VIEW_SET）を指定すると、view_planner で FOV と重なり率 overlap から方向の組を計画する
+    """
+    views = views or config.VIEW_SET
+    if views:
+        import view_planner
+
+        transforms, preset_name, stats = view_planner.plan_view_set(views, overlap)
+        print("[情報] 方向の組を計画しました: " + view_planner.describe(preset_name, transforms, stats))
+        return transforms, preset_name
+    if use_dense_ring:
+        return build_transforms_dense(), f"dense{config.RING_STEP_DEG}"
+    return build_transforms_14(), "rc14"
+
+
 def build_v360_options(yaw, pitch, roll):
     """v360フィルタオプションを構築"""
     opts = [
@@ -92,50 +158,350 @@ def build_v360_options(yaw, pitch, roll):
     ]
     return "v360=" + ":".join(opts)
 
-def _convert_images(output_dir, input_dir, transforms, preset_name):
-    """
-    実際の変換処理を実行する共通関数
-    """
+def list_images(input_dir):
+    """変換対象の Equirect 画像（jpg/jpeg/png）をソートして返す"""
     images = []
     images += glob.glob(str(input_dir / "*.jpg"))
     images += glob.glob(str(input_dir / "*.jpeg"))
     images += glob.glob(str(input_dir / "*.png"))
     images.sort()
+    return images
 
-    if not images:
-        raise RuntimeError(f"入力画像が見つかりません: {input_dir}")
 
-    print(f"[情報] 方向数: {len(transforms)}  プリセット: {preset_name}")
+def output_name(base, preset_name, idx, digits, yaw, pitch, roll):
+    """出力ファイル名（全エンジン共通）"""
+    return f"{base}_{preset_name}_{idx:0{digits}d}_yaw{yaw:+d}_pit{pitch:+d}_rol{roll:+d}.jpg"
 
-    for img_path in images:
-        base = os.path.splitext(os.path.basename(img_path))[0]
-        print(f"\n=== {base} ===")
-        digits = len(str(len(transforms)))
 
-        for idx, (yaw, pitch, roll) in enumerate(transforms):
-            out_name = f"{base}_{preset_name}_{idx:0{digits}d}_yaw{yaw:+d}_pit{pitch:+d}_rol{roll:+d}.jpg"
-            out_path = str(output_dir / out_name)
+def plan_views(img_path, output_dir, transforms, preset_name, manifest=None, extra_params=""):
+    """
+    1枚の入力画像について、出力する方向と出力パスのリストを作る
+    manifest を渡した場合（OVERWRITE=False）は、元フレームの内容とパラメータが前回と同じ方向を除く。
+    manifest が None なら全方向（元フレームのハッシュも計算しない）
+    extra_params は v360 以外で出力に影響する設定（出力側の顔ぼかしの枠など）で、フィンガープリントに含める
 
-            if (not config.OVERWRITE) and os.path.exists(out_path):
-                print(f"skip: {out_name}")
+    Returns:
+        list: [(yaw, pitch, roll, out_path), ...]
+    """
+    base = os.path.splitext(os.path.basename(img_path))[0]
+    digits = len(str(len(transforms)))
+    src_hash = manifest.source_hash(img_path) if manifest is not None else None
+    output_dir = str(output_dir)
+    views = []
+    for idx, (yaw, pitch, roll) in enumerate(transforms):
+        out_name = output_name(base, preset_name, idx, digits, yaw, pitch, roll)
+        if manifest is not None:
+            fingerprint = params_fingerprint(build_v360_options(yaw, pitch, roll) + extra_params)
+            if manifest.is_fresh(out_name, src_hash, fingerprint):
                 continue
+        views.append((yaw, pitch, roll, os.path.join(output_dir, out_name)))
+    return views
+
+
+def record_views(manifest, img_path, views, failed, extra_params=""):
+    """変換に成功した出力をマニフェストに記録する"""
+    src_hash = manifest.source_hash(img_path)
+    failed = set(failed)
+    for yaw, pitch, roll, out_path in views:
+        if out_path not in failed:
+            fingerprint = params_fingerprint(build_v360_options(yaw, pitch, roll) + extra_params)
+            manifest.record(os.path.basename(out_path), src_hash, fingerprint)
+
+
+# 実行中の ffmpeg（Ctrl-C で中断したときにまとめて止める）
+_running = set()
+_running_lock = threading.Lock()
+_cancelled = threading.Event()
+
+
+def run_ffmpeg(cmd):
+    """
+    ffmpeg を実行して終了を待つ（subprocess.run(cmd, check=True) 相当）
+
+    実行中のプロセスを登録しておき、kill_running_ffmpeg() で止められるようにする。
+    並列実行時に端末の入力を奪い合わないよう、stdin は閉じておく。
+    """
+    with _running_lock:
+        if _cancelled.is_set():
+            raise RuntimeError("中断されたため ffmpeg を起動しません")
+        proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL)
+        _running.add(proc)
+    try:
+        returncode = proc.wait()
+    except BaseException:
+        proc.kill()
+        proc.wait()
+        raise
+    finally:
+        with _running_lock:
+            _running.discard(proc)
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd)
+
+
+def kill_running_ffmpeg():
+    """実行中の ffmpeg をすべて停止し、以後の起動も止める"""
+    with _running_lock:
+        _cancelled.set()
+        procs = list(_running)
+    for proc in procs:
+        proc.kill()
+
+
+def _render_views_ffmpeg(img_path, views, verbose=True):
+    """ffmpeg エンジン: 方向ごとに ffmpeg を実行する。失敗した出力パスのリストを返す"""
+    failed = []
+    for yaw, pitch, roll, out_path in views:
+        v360 = build_v360_options(yaw, pitch, roll)
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-loglevel", config.FFMPEG_LOGLEVEL,
+            "-i", img_path,
+            "-vf", v360,
+            "-frames:v", "1",
+            out_path
+        ]
+
+        try:
+            run_ffmpeg(cmd)
+            if verbose:
+                print(f" -> {os.path.basename(out_path)}")
+        except subprocess.CalledProcessError as e:
+            if not _cancelled.is_set():
+                print(f" !! 失敗: {os.path.basename(out_path)}  ({e})")
+            failed.append(out_path)
+    return failed
+
+
+def build_split_filter(views):
+    """
+    split=N で入力を分岐し、各分岐に v360 をかける filter_complex を作る
+    出力ラベルは [o0], [o1], ...
+    """
+    n = len(views)
+    chains = ["[0:v]split=" + str(n) + "".join(f"[s{i}]" for i in range(n))]
+    for i, (yaw, pitch, roll) in enumerate(views):
+        chains.append(f"[s{i}]{build_v360_options(yaw, pitch, roll)}[o{i}]")
+    return ";".join(chains)
+
+
+def _render_views_ffmpeg_split(img_path, views, verbose=True):
+    """ffmpeg-split エンジン: 1回の ffmpeg 起動・1回のデコードで全方向を出力する"""
+    cmd = [
+        "ffmpeg", "-y",
+        "-loglevel", config.FFMPEG_LOGLEVEL,
+        "-i", img_path,
+        "-filter_complex", build_split_filter([v[:3] for v in views]),
+    ]
+    for i, (_, _, _, out_path) in enumerate(views):
+        cmd += ["-map", f"[o{i}]", "-frames:v", "1", out_path]
+
+    try:
+        run_ffmpeg(cmd)
+    except subprocess.CalledProcessError as e:
+        if not _cancelled.is_set():
+            print(f" !! 失敗: {os.path.basename(img_path)} の {len(views)} 方向  (終了コード {e.returncode})")
+        return [out_path for _, _, _, out_path in views]
+    if verbose:
+        for _, _, _, out_path in views:
+            print(f" -> {os.path.basename(out_path)}")
+    return []
+
+
+def _render_views_remap(img_path, views, verbose=True, face_boxes=None):
+    """
+    remap エンジン: 1回デコードして全方向を cv2.remap で変換する
 
-            v360 = build_v360_options(yaw, pitch, roll)
-            cmd = [
-                "ffmpeg",
-                "-y" if config.OVERWRITE else "-n",
-                "-loglevel", config.FFMPEG_LOGLEVEL,
-                "-i", img_path,
-                "-vf", v360,
-                "-frames:v", "1",
-                out_path
-            ]
-
-            try:
-                subprocess.run(cmd, check=True)
-                print(f" -> {out_name}")
-            except subprocess.CalledProcessError as e:
-                print(f" !! 失敗: {out_name}  ({e})")
+    face_boxes（Equirect 座標の顔の枠）を渡すと、各方向の出力に枠を変換してぼかす
+    """
+    import equirect_remap
+
+    process = None
+    if face_boxes:
+        from face_blur import apply_blur
+
+        def process(view, yaw, pitch, roll, src_w, src_h):
+            boxes = [equirect_remap.equirect_box_to_view(box, yaw, pitch, roll, src_w, src_h)
+                     for box in face_boxes]
+            apply_blur(view, [box for box in boxes if box is not None], config.BLUR_STRENGTH)
+
+    failed = equirect_remap.render_views(img_path, views, process=process)
+    if verbose:
+        for _, _, _, out_path in views:
+            if out_path not in failed:
+                print(f" -> {os.path.basename(out_path)}")
+    for out_path in failed:
+        print(f" !! 失敗: {os.path.basename(out_path)}")
+    return failed
+
+
+def resolve_jobs(jobs=None):
+    """並列数を決める（None なら config.CONVERT_JOBS、0 なら CPU コア数）"""
+    jobs = config.CONVERT_JOBS if jobs is None else jobs
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    if jobs < 0:
+        raise RuntimeError(f"並列数は 0 以上を指定してください: {jobs}")
+    return jobs
+
+
+def _run_units_parallel(render, units, jobs, on_done=None):
+    """
+    作業単位 [(img_path, views), ...] を jobs 並列で処理する
+    on_done(img_path, views, failed) は作業単位が終わるたびにこのスレッドで呼ばれる
+
+    同時に投入する作業単位は config.BATCH_SIZE（None なら jobs×2）まで。
+    Ctrl-C で中断した場合は実行中の ffmpeg を止め、未着手の作業を取り消してから
+    KeyboardInterrupt を送出する。
+
+    プロセスプールではなくスレッドプールを使う。ffmpeg エンジンの重い処理は別プロセスの ffmpeg で、
+    remap エンジンの cv2.imread / remap / imwrite も GIL を解放するため、スレッドでも CPU を使い切れる。
+    スレッドなら座標マップのキャッシュ（RemapCache）を全スレッドで共有でき、
+    実行中の ffmpeg の登録（Ctrl-C で止める）もプロセス間でやり取りせずに済む。
+
+    Returns:
+        list: 失敗した出力パスのリスト
+    """
+    limit = max(jobs, config.BATCH_SIZE or jobs * 2)
+    total = sum(len(views) for _, views in units)
+    width = len(str(total))
+    done = 0
+    failed = []
+    queue = iter(units)
+    pending = {}
+
+    pool = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        while True:
+            while len(pending) < limit:
+                unit = next(queue, None)
+                if unit is None:
+                    break
+                pending[pool.submit(render, *unit, verbose=False)] = unit
+
+            if not pending:
+                break
+
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                img_path, views = pending.pop(future)
+                try:
+                    unit_failed = future.result()
+                except Exception as e:
+                    print(f" !! 失敗: {os.path.basename(img_path)}  ({e})")
+                    unit_failed = [out_path for _, _, _, out_path in views]
+                failed += unit_failed
+                if on_done is not None:
+                    on_done(img_path, views, unit_failed)
+
+                done += len(views)
+                if len(views) == 1:
+                    label = os.path.basename(views[0][3])
+                else:
+                    label = f"{os.path.splitext(os.path.basename(img_path))[0]} ({len(views)} 方向)"
+                status = "失敗" if unit_failed else "->"
+                print(f"[{done:>{width}}/{total}] {status} {label}")
+    except KeyboardInterrupt:
+        print("\n⚠️  中断します。実行中の ffmpeg を停止しています...")
+        kill_running_ffmpeg()
+        pool.shutdown(wait=True, cancel_futures=True)
+        raise
+    pool.shutdown(wait=True)
+    return failed
+
+
+def _convert_images(output_dir, input_dir, transforms, preset_name, engine=None, jobs=None, blur_faces=False):
+    """
+    実際の変換処理を実行する共通関数
+
+    jobs が 2 以上なら作業単位を並列に処理する（None なら config.CONVERT_JOBS）。
+    blur_faces=True なら入力フォルダの detections.npz の枠を各方向に変換してぼかす（remap エンジンのみ）。
+    失敗した出力は最後にまとめて表示し、RuntimeError を送出する。
+    """
+    engine = engine or config.CONVERT_ENGINE
+    jobs = resolve_jobs(jobs)
+    if engine not in ENGINES:
+        raise RuntimeError(f"不明な変換エンジン: {engine}（{', '.join(ENGINES)} のいずれか）")
+    render = {
+        "ffmpeg": _render_views_ffmpeg,
+        "ffmpeg-split": _render_views_ffmpeg_split,
+        "remap": _render_views_remap,
+    }[engine]
+
+    images = list_images(input_dir)
+
+    if not images:
+        raise RuntimeError(f"入力画像が見つかりません: {input_dir}")
+
+    print(f"[情報] 方向数: {len(transforms)}  プリセット: {preset_name}  エンジン: {engine}  並列数: {jobs}")
+
+    face_boxes = {}
+    if blur_faces:
+        if engine != "remap":
+            raise RuntimeError("出力側の顔ぼかし（--blur-faces）は remap エンジンでのみ使えます（--engine remap）")
+        index = DetectionIndex(input_dir)
+        missing = [p for p in images if os.path.basename(p) not in index]
+        if missing:
+            raise RuntimeError(f"{len(missing)} 枚のフレームに検出結果がありません（先に blur を実行してください）: "
+                               f"{index.path}")
+        face_boxes = {p: index.boxes(os.path.basename(p)) for p in images}
+        print(f"[情報] 出力側で顔をぼかします（{index.path.name}、強さ {config.BLUR_STRENGTH}）")
+
+        def render(img_path, views, verbose=True):
+            return _render_views_remap(img_path, views, verbose, face_boxes[img_path])
+
+    def extra_params(img_path):
+        boxes = face_boxes.get(img_path)
+        # 枠とぼかしの強さが変わった出力だけ作り直す
+        return f"|blur={config.BLUR_STRENGTH}:{[tuple(b[:4]) for b in boxes]}" if boxes else ""
+
+    # OVERWRITE=True ならすべて作り直すので、マニフェストは読みも書きもしない
+    manifest = None if config.OVERWRITE else ConvertManifest(output_dir)
+    planned = [(img_path, plan_views(img_path, output_dir, transforms, preset_name, manifest, extra_params(img_path)))
+               for img_path in images]
+    skipped = len(images) * len(transforms) - sum(len(views) for _, views in planned)
+    if skipped:
+        print(f"[情報] 最新の出力をスキップ: {skipped} 枚（{manifest.path.name}）")
+
+    def on_done(img_path, views, unit_failed):
+        if manifest is not None:
+            record_views(manifest, img_path, views, unit_failed, extra_params(img_path))
+
+    _cancelled.clear()
+    failed = []
+    try:
+        if jobs == 1:
+            for img_path, views in planned:
+                if not views:
+                    continue
+                base = os.path.splitext(os.path.basename(img_path))[0]
+                print(f"\n=== {base} ===")
+
+                view_failed = render(img_path, views)
+                on_done(img_path, views, view_failed)
+                failed += view_failed
+        else:
+            units = []
+            for img_path, views in planned:
+                if engine == "ffmpeg":
+                    # 方向ごとに別の ffmpeg になるので、方向単位で分配する
+                    units += [(img_path, [view]) for view in views]
+                elif views:
+                    # 1回のデコードで全方向を出力するエンジンは画像単位
+                    units.append((img_path, views))
+            print(f"[情報] 作業単位: {len(units)}\n")
+            failed = _run_units_parallel(render, units, jobs, on_done=on_done)
+    finally:
+        # 中断・失敗しても、終わった分は記録して次回スキップできるようにする
+        if manifest is not None:
+            manifest.save()
+
+    if failed:
+        print(f"\n⚠️  {len(failed)} 枚の変換に失敗しました:")
+        for out_path in failed:
+            print(f"  - {os.path.basename(out_path)}")
+        raise RuntimeError(f"{len(failed)} 枚の変換に失敗しました")
 
     print("\n✅ 変換が完了しました。")
 
@@ -154,25 +520,29 @@ def main():
     if not input_dir.is_dir():
         raise RuntimeError("input_dir が存在しません。処理を中断します。")
 
-    ensure_ffmpeg()
+    engine = args.engine or config.CONVERT_ENGINE
+    if engine.startswith("ffmpeg"):
+        ensure_ffmpeg()
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    if config.USE_DENSE_RING:
-        transforms = build_transforms_dense()
-        preset_name = f"dense{config.RING_STEP_DEG}"
-    else:
-        transforms = build_transforms_14()
-        preset_name = "rc14"
+    transforms, preset_name = select_transforms(config.USE_DENSE_RING, args.views, args.overlap)
 
-    _convert_images(output_dir, input_dir, transforms, preset_name)
+    _convert_images(output_dir, input_dir, transforms, preset_name, engine, args.jobs)
 
-def process_frames(subdir: str, use_dense_ring: bool = False):
+def process_frames(subdir: str, use_dense_ring: bool = False, engine: str = None, jobs: int = None,
+                   blur_faces: bool = False, views: str = None, overlap: float = None):
     """
     main.py から呼ばれる用の関数
 
     Args:
         subdir: output/ 配下のサブディレクトリ名
         use_dense_ring: True なら密集度高い変換、False なら標準14方向
+        engine: 変換エンジン "ffmpeg" / "ffmpeg-split" / "remap"（None なら config.CONVERT_ENGINE）
+        jobs: 並列数（None なら config.CONVERT_JOBS、0 なら CPU コア数）
+        blur_faces: True なら detections.npz の枠を各方向の出力でぼかす（remap エンジンのみ）
+        views: 方向の組のレイアウト "cube" / "fibonacci" / "rings" / "auto"（None なら config.VIEW_SET、
+               それも None なら use_dense_ring に従う）
+        overlap: views 指定時の方向ごとの重なり率の目標（None なら config.VIEW_OVERLAP）
     """
     # 一時的に config の設定を上書き
     original_dense = config.USE_DENSE_RING
@@ -187,22 +557,77 @@ def process_frames(subdir: str, use_dense_ring: bool = False):
         if not input_dir.is_dir():
             raise RuntimeError(f"入力フォルダが見つかりません: {input_dir}")
 
-        ensure_ffmpeg()
+        engine = engine or config.CONVERT_ENGINE
+        if engine.startswith("ffmpeg"):
+            ensure_ffmpeg()
         output_dir.mkdir(parents=True, exist_ok=True)
 
-        if config.USE_DENSE_RING:
-            transforms = build_transforms_dense()
-            preset_name = f"dense{config.RING_STEP_DEG}"
-        else:
-            transforms = build_transforms_14()
-            preset_name = "rc14"
+        transforms, preset_name = select_transforms(config.USE_DENSE_RING, views, overlap)
 
-        _convert_images(output_dir, input_dir, transforms, preset_name)
+        _convert_images(output_dir, input_dir, transforms, preset_name, engine, jobs, blur_faces)
 
     finally:
         # 設定を戻す
         config.USE_DENSE_RING = original_dense
 
 
+def process_video(video_path, use_dense_ring=False, interval=1, views=None, overlap=None):
+    """
+    動画から直接パースペクティブ画像を出力する（temp/frames の中間 JPEG を作らない）
+
+    ffmpeg を1回だけ起動し、デコードしたフレームを split=N で各方向の v360 に分岐して、
+    方向ごとに image2 の連番パターンで書き出す。
+    ファイル名は extract → convert の場合と同じ
+    （例: frame_000000_rc14_00_yaw+0_pit+90_rol+0.jpg）。
+
+    Args:
+        video_path: 入力動画のパス
+        use_dense_ring: True なら密集度高い変換、False なら標準14方向
+        interval: Nフレームごとに1フレームだけ変換（連番は extract_frames_interval と同じく保存順）
+        views / overlap: 方向の組の計画（process_frames と同じ）
+
+    Returns:
+        Path: 出力フォルダ（output/<動画名>_<N>frames_..._<タイムスタンプ>）
+    """
+    import cv2
+    from video_frame_extractor import output_folder_name, sampling_mode
+
+    ensure_ffmpeg()
+    video = cv2.VideoCapture(str(video_path))
+    if not video.isOpened():
+        raise RuntimeError(f"動画ファイル '{video_path}' を開けませんでした")
+    fps = video.get(cv2.CAP_PROP_FPS)
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    video.release()
+
+    mode_name, _ = sampling_mode(interval)
+    expected = (total_frames + interval - 1) // interval
+    folder_name = output_folder_name(video_path, total_frames, fps, expected, mode_name)
+    output_dir = config.OUTPUT_DIR / validate_subdir(folder_name)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    transforms, preset_name = select_transforms(use_dense_ring, views, overlap)
+    digits = len(str(len(transforms)))
+    base = f"{config.FRAME_PREFIX}_%06d"
+
+    filter_complex = build_split_filter(transforms)
+    if interval > 1:
+        filter_complex = f"[0:v]select='not(mod(n\\,{interval}))'[sel];" + filter_complex.replace("[0:v]", "[sel]", 1)
+
+    cmd = ["ffmpeg", "-y", "-loglevel", config.FFMPEG_LOGLEVEL, "-i", str(video_path),
+           "-filter_complex", filter_complex]
+    for idx, (yaw, pitch, roll) in enumerate(transforms):
+        pattern = output_name(base, preset_name, idx, digits, yaw, pitch, roll)
+        # fps_mode passthrough: フレームの複製・間引きをせず、デコード順の連番にする
+        cmd += ["-map", f"[o{idx}]", "-fps_mode", "passthrough", "-start_number", "0",
+                "-f", "image2", str(output_dir / pattern)]
+
+    print(f"[情報] 方向数: {len(transforms)}  プリセット: {preset_name}  入力: {video_path}")
+    print(f"[情報] 出力フォルダ: {output_dir}")
+    subprocess.run(cmd, check=True)
+    print("\n✅ 変換が完了しました。")
+    return output_dir
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,794 @@
+"""
+benchmark.py - 各処理の速度比較用スクリプト
+
+使用方法:
+    python benchmark.py extract [--video <path>] [--frames 120] [--width 3840 --height 1920]
+    python benchmark.py sample [--video <path>] [--frames 900] [--every-sec 2]
+    python benchmark.py manifest [--outputs 100000]
+    python benchmark.py stream [--video <path>] [--frames 30] [--blur]
+    python benchmark.py blur [--frames 12] [--width 5760 --height 2880] [--workers N]
+    python benchmark.py detect [--frames 4] [--backends haar,yunet] [--projections equirect,tiles,cube]
+    python benchmark.py detect --images <dir> --labels <labels.csv>
+    python benchmark.py track [--frames 40] [--interval 5]
+    python benchmark.py views [--overlap 0.3] [--views auto]
+    python benchmark.py convert [--frames 5] [--width 3840 --height 1920] [--engines ffmpeg,ffmpeg-split,remap] [--jobs N]
+
+動画を指定しない場合は、一時フォルダに合成動画を作成して計測する。
+"""
+
+import argparse
+import contextlib
+import csv
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+import batch_equirect2persp_ffmpeg as persp
+import config
+import convert_manifest
+import detection_index
+import equirect_remap
+import face_blur
+import face_detect
+import face_track
+import stream_pipeline
+import video_frame_extractor
+import view_planner
+
+
+def make_synthetic_video(path, frames, width, height, fps=30):
+    """
+    計測用の合成動画（ノイズ + 動くグラデーション）を作成する
+    JPEG のエンコード負荷が実写に近くなるよう、適度に細かい模様を入れる
+    """
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"合成動画を作成できません: {path}")
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 64, size=(height, width, 3), dtype=np.uint8)
+    xs = np.linspace(0, 255, width, dtype=np.float32)
+    for i in range(frames):
+        grad = ((xs + i * 8) % 256).astype(np.uint8)
+        frame = noise.copy()
+        frame[:, :, 1] += grad[None, :] // 2
+        frame = cv2.GaussianBlur(frame, (3, 3), 0)
+        writer.write(frame)
+    writer.release()
+
+
+def _legacy_extract(video_path, output_folder, prefix, extension):
+    """変更前の extract_frames と同じ逐次ループ（デコード → imwrite を1スレッドで）"""
+    video = cv2.VideoCapture(str(video_path))
+    frame_count = 0
+    while True:
+        ret, frame = video.read()
+        if not ret:
+            break
+        cv2.imwrite(os.path.join(output_folder, f"{prefix}_{frame_count:06d}.{extension}"), frame)
+        frame_count += 1
+    video.release()
+    return frame_count
+
+
+def _read_outputs(folder):
+    return {p.name: p.read_bytes() for p in sorted(Path(folder).iterdir())}
+
+
+def bench_extract(args):
+    with tempfile.TemporaryDirectory(prefix="geometory-bench-") as tmp:
+        tmp = Path(tmp)
+        if args.video:
+            video_path = Path(args.video)
+        else:
+            video_path = tmp / "synthetic.avi"
+            print(f"合成動画を作成中: {args.frames} フレーム, {args.width}x{args.height}")
+            make_synthetic_video(video_path, args.frames, args.width, args.height)
+
+        prefix, extension = config.FRAME_PREFIX, config.FRAME_EXTENSION
+
+        legacy_dir = tmp / "legacy"
+        legacy_dir.mkdir()
+        t0 = time.perf_counter()
+        n = _legacy_extract(video_path, str(legacy_dir), prefix, extension)
+        legacy_sec = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        out_dir = video_frame_extractor.extract_frames(
+            str(video_path), str(tmp / "pipelined"), prefix, extension, workers=args.workers
+        )
+        pipelined_sec = time.perf_counter() - t0
+
+        same = _read_outputs(legacy_dir) == _read_outputs(out_dir)
+        workers = args.workers or config.EXTRACT_WORKERS or os.cpu_count()
+        print(f"\n[結果] {n} フレーム")
+        print(f"  - 逐次ループ（変更前）     : {n / legacy_sec:7.1f} fps ({legacy_sec:.2f}s)")
+        print(f"  - パイプライン ({workers} workers): {n / pipelined_sec:7.1f} fps ({pipelined_sec:.2f}s)")
+        print(f"出力の一致（ファイル名・内容）: {'OK' if same else 'NG'}")
+        return 0 if same else 1
+
+
+def _legacy_interval(video_path, indices):
+    """変更前の extract_frames_interval と同じく、全フレームを read() して間引く"""
+    wanted = set(indices)
+    video = cv2.VideoCapture(str(video_path))
+    frames = {}
+    frame_count = 0
+    while True:
+        ret, frame = video.read()
+        if not ret:
+            break
+        if frame_count in wanted:
+            frames[frame_count] = frame
+        frame_count += 1
+    video.release()
+    return frames
+
+
+def bench_sample(args):
+    with tempfile.TemporaryDirectory(prefix="geometory-bench-") as tmp:
+        if args.video:
+            video_path = Path(args.video)
+        else:
+            video_path = Path(tmp) / "synthetic.mp4"
+            print(f"合成動画を作成中: {args.frames} フレーム, {args.width}x{args.height}")
+            writer = cv2.VideoWriter(str(video_path), cv2.VideoWriter_fourcc(*"mp4v"), 30,
+                                     (args.width, args.height))
+            rng = np.random.default_rng(0)
+            base = rng.integers(0, 255, size=(args.height, args.width, 3), dtype=np.uint8)
+            for i in range(args.frames):
+                writer.write(np.roll(base, i * 4, axis=1))
+            writer.release()
+
+        video = cv2.VideoCapture(str(video_path))
+        fps = video.get(cv2.CAP_PROP_FPS)
+        total = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = video_frame_extractor._sample_frame_indices(total, fps, every_sec=args.every_sec)
+
+        t0 = time.perf_counter()
+        sparse = dict(video_frame_extractor.iter_frames_at(video, indices, fps))
+        sparse_sec = time.perf_counter() - t0
+        video.release()
+
+        t0 = time.perf_counter()
+        legacy = _legacy_interval(video_path, indices)
+        legacy_sec = time.perf_counter() - t0
+
+        same = sparse.keys() == legacy.keys() and all(
+            np.array_equal(sparse[i], legacy[i]) for i in legacy
+        )
+        print(f"\n[結果] {total} フレーム中 {len(indices)} フレーム（{args.every_sec:g}秒ごと）")
+        print(f"  - 全フレーム read（変更前）: {legacy_sec:.2f}s")
+        print(f"  - grab/シーク            : {sparse_sec:.2f}s ({legacy_sec / sparse_sec:.1f}x)")
+        print(f"抽出フレームの一致: {'OK' if same else 'NG'}")
+        return 0 if same else 1
+
+
+def make_synthetic_equirect(width, height, seed=0):
+    """格子線・グラデーション・ランダムなブロックを含む合成 Equirect 画像"""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 255, size=(16, 32, 3), dtype=np.uint8)
+    image = cv2.resize(blocks, (width, height), interpolation=cv2.INTER_NEAREST)
+    image[:, :, 0] = (np.linspace(0, 255, width)[None, :] * 0.5 + image[:, :, 0] * 0.5).astype(np.uint8)
+    step = max(8, width // 64)
+    image[:, ::step] = 255
+    image[::step, :] = 255
+    return cv2.GaussianBlur(image, (3, 3), 0)
+
+
+def _psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def check_remap_against_ffmpeg(image_path, transforms, tmp):
+    """
+    remap エンジンと ffmpeg v360 の出力を、全方向について画素比較する
+    JPEG の劣化を除くため、入力・出力とも PNG で比較する
+
+    Returns:
+        list: [(方向, PSNR, 平均絶対誤差), ...]
+    """
+    image = cv2.imread(str(image_path), cv2.IMREAD_COLOR)
+    results = []
+    for yaw, pitch, roll in transforms:
+        out_png = tmp / "ffmpeg_view.png"
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error", "-i", str(image_path),
+            "-vf", persp.build_v360_options(yaw, pitch, roll),
+            "-frames:v", "1", str(out_png),
+        ]
+        subprocess.run(cmd, check=True)
+        expected = cv2.imread(str(out_png), cv2.IMREAD_COLOR)
+        actual = equirect_remap.remap_view(image, yaw, pitch, roll)
+        mae = float(np.mean(np.abs(expected.astype(np.int16) - actual.astype(np.int16))))
+        results.append(((yaw, pitch, roll), _psnr(expected, actual), mae))
+    return results
+
+
+def bench_convert(args):
+    engines = [e for e in args.engines.split(",") if e]
+    has_ffmpeg = shutil.which("ffmpeg") is not None
+    if not has_ffmpeg and any(e.startswith("ffmpeg") for e in engines):
+        print("ffmpeg が見つからないため ffmpeg 系エンジンは省略します")
+        engines = [e for e in engines if not e.startswith("ffmpeg")]
+
+    transforms = persp.build_transforms_14()
+    with tempfile.TemporaryDirectory(prefix="geometory-bench-") as tmp:
+        tmp = Path(tmp)
+        frames_dir = tmp / "frames"
+        frames_dir.mkdir()
+        for i in range(args.frames):
+            cv2.imwrite(str(frames_dir / f"frame_{i:06d}.jpg"),
+                        make_synthetic_equirect(args.width, args.height, seed=i))
+        views = args.frames * len(transforms)
+        print(f"入力: {args.frames} フレーム ({args.width}x{args.height}) x {len(transforms)} 方向 = {views} 枚")
+
+        print(f"\n[速度]")
+        for engine in engines:
+            out_dir = tmp / f"out_{engine}"
+            out_dir.mkdir()
+            t0 = time.perf_counter()
+            persp._convert_images(out_dir, frames_dir, transforms, "rc14", engine, args.jobs)
+            sec = time.perf_counter() - t0
+            print(f"  - {engine:<12}: {views / sec:7.1f} 枚/秒 ({sec:.2f}s)")
+
+        if not has_ffmpeg:
+            return 0
+
+        png = tmp / "equirect.png"
+        cv2.imwrite(str(png), make_synthetic_equirect(args.width, args.height))
+        results = check_remap_against_ffmpeg(png, transforms, tmp)
+        worst = min(r[1] for r in results)
+        print(f"\n[画素比較] remap vs ffmpeg v360（PNG 入出力）")
+        for (yaw, pitch, roll), psnr, mae in results:
+            print(f"  - yaw{yaw:+4d} pit{pitch:+3d} rol{roll:+d}: PSNR {psnr:5.1f} dB  平均誤差 {mae:.2f}")
+        ok = worst >= args.min_psnr
+        print(f"最小 PSNR {worst:.1f} dB（基準 {args.min_psnr} dB）: {'OK' if ok else 'NG'}")
+        return 0 if ok else 1
+
+
+def bench_manifest(args):
+    """
+    差分変換の判定（マニフェストの読み込み + 全出力の鮮度チェック）を計測する
+    出力は空ファイルで代用し、実際の変換は行わない
+    """
+    transforms = persp.build_transforms_14()
+    n_frames = -(-args.outputs // len(transforms))
+    with tempfile.TemporaryDirectory(prefix="geometory-bench-") as tmp:
+        tmp = Path(tmp)
+        frames_dir = tmp / "frames"
+        frames_dir.mkdir()
+        out_dir = tmp / "out"
+        out_dir.mkdir()
+
+        print(f"準備中: {n_frames} フレーム x {len(transforms)} 方向 = {n_frames * len(transforms)} 枚")
+        rng = np.random.default_rng(0)
+        images = []
+        for i in range(n_frames):
+            path = frames_dir / f"frame_{i:06d}.jpg"
+            path.write_bytes(rng.bytes(args.frame_bytes))
+            images.append(str(path))
+        manifest = convert_manifest.ConvertManifest(out_dir)
+        for img_path in images:
+            views = persp.plan_views(img_path, out_dir, transforms, "rc14", manifest)
+            for _, _, _, out_path in views:
+                Path(out_path).touch()
+            persp.record_views(manifest, img_path, views, [])
+        manifest.save()
+
+        def plan():
+            manifest = convert_manifest.ConvertManifest(out_dir)
+            return sum(len(persp.plan_views(p, out_dir, transforms, "rc14", manifest)) for p in images)
+
+        t0 = time.perf_counter()
+        fresh_stale = plan()
+        fresh_sec = time.perf_counter() - t0
+
+        # 1フレームの内容を変える → そのフレームの方向だけが対象になる
+        Path(images[0]).write_bytes(rng.bytes(args.frame_bytes))
+        changed_stale = plan()
+
+        config.HORIZONTAL_FOV += 1
+        try:
+            t0 = time.perf_counter()
+            fov_stale = plan()
+            fov_sec = time.perf_counter() - t0
+        finally:
+            config.HORIZONTAL_FOV -= 1
+
+        size_mb = (out_dir / convert_manifest.MANIFEST_NAME).stat().st_size / 1e6
+        print(f"\n[結果] 出力 {n_frames * len(transforms)} 枚、マニフェスト {size_mb:.1f} MB")
+        print(f"  - 変更なし       : 対象 {fresh_stale:6d} 枚  判定 {fresh_sec:.2f}s")
+        print(f"  - 1フレーム変更  : 対象 {changed_stale:6d} 枚")
+        print(f"  - FOV 変更       : 対象 {fov_stale:6d} 枚  判定 {fov_sec:.2f}s")
+        ok = fresh_stale == 0 and changed_stale == len(transforms) and fov_stale == n_frames * len(transforms)
+        print(f"判定結果: {'OK' if ok else 'NG'}")
+        return 0 if ok else 1
+
+
+def draw_face(image, cx, cy, size):
+    """Haar Cascade が顔として検出する程度の簡単な顔（輪郭・目・眉・鼻・口・髪）を描く"""
+    s = size
+    cv2.ellipse(image, (cx, cy), (int(s * 0.42), int(s * 0.55)), 0, 0, 360, (150, 170, 200), -1)
+    for dx in (-0.18, 0.18):
+        ex = int(cx + dx * s)
+        cv2.ellipse(image, (ex, int(cy - 0.12 * s)), (int(0.09 * s), int(0.045 * s)), 0, 0, 360, (40, 40, 40), -1)
+        cv2.line(image, (int(ex - 0.1 * s), int(cy - 0.22 * s)), (int(ex + 0.1 * s), int(cy - 0.22 * s)),
+                 (50, 50, 50), max(1, int(0.03 * s)))
+    cv2.line(image, (cx, int(cy - 0.05 * s)), (cx, int(cy + 0.12 * s)), (120, 130, 160), max(1, int(0.03 * s)))
+    cv2.ellipse(image, (cx, int(cy + 0.25 * s)), (int(0.15 * s), int(0.04 * s)), 0, 0, 360, (60, 60, 110), -1)
+    cv2.rectangle(image, (int(cx - 0.5 * s), int(cy - 0.75 * s)), (int(cx + 0.5 * s), int(cy - 0.45 * s)),
+                  (30, 30, 30), -1)
+
+
+def make_synthetic_faces(width, height, seed=0, sizes=(80, 120, 200, 300)):
+    """
+    顔を横一列に描いた合成フレームを作る
+
+    Returns:
+        tuple: (画像, 顔の正解 [(cx, cy, size), ...])
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 90, np.uint8)
+    image += rng.integers(0, 20, size=(height, width, 3), dtype=np.uint8)
+    truth = []
+    for i, size in enumerate(sizes):
+        cx = int(width * (i + 1) / (len(sizes) + 1) + rng.integers(-40, 40))
+        cy = int(height / 2 + rng.integers(-height // 8, height // 8))
+        draw_face(image, cx, cy, size)
+        truth.append((cx, cy, size))
+    return cv2.GaussianBlur(image, (5, 5), 0), truth
+
+
+def bench_blur(args):
+    """顔ぼかし: 画像ごとに分類器を読み込む逐次処理（変更前） vs 検出器の使い回し・縮小検出・プロセスプール"""
+    with tempfile.TemporaryDirectory(prefix="geometory-bench-") as tmp:
+        tmp = Path(tmp)
+        source = tmp / "source"
+        source.mkdir()
+        n_faces = 0
+        for i in range(args.frames):
+            image, truth = make_synthetic_faces(args.width, args.height, seed=i)
+            cv2.imwrite(str(source / f"frame_{i:06d}.jpg"), image)
+            n_faces += len(truth)
+        print(f"入力: {args.frames} フレーム ({args.width}x{args.height})、顔 {n_faces} 個")
+
+        workers = args.workers or os.cpu_count() or 1
+        runs = [
+            ("変更前（毎回読み込み・元解像度）", dict(workers=1, detect_width=0), True),
+            ("検出器を使い回し・元解像度", dict(workers=1, detect_width=0), False),
+            (f"使い回し・縮小 {args.detect_width}px", dict(workers=1, detect_width=args.detect_width), False),
+            (f"縮小 + {workers} プロセス", dict(workers=workers, detect_width=args.detect_width), False),
+        ]
+        print(f"\n[結果]")
+        for label, kwargs, legacy in runs:
+            folder = tmp / "frames"
+            shutil.rmtree(folder, ignore_errors=True)
+            shutil.copytree(source, folder)
+            with contextlib.redirect_stdout(io.StringIO()):
+                t0 = time.perf_counter()
+                if legacy:
+                    # 変更前と同じく、画像ごとに分類器（XML）を読み込む
+                    found = sum(
+                        face_blur.blur_faces(str(path), str(path), config.BLUR_STRENGTH,
+                                             face_blur.FaceDetector(detect_width=0))
+                        for path in sorted(folder.iterdir())
+                    )
+                else:
+                    found = face_blur.process_folder(str(folder), config.BLUR_STRENGTH, **kwargs)
+                sec = time.perf_counter() - t0
+            print(f"  - {label}: {args.frames / sec:6.2f} 枚/秒 ({sec:.2f}s)  検出 {found}/{n_faces}")
+
+        # 直前の実行の検出結果（detections.npz）を使って、別の強さでぼかし直す
+        reblur = tmp / "reblur"
+        shutil.copytree(source, reblur)
+        shutil.copy2(folder / detection_index.DETECTIONS_NAME, reblur)
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            found = face_blur.process_folder(str(reblur), config.BLUR_STRENGTH + 20, workers=1,
+                                             from_detections=True)
+            sec = time.perf_counter() - t0
+        print(f"  - 検出結果を再利用（ぼかし直し）: {args.frames / sec:6.2f} 枚/秒 ({sec:.2f}s)  検出 {found}/{n_faces}")
+        return 0
+
+
+def paste_view_into_equirect(equirect, view, mask, yaw, pitch, fov):
+    """パースペクティブ画像の mask 部分を、(yaw, pitch) の方向として Equirect 画像に貼る"""
+    height, width = equirect.shape[:2]
+    view_h, view_w = view.shape[:2]
+    u, v = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+    phi = (u * 2 / (width - 1) - 1) * np.pi
+    theta = (v * 2 / (height - 1) - 1) * np.pi / 2
+    d = np.stack([np.cos(theta) * np.sin(phi), np.sin(theta), np.cos(theta) * np.cos(phi)], axis=-1)
+    # 回転前の視線ベクトルに戻してから、パースペクティブ画像上の座標を求める
+    local = d @ equirect_remap.rotation_matrix(yaw, pitch, 0)
+    z = local[..., 2]
+    front = z > 1e-6
+    z = np.where(front, z, 1.0)
+    t = np.tan(np.radians(fov) / 2)
+    map_x = ((local[..., 0] / z / t + 1) * view_w / 2 - 0.5).astype(np.float32)
+    map_y = ((local[..., 1] / z / t + 1) * view_h / 2 - 0.5).astype(np.float32)
+    warped = cv2.remap(view, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_CONSTANT)
+    warped_mask = cv2.remap(mask, map_x, map_y, cv2.INTER_NEAREST, borderMode=cv2.BORDER_CONSTANT)
+    sel = front & (warped_mask > 0)
+    equirect[sel] = warped[sel]
+
+
+# 合成 Equirect に置く顔 (yaw, pitch, パースペクティブ上の大きさ)。極に近いほど横に引き伸ばされる
+SYNTHETIC_FACE_PLACEMENTS = (
+    (-150, 0, 90), (-100, 10, 140), (-45, 30, 160),
+    (0, 50, 160), (60, 60, 200), (120, -45, 160), (-10, 70, 200),
+)
+
+
+def make_synthetic_polar_faces(width, height, seed=0):
+    """
+    赤道から極付近まで、パースペクティブで描いた顔を Equirect に写した合成フレームを作る
+
+    Returns:
+        tuple: (画像, 顔の正解 [[(x, y, w, h), ...], ...]（継ぎ目をまたぐ顔は複数の枠）)
+    """
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 90, np.uint8)
+    image += rng.integers(0, 20, size=(height, width, 3), dtype=np.uint8)
+    view_size = width // 4  # 90° の面で赤道付近の画素の大きさが Equirect と揃う
+    scale = view_size / 1024
+    truth = []
+    for yaw, pitch, size in SYNTHETIC_FACE_PLACEMENTS:
+        yaw += int(rng.integers(-8, 9))
+        size = max(24, int(size * scale))
+        view = np.full((view_size, view_size, 3), 95, np.uint8)
+        mask = np.zeros((view_size, view_size), np.uint8)
+        c = view_size // 2
+        draw_face(view, c, c, size)
+        cv2.rectangle(mask, (int(c - 0.6 * size), int(c - 0.8 * size)), (int(c + 0.6 * size), int(c + 0.7 * size)), 255, -1)
+        paste_view_into_equirect(image, view, mask, yaw, pitch, 90)
+        truth.append(equirect_remap.view_box_to_equirect(
+            (c - size / 2, c - size / 2, size, size), yaw, pitch, 0, view_size, view_size, 90, 90, width, height))
+    return cv2.GaussianBlur(image, (5, 5), 0), truth
+
+
+def _iou(a, b):
+    iw = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    ih = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match_detections(truth, boxes, iou_threshold):
+    """正解ごとに IoU が基準以上の検出があるかを数える（1つの検出は1つの正解にだけ対応）
+
+    Returns:
+        tuple: (見つかった正解の数, どの正解にも対応しない検出の数)
+    """
+    used = set()
+    hit = 0
+    for parts in truth:
+        best, best_iou = None, iou_threshold
+        for i, box in enumerate(boxes):
+            if i in used:
+                continue
+            iou = max(_iou(part, box[:4]) for part in parts)
+            if iou >= best_iou:
+                best, best_iou = i, iou
+        if best is not None:
+            used.add(best)
+            hit += 1
+    # 継ぎ目で分かれた枠の片割れは誤検出に数えない
+    extra = sum(
+        1 for i, box in enumerate(boxes)
+        if i not in used and not any(_iou(p, box[:4]) > 0 for parts in truth for p in parts)
+    )
+    return hit, extra
+
+
+def load_labeled_images(images_dir, labels_csv):
+    """ラベル付きの画像を読み込む（CSV: filename,x,y,w,h。1行1顔、顔のない画像は x を空にする）"""
+    labels = {}
+    with open(labels_csv, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith("#") or row[0] == "filename":
+                continue
+            boxes = labels.setdefault(row[0], [])
+            if len(row) >= 5 and row[1].strip():
+                boxes.append([tuple(int(float(v)) for v in row[1:5])])
+    samples = []
+    for name, truth in sorted(labels.items()):
+        image = cv2.imread(str(Path(images_dir) / name), cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"[警告] 画像を読み込めません: {name}")
+            continue
+        samples.append((name, image, truth))
+    return samples
+
+
+def bench_detect(args):
+    """顔検出: バックエンド × 検出モード ごとの速度と再現率（IoU 基準）"""
+    if args.images:
+        if not args.labels:
+            print("エラー: --images には --labels が必要です")
+            return 1
+        samples = load_labeled_images(args.images, args.labels)
+        source = f"ラベル付き画像 {args.images}"
+    else:
+        samples = []
+        for i in range(args.frames):
+            image, truth = make_synthetic_polar_faces(args.width, args.height, seed=i)
+            samples.append((f"synthetic_{i}", image, truth))
+        source = f"合成 Equirect ({args.width}x{args.height}、赤道〜極付近の顔)"
+    if not samples:
+        print("エラー: 計測する画像がありません")
+        return 1
+    n_faces = sum(len(truth) for _, _, truth in samples)
+    print(f"入力: {source}  {len(samples)} 枚、顔 {n_faces} 個  IoU 基準: {args.iou}")
+
+    if args.yunet_model:
+        config.FACE_YUNET_MODEL = args.yunet_model
+    print(f"\n[結果]")
+    for backend in args.backends.split(","):
+        for projection in args.projections.split(","):
+            label = f"{backend:5s} / {projection:8s}"
+            try:
+                detector = face_detect.FaceDetector(detect_width=args.detect_width,
+                                                    backend=backend, projection=projection)
+            except RuntimeError as e:
+                print(f"  - {label}: スキップ（{e}）")
+                break
+            detector.detect(samples[0][1])  # マップ作成・モデル初期化を計測から外す
+            hit = extra = 0
+            t0 = time.perf_counter()
+            for _, image, truth in samples:
+                h, e = match_detections(truth, detector.detect(image), args.iou)
+                hit += h
+                extra += e
+            sec = time.perf_counter() - t0
+            print(f"  - {label}: {len(samples) / sec:6.2f} 枚/秒  再現率 {hit}/{n_faces} ({hit / n_faces:.0%})"
+                  f"  誤検出 {extra}")
+    return 0
+
+
+def make_moving_faces(frames, width, height, cut_at=None, seed=0, sizes=(90, 130, 180)):
+    """
+    顔がゆっくり動く合成フレーム列を作る（cut_at のフレームで背景と顔の位置が切り替わる）
+
+    Returns:
+        tuple: (フレームのリスト, フレームごとの顔の正解 [[(x, y, w, h), ...], ...], シーン番号のリスト)
+    """
+    rng = np.random.default_rng(seed)
+    images, truth, scenes = [], [], []
+    scene = None
+    for i in range(frames):
+        current = 0 if cut_at is None or i < cut_at else 1
+        if current != scene:
+            scene = current
+            background = np.full((height, width, 3), 60 + 60 * scene, np.uint8)
+            background += rng.integers(0, 40, size=(height, width, 3), dtype=np.uint8)
+            background = cv2.GaussianBlur(background, (7, 7), 0)
+            faces = [
+                (width * (k + 1) / (len(sizes) + 1) + rng.integers(-60, 60),
+                 height / 2 + rng.integers(-height // 6, height // 6),
+                 rng.uniform(-6, 6), rng.uniform(-2, 2), size)
+                for k, size in enumerate(sizes)
+            ]
+            start = i
+        image = background.copy()
+        boxes = []
+        for cx, cy, vx, vy, size in faces:
+            x, y = int(cx + vx * (i - start)), int(cy + vy * (i - start))
+            draw_face(image, x, y, size)
+            boxes.append((x - size // 2, y - size // 2, size, size))
+        images.append(cv2.GaussianBlur(image, (3, 3), 0))
+        truth.append(boxes)
+        scenes.append(scene)
+    return images, truth, scenes
+
+
+def _covered(face, boxes, min_ratio=0.9):
+    """顔の正解枠の min_ratio 以上がぼかす枠のどれかに含まれていれば True"""
+    x, y, w, h = face
+    best = 0
+    for bx, by, bw, bh in (b[:4] for b in boxes):
+        iw = max(0, min(x + w, bx + bw) - max(x, bx))
+        ih = max(0, min(y + h, by + bh) - max(y, by))
+        best = max(best, iw * ih / (w * h))
+    return best >= min_ratio
+
+
+def bench_track(args):
+    """顔ぼかしの追跡モード: 全フレーム検出 vs K フレームごとの検出 + optical flow"""
+    images, truth, scenes = make_moving_faces(args.frames, args.width, args.height, cut_at=args.frames // 2)
+    n_faces = sum(len(t) for t in truth)
+    print(f"入力: {args.frames} フレーム ({args.width}x{args.height})、顔 {n_faces} 個（延べ）、"
+          f"{args.frames // 2} フレーム目でシーン切り替え")
+
+    detector = face_detect.FaceDetector(detect_width=args.detect_width)
+    runs = [("全フレームで検出", 1), (f"{args.interval} フレームごとに検出 + 追跡", args.interval)]
+    print(f"\n[結果]")
+    for label, interval in runs:
+        tracker = face_track.FaceTracker(detector, detect_every=interval)
+        covered = flicker = 0
+        previous = None
+        t0 = time.perf_counter()
+        for image, faces, scene in zip(images, truth, scenes):
+            boxes = tracker.update(image)
+            state = [_covered(face, boxes) for face in faces]
+            covered += sum(state)
+            if previous is not None and previous[0] == scene:
+                # 前のフレームで覆えていた顔が覆えなくなった回数（ちらつき）
+                flicker += sum(1 for before, now in zip(previous[1], state) if before and not now)
+            previous = (scene, state)
+        sec = time.perf_counter() - t0
+        print(f"  - {label}: {args.frames / sec:6.2f} 枚/秒 ({sec:.2f}s)  検出 {tracker.detections} 回"
+              f"  顔を覆えた割合 {covered}/{n_faces} ({covered / n_faces:.0%})  ちらつき {flicker} 回")
+    return 0
+
+
+def bench_views(args):
+    """方向の組: 固定プリセット（rc14 / dense）vs 計画した組（方向数・被覆率・重なり率・変換時間）"""
+    image = make_synthetic_equirect(args.width, args.height)
+    t0 = time.perf_counter()
+    views, name, stats = view_planner.plan_view_set(args.views, args.overlap)
+    plan_sec = time.perf_counter() - t0
+    sets = [
+        ("rc14", persp.build_transforms_14()),
+        (f"dense{config.RING_STEP_DEG}", persp.build_transforms_dense()),
+        (name, views),
+    ]
+    print(f"入力: 合成 Equirect {args.width}x{args.height}  出力: {config.PERSPECTIVE_WIDTH}x{config.PERSPECTIVE_HEIGHT}"
+          f"  FOV: {config.HORIZONTAL_FOV}x{config.VERTICAL_FOV}")
+    print(f"計画: {args.views or config.VIEW_SET or 'auto'}  重なり率の目標 "
+          f"{config.VIEW_OVERLAP if args.overlap is None else args.overlap:.0%}（計画 {plan_sec:.2f}s）")
+    print(f"\n[結果]")
+    for label, transforms in sets:
+        cache = equirect_remap.RemapCache()
+        for yaw, pitch, roll in transforms:
+            cache.get(yaw, pitch, roll, args.width, args.height)
+        t0 = time.perf_counter()
+        for yaw, pitch, roll in transforms:
+            cv2.imencode(".jpg", equirect_remap.remap_view(image, yaw, pitch, roll, cache))
+        sec = time.perf_counter() - t0
+        set_stats = stats if transforms is views else view_planner.evaluate_view_set(transforms)
+        print(f"  - {view_planner.describe(label, transforms, set_stats)}  変換 {sec * 1000:.0f} ms/フレーム")
+    return 0
+
+
+def _tree_bytes(folder):
+    return sum(p.stat().st_size for p in Path(folder).rglob("*") if p.is_file())
+
+
+def bench_stream(args):
+    """extract → (blur) → convert(remap) の3段階と、ストリーミングパイプラインを比較する"""
+    with tempfile.TemporaryDirectory(prefix="geometory-bench-") as tmp:
+        tmp = Path(tmp)
+        if args.video:
+            video_path = Path(args.video)
+        else:
+            video_path = tmp / "synthetic.avi"
+            print(f"合成動画を作成中: {args.frames} フレーム, {args.width}x{args.height}")
+            make_synthetic_video(video_path, args.frames, args.width, args.height)
+        original_output = config.OUTPUT_DIR
+        config.OUTPUT_DIR = tmp / "output"
+        try:
+            t0 = time.perf_counter()
+            frames_dir = video_frame_extractor.extract_frames(str(video_path), str(config.OUTPUT_DIR))
+            if args.blur:
+                face_blur.process_folder(frames_dir, config.BLUR_STRENGTH)
+            folder = Path(frames_dir).parent.parent
+            persp.process_frames(folder.name, engine="remap", jobs=args.workers or 0)
+            staged_sec = time.perf_counter() - t0
+            staged_bytes = _tree_bytes(folder)
+
+            time.sleep(1)  # フォルダ名のタイムスタンプを分ける
+            t0 = time.perf_counter()
+            stream_dir = stream_pipeline.run_stream_pipeline(
+                video_path, blur=args.blur, workers=args.workers, memory_mb=args.memory_mb
+            )
+            stream_sec = time.perf_counter() - t0
+            stream_bytes = _tree_bytes(stream_dir)
+
+            same_names = sorted(p.name for p in folder.glob("*.jpg")) == sorted(p.name for p in stream_dir.glob("*.jpg"))
+        finally:
+            config.OUTPUT_DIR = original_output
+
+        print(f"\n[結果] 顔ぼかし: {'あり' if args.blur else 'なし'}")
+        print(f"  - extract → {'blur → ' if args.blur else ''}convert: {staged_sec:6.2f}s  出力フォルダ {staged_bytes / 1e6:8.1f} MB")
+        print(f"  - ストリーミング           : {stream_sec:6.2f}s  出力フォルダ {stream_bytes / 1e6:8.1f} MB")
+        print(f"出力ファイル名の一致: {'OK' if same_names else 'NG'}")
+        return 0 if same_names else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description="geometory の各処理のベンチマーク")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("extract", help="フレーム抽出: 逐次ループ vs パイプライン")
+    p.add_argument("--video", help="計測に使う動画（省略時は合成動画）")
+    p.add_argument("--frames", type=int, default=120, help="合成動画のフレーム数")
+    p.add_argument("--width", type=int, default=3840, help="合成動画の幅")
+    p.add_argument("--height", type=int, default=1920, help="合成動画の高さ")
+    p.add_argument("--workers", type=int, default=None, help="エンコードのワーカー数")
+    p.set_defaults(func=bench_extract)
+
+    p = subparsers.add_parser("sample", help="間引き抽出: 全フレーム read vs grab/シーク")
+    p.add_argument("--video", help="計測に使う動画（省略時は合成動画）")
+    p.add_argument("--frames", type=int, default=900, help="合成動画のフレーム数")
+    p.add_argument("--width", type=int, default=1920, help="合成動画の幅")
+    p.add_argument("--height", type=int, default=960, help="合成動画の高さ")
+    p.add_argument("--every-sec", type=float, default=2.0, help="抽出間隔（秒）")
+    p.set_defaults(func=bench_sample)
+
+    p = subparsers.add_parser("manifest", help="差分変換: マニフェストによる鮮度チェックの速度")
+    p.add_argument("--outputs", type=int, default=100000, help="出力画像の枚数")
+    p.add_argument("--frame-bytes", type=int, default=4096, help="ダミーの元フレームのサイズ")
+    p.set_defaults(func=bench_manifest)
+
+    p = subparsers.add_parser("stream", help="パイプライン: 3段階（ディスク経由） vs ストリーミング")
+    p.add_argument("--video", help="計測に使う動画（省略時は合成動画）")
+    p.add_argument("--frames", type=int, default=30, help="合成動画のフレーム数")
+    p.add_argument("--width", type=int, default=3840, help="合成動画の幅")
+    p.add_argument("--height", type=int, default=1920, help="合成動画の高さ")
+    p.add_argument("--blur", action="store_true", help="顔ぼかしを含める")
+    p.add_argument("--workers", type=int, default=None, help="ワーカー数（省略時は CPU コア数）")
+    p.add_argument("--memory-mb", type=int, default=None, help="ストリーミングのメモリ目安")
+    p.set_defaults(func=bench_stream)
+
+    p = subparsers.add_parser("blur", help="顔ぼかし: 検出器の使い回し・縮小検出・プロセスプールの効果")
+    p.add_argument("--frames", type=int, default=12, help="合成フレームの枚数")
+    p.add_argument("--width", type=int, default=5760, help="合成フレームの幅")
+    p.add_argument("--height", type=int, default=2880, help="合成フレームの高さ")
+    p.add_argument("--detect-width", type=int, default=1920, help="縮小検出の幅")
+    p.add_argument("--workers", type=int, default=None, help="プロセス数（省略時は CPU コア数）")
+    p.set_defaults(func=bench_blur)
+
+    p = subparsers.add_parser("detect", help="顔検出: バックエンド × 検出モード（全体/タイル/キューブ）の速度と再現率")
+    p.add_argument("--frames", type=int, default=4, help="合成フレームの枚数")
+    p.add_argument("--width", type=int, default=4096, help="合成フレームの幅")
+    p.add_argument("--height", type=int, default=2048, help="合成フレームの高さ")
+    p.add_argument("--images", help="ラベル付き画像のフォルダ（省略時は合成フレーム）")
+    p.add_argument("--labels", help="ラベルの CSV（filename,x,y,w,h）")
+    p.add_argument("--backends", default=",".join(face_detect.BACKENDS), help="計測する検出器（カンマ区切り）")
+    p.add_argument("--projections", default=",".join(face_detect.PROJECTIONS), help="計測する検出モード（カンマ区切り）")
+    p.add_argument("--yunet-model", help="YuNet の ONNX モデル（省略時は config.FACE_YUNET_MODEL）")
+    p.add_argument("--detect-width", type=int, default=None, help="縮小検出の幅（省略時は config.FACE_DETECT_WIDTH）")
+    p.add_argument("--iou", type=float, default=0.3, help="正解とみなす IoU の基準")
+    p.set_defaults(func=bench_detect)
+
+    p = subparsers.add_parser("track", help="顔ぼかし: 全フレーム検出 vs 追跡モード（検出回数・覆えた割合・ちらつき）")
+    p.add_argument("--frames", type=int, default=40, help="合成フレームの枚数")
+    p.add_argument("--width", type=int, default=1920, help="合成フレームの幅")
+    p.add_argument("--height", type=int, default=960, help="合成フレームの高さ")
+    p.add_argument("--interval", type=int, default=5, help="追跡モードの検出間隔 K")
+    p.add_argument("--detect-width", type=int, default=None, help="縮小検出の幅（省略時は config.FACE_DETECT_WIDTH）")
+    p.set_defaults(func=bench_track)
+
+    p = subparsers.add_parser("views", help="方向の組: 固定プリセット vs 計画した組（方向数・被覆率・重なり率・変換時間）")
+    p.add_argument("--views", choices=view_planner.LAYOUTS, default=None, help="計画のレイアウト（デフォルト: config.VIEW_SET または auto）")
+    p.add_argument("--overlap", type=float, default=None, help="方向ごとの重なり率の目標")
+    p.add_argument("--width", type=int, default=3840, help="合成画像の幅")
+    p.add_argument("--height", type=int, default=1920, help="合成画像の高さ")
+    p.set_defaults(func=bench_views)
+
+    p = subparsers.add_parser("convert", help="パースペクティブ変換: エンジン別の速度（remap は ffmpeg と画素比較）")
+    p.add_argument("--frames", type=int, default=5, help="合成 Equirect 画像の枚数")
+    p.add_argument("--width", type=int, default=3840, help="合成画像の幅")
+    p.add_argument("--height", type=int, default=1920, help="合成画像の高さ")
+    p.add_argument("--engines", default="ffmpeg,ffmpeg-split,remap", help="計測するエンジン（カンマ区切り）")
+    p.add_argument("--jobs", type=int, default=1, help="変換の並列数（0 = CPU コア数）")
+    p.add_argument("--min-psnr", type=float, default=40.0, help="画素比較の合格基準 (dB)")
+    p.set_defaults(func=bench_convert)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -17,10 +17,73 @@ OUTPUT_DIR = DATA_DIR / "output"
 FRAME_PREFIX = "frame"
 FRAME_EXTENSION = "jpg"
 
+# フレーム保存（JPEG エンコード）のワーカースレッド数（None = CPU コア数）
+EXTRACT_WORKERS = None
+# デコード済みフレームを溜めておく上限数
+# メモリ使用量の目安: 上限 × 1フレーム（5.7K で約 50MB）
+EXTRACT_QUEUE_SIZE = 8
+
+# 間引き抽出（interval / 秒間隔 / 時刻指定）で、次に抽出するフレームが
+# この秒数以上先ならシークする（それ未満は grab() で読み飛ばす）
+# 動画の GOP（キーフレーム間隔）より少し長めにするとよい
+SEEK_MIN_GAP_SEC = 2.0
+
+# キーフレーム選択（extract --keyframes）
+# 評価は縮小グレースケールで行う
+KEYFRAME_ANALYSIS_WIDTH = 640  # シャープさ（ラプラシアン分散）を測る幅
+KEYFRAME_SIGNATURE_WIDTH = 64  # フレーム間差分を測る幅
+# 直前に採用したフレームとの平均輝度差（0-255）がこれを超えたら次を採用
+KEYFRAME_DIFF_THRESHOLD = 12.0
+# 変化を検出してから、この秒数の中で最もシャープなフレームを採用
+KEYFRAME_WINDOW_SEC = 0.5
+# これ未満のシャープさのフレームは採用しない（0 = 制限なし）
+KEYFRAME_MIN_SHARPNESS = 0.0
+
 # ==================== 顔ぼかし設定 ====================
 # face_blur.py で使用
 BLUR_STRENGTH = 51  # ぼかしの強さ（奇数）
 
+# 顔ぼかしの並列プロセス数（None = CPU コア数、1 = 逐次）
+BLUR_WORKERS = None
+
+# blur --separate の出力先（<出力フォルダ>/face_blurred_frames/）。省略時は temp/frames を上書き
+BLUR_OUTPUT_FOLDER_NAME = "face_blurred_frames"
+
+# 顔検出の設定（face_detect.py）
+# 検出器: "haar"（Haar Cascade）/ "yunet"（DNN、FACE_YUNET_MODEL が必要）
+FACE_BACKEND = "haar"
+# 検出モード: "equirect"（全体を縮小して検出）/ "tiles"（タイル分割）/ "cube"（キューブマップ6面）
+FACE_PROJECTION = "equirect"
+# 検出はこの幅に縮小した画像で行い、枠を元の解像度に戻す（0 = 縮小しない）
+# 縮小後に約 24px 未満になる顔は検出できないので、小さい顔が多い場合は大きくする
+# cube では1面の大きさもこの幅を基準に決まる
+FACE_DETECT_WIDTH = 1920
+FACE_MIN_SIZE = 30  # 検出する最小の顔サイズ（元の解像度での px）
+FACE_NMS_IOU = 0.3  # タイル・面をまたいで重なった枠をまとめる IoU
+
+# Haar Cascade
+FACE_SCALE_FACTOR = 1.1  # 検出ウィンドウの拡大率（小さいほど精度が上がり遅くなる）
+FACE_MIN_NEIGHBORS = 5  # 大きいほど誤検出が減り、見逃しが増える
+
+# YuNet（cv2.FaceDetectorYN）
+# https://github.com/opencv/opencv_zoo の face_detection_yunet_2023mar.onnx へのパス
+FACE_YUNET_MODEL = None
+FACE_YUNET_SCORE = 0.7  # この信頼度未満の検出は捨てる
+
+# tiles: タイルの大きさ（縮小後の px）と重なりの割合
+FACE_TILE_SIZE = 640
+FACE_TILE_OVERLAP = 0.25
+# cube: 1面の視野角（90 より大きくして隣の面と重ねる）と大きさ（None = 赤道付近の解像度に合わせる）
+FACE_CUBE_FOV = 120
+FACE_CUBE_SIZE = None
+
+# 追跡モード（face_track.py）: K フレームごと・シーン切り替え時だけ検出し、間は optical flow で枠を動かす
+FACE_TRACK_INTERVAL = 0  # K（0 / 1 = 追跡しない。全フレームで検出）
+FACE_TRACK_SCENE_THRESHOLD = 20.0  # 前フレームとの平均輝度差（0-255）がこれを超えたら検出し直す
+FACE_TRACK_DILATE = 0.1  # 追跡時に枠を各辺この割合だけ広げる
+FACE_TRACK_MAX_MISSES = 1  # 検出で見つからなかった顔を追跡し続ける検出回数
+FACE_TRACK_WIDTH = 960  # optical flow を計算する縮小幅
+
 # ==================== Equirect→パースペクティブ変換設定 ====================
 # batch_equirect2persp_ffmpeg.py で使用
 
@@ -32,18 +95,48 @@ PERSPECTIVE_HEIGHT = 1024
 HORIZONTAL_FOV = 90
 VERTICAL_FOV = 90
 
-# ffmpeg オーバーライト設定
+# 上書き設定
+# True : 毎回すべての出力を作り直す（従来どおり）
+# False: 出力フォルダのマニフェスト（.convert_manifest.json）で、元フレームの内容と
+#        v360 パラメータ（FOV・サイズ・方向）が前回と同じ出力はスキップする
 OVERWRITE = True
 
+# 変換エンジン
+# "ffmpeg"      : 方向ごとに ffmpeg v360 を実行（従来の方式）
+# "ffmpeg-split": 1フレームにつき ffmpeg を1回起動し、split で全方向を出力
+# "remap"       : NumPy/OpenCV の cv2.remap で変換（フレームのデコード1回、座標マップを使い回す）
+CONVERT_ENGINE = "ffmpeg"
+# remap エンジンの JPEG 品質（0-100）
+REMAP_JPEG_QUALITY = 95
+
+# 変換の並列数（--jobs で上書き）。1 = 逐次、0 = CPU コア数
+CONVERT_JOBS = 1
+
 # ========== 変換方法選択 ==========
 # False: 14方向（上下左右+斜めなど標準的）
 # True: 密集度高く（ring_step_deg ごとにリング状）
 USE_DENSE_RING = False
 RING_STEP_DEG = 30  # USE_DENSE_RING=True の場合に使用
 
+# 方向の組を計画する場合（view_planner.py、convert --views）
+# None = 上の USE_DENSE_RING に従う（rc14 / dense）
+# "cube" / "fibonacci" / "rings" / "auto"（条件を満たす最も少ない組）
+VIEW_SET = None
+VIEW_OVERLAP = 0.3  # 方向ごとの重なり率の目標（画素のうち、ほかの方向にも写る割合）
+VIEW_MIN_COVERAGE = 0.999  # 全天の被覆率の下限
+VIEW_COVERAGE_SAMPLES = 20000  # 被覆率を測る球面上のサンプル数
+VIEW_OVERLAP_GRID = 32  # 重なり率を測る各画像のサンプル（grid x grid）
+
+# ==================== ストリーミングパイプライン設定 ====================
+# stream_pipeline.py（pipeline --stream）で使用
+STREAM_WORKERS = None  # 顔ぼかし・変換・保存のワーカー数（None = CPU コア数）
+# デコード済みフレームに使うメモリの目安（MB）
+# (キュー上限 + ワーカー数) × 1フレーム がこれに収まるようにする（5.7K で1フレーム約 50MB）
+STREAM_MEMORY_MB = 1024
+
 # ==================== 共通設定 ====================
 # ログレベル（OpenCV や ffmpeg へのオプション）
 FFMPEG_LOGLEVEL = "error"
 
-# 一度に処理する画像数など（今後の拡張用）
-BATCH_SIZE = None  # None = 制限なし
+# 並列変換（CONVERT_JOBS / --jobs）で同時に投入する作業単位の上限
+BATCH_SIZE = None  # None = 並列数 × 2
@@ -0,0 +1,107 @@
+"""
+パースペクティブ変換のマニフェスト（出力フォルダごとの変換記録）
+
+convert を再実行したときに、古くなった出力だけを作り直すために使う。
+出力1枚ごとに「元フレームの内容ハッシュ」と「v360 パラメータのフィンガープリント」を記録し、
+次のいずれかに当てはまる出力だけを変換対象にする。
+
+    - 記録がない、またはファイルが消えている
+    - 元フレームの内容が変わった（ハッシュが違う）
+    - FOV・出力サイズ・方向などのパラメータが変わった（フィンガープリントが違う）
+
+元フレームのハッシュは (サイズ, mtime) が前回と同じなら記録を使い回す。
+変更のないフォルダでは stat とディレクトリ一覧だけで判定が終わる。
+mtime だけが変わった場合（同じ内容で再抽出した等）はハッシュで判定するので作り直さない。
+
+保存先: <出力フォルダ>/.convert_manifest.json
+"""
+
+import functools
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = ".convert_manifest.json"
+MANIFEST_VERSION = 1
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """ファイル内容のハッシュ（BLAKE2b 128bit の16進文字列）"""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+@functools.lru_cache(maxsize=1024)
+def params_fingerprint(v360_options):
+    """v360 フィルタのオプション文字列から短いフィンガープリントを作る"""
+    return hashlib.blake2b(v360_options.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class ConvertManifest:
+    """
+    出力フォルダのマニフェスト
+
+    sources: {元フレーム名: [サイズ, mtime_ns, ハッシュ]}
+    outputs: {出力ファイル名: [元フレームのハッシュ, フィンガープリント]}
+
+    record() / save() はメインスレッドからだけ呼ぶこと（並列変換でも結果の受け取りは1スレッド）。
+    """
+
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / MANIFEST_NAME
+        self.sources = {}
+        self.outputs = {}
+        self._dirty = False
+        self._load()
+        # 10万枚でも os.path.exists を出力ごとに呼ばずに済むよう、一覧を1回だけ取る
+        self.existing = {e.name for e in os.scandir(output_dir) if e.is_file()}
+
+    def _load(self):
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"[警告] マニフェストを読み込めないため作り直します: {self.path.name} ({e})")
+            return
+        if data.get("version") != MANIFEST_VERSION:
+            return
+        self.sources = data.get("sources", {})
+        self.outputs = data.get("outputs", {})
+
+    def source_hash(self, img_path):
+        """元フレームのハッシュ（サイズと mtime が記録と同じなら再計算しない）"""
+        st = os.stat(img_path)
+        name = os.path.basename(img_path)
+        rec = self.sources.get(name)
+        if rec is not None and rec[0] == st.st_size and rec[1] == st.st_mtime_ns:
+            return rec[2]
+        digest = file_digest(img_path)
+        self.sources[name] = [st.st_size, st.st_mtime_ns, digest]
+        self._dirty = True
+        return digest
+
+    def is_fresh(self, out_name, src_hash, fingerprint):
+        """出力が存在し、同じ元フレーム・同じパラメータで作られたものなら True"""
+        return out_name in self.existing and self.outputs.get(out_name) == [src_hash, fingerprint]
+
+    def record(self, out_name, src_hash, fingerprint):
+        """出力の変換が成功したことを記録する"""
+        self.outputs[out_name] = [src_hash, fingerprint]
+        self.existing.add(out_name)
+        self._dirty = True
+
+    def save(self):
+        """変更があれば保存する（一時ファイルに書いてから置き換える）"""
+        if not self._dirty:
+            return
+        data = {"version": MANIFEST_VERSION, "sources": self.sources, "outputs": self.outputs}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = False
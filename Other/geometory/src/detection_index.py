@@ -0,0 +1,124 @@
+"""
+顔検出結果のインデックス（フレームフォルダの detections.npz）
+
+face_blur.py で検出した枠をフレームごとに保存し、後の処理で検出をやり直さずに使う。
+    - 別の強さでぼかし直す（blur --from-detections）
+    - パースペクティブ変換の出力側でぼかす（convert --blur-faces、枠を同じ視点の幾何で変換）
+
+列形式の npz:
+    frames       : フレーム名（検出を実行したフレームすべて。顔がなかったフレームも含む）
+    frame_size   : フレームの (幅, 高さ)
+    frame_id     : 枠ごとのフレーム番号（frames の添字）
+    bbox         : 枠 (x, y, w, h)（元の解像度の Equirect 座標）
+    score        : 枠の信頼度
+    frame_params : フレームごとの検出に使った設定（検出器・検出モードなど）
+                   設定を変えて一部だけ検出し直しても、残りのフレームの記録は正しいまま
+                   （以前の形式の、インデックス全体で1つの params も読める）
+
+フレーム名で引くので、同じ名前で別の内容に差し替えた場合は検出し直すこと
+（blur の処理記録は内容の変化を検知して検出し直し、インデックスも更新する）。
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+DETECTIONS_NAME = "detections.npz"
+
+
+class DetectionIndex:
+    """
+    フレームフォルダの検出結果
+
+    frames: {フレーム名: ((幅, 高さ), [(x, y, w, h, score), ...], 検出の設定)}
+    """
+
+    def __init__(self, frames_dir):
+        self.path = Path(frames_dir) / DETECTIONS_NAME
+        self.frames = {}
+        self._dirty = False
+        self._load()
+
+    def _load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                names = data["frames"]
+                sizes = data["frame_size"]
+                frame_id = data["frame_id"]
+                bbox = data["bbox"]
+                score = data["score"]
+                if "frame_params" in data:
+                    params = [str(p) for p in data["frame_params"]]
+                else:
+                    params = [str(data["params"])] * len(names)
+        except FileNotFoundError:
+            return
+        except (OSError, KeyError, ValueError) as e:
+            print(f"[警告] 検出結果を読み込めないため作り直します: {self.path.name} ({e})")
+            return
+        boxes = [[] for _ in names]
+        for i, (x, y, w, h), s in zip(frame_id.tolist(), bbox.tolist(), score.tolist()):
+            boxes[i].append((x, y, w, h, s))
+        self.frames = {
+            str(name): ((int(size[0]), int(size[1])), frame_boxes, frame_params)
+            for name, size, frame_boxes, frame_params in zip(names, sizes, boxes, params)
+        }
+
+    @property
+    def modified(self):
+        """保存していない変更があれば True"""
+        return self._dirty
+
+    def __contains__(self, name):
+        return name in self.frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def boxes(self, name, size=None):
+        """
+        フレームの枠のリスト（記録がない、または size (幅, 高さ) が記録と違う場合は None）
+        """
+        entry = self.frames.get(name)
+        if entry is None or (size is not None and tuple(size) != entry[0]):
+            return None
+        return entry[1]
+
+    def params(self, name):
+        """フレームの検出に使った設定（記録がなければ None）"""
+        entry = self.frames.get(name)
+        return None if entry is None else entry[2]
+
+    def set(self, name, size, boxes, params=""):
+        """フレームの検出結果と、検出に使った設定を記録する（顔がなければ boxes は空リスト）"""
+        self.frames[name] = ((int(size[0]), int(size[1])),
+                             [(int(b[0]), int(b[1]), int(b[2]), int(b[3]), float(b[4]) if len(b) > 4 else 0.0)
+                              for b in boxes],
+                             str(params))
+        self._dirty = True
+
+    def save(self):
+        """変更があれば保存する（一時ファイルに書いてから置き換える）"""
+        if not self._dirty:
+            return
+        names = sorted(self.frames)
+        frame_id, bbox, score = [], [], []
+        for i, name in enumerate(names):
+            for x, y, w, h, s in self.frames[name][1]:
+                frame_id.append(i)
+                bbox.append((x, y, w, h))
+                score.append(s)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez_compressed(
+                f,
+                frames=np.array(names, dtype=str),
+                frame_size=np.array([self.frames[n][0] for n in names], dtype=np.int32).reshape(-1, 2),
+                frame_id=np.array(frame_id, dtype=np.int32),
+                bbox=np.array(bbox, dtype=np.int32).reshape(-1, 4),
+                score=np.array(score, dtype=np.float32),
+                frame_params=np.array([self.frames[n][2] for n in names], dtype=str),
+            )
+        os.replace(tmp, self.path)
+        self._dirty = False
@@ -0,0 +1,238 @@
+"""
+NumPy / OpenCV で Equirect 360 画像を直線的パースペクティブ画像に変換するエンジン
+
+ffmpeg の v360 フィルタ（input=e, output=rectilinear, interp=line）と同じ幾何で
+cv2.remap 用の座標マップを作り、(yaw, pitch, roll, FOV, 出力サイズ, 入力サイズ) ごとに
+1回だけ計算して全フレームで使い回す。
+ffmpeg を方向ごとに起動する方式と違い、各フレームのデコードは1回で済む。
+
+幾何（ffmpeg v360 と一致させている）:
+    出力画素 (i, j) の視線ベクトル
+        x = tan(h_fov/2) * ((2i+1)/w - 1)
+        y = tan(v_fov/2) * ((2j+1)/h - 1)   （下向きが正）
+        z = 1
+    回転 R = Ry(yaw) · Rx(pitch) · Rz(roll)
+    入力 Equirect 上の座標
+        u = (atan2(x', z') / π + 1) * (W-1) / 2
+        v = (asin(y') / (π/2) + 1) * (H-1) / 2
+
+Equirect の座標はこの (W-1)/2 の対応（画素中心が整数、経度 ±180 度が列 0 と列 W-1）に統一し、
+equirect_to_pixel / pixel_to_equirect だけで変換する。
+顔の枠などの矩形は画素の境界を整数とする座標なので、画素中心の座標と 0.5 ずれる。
+"""
+
+import threading
+
+import cv2
+import numpy as np
+
+import config
+
+
+def rotation_matrix(yaw, pitch, roll):
+    """v360 と同じ順序（yaw → pitch → roll）の回転行列（角度は度）"""
+    y, p, r = np.radians([yaw, pitch, roll])
+    ry = np.array([[np.cos(y), 0, np.sin(y)], [0, 1, 0], [-np.sin(y), 0, np.cos(y)]])
+    rx = np.array([[1, 0, 0], [0, np.cos(p), -np.sin(p)], [0, np.sin(p), np.cos(p)]])
+    rz = np.array([[np.cos(r), -np.sin(r), 0], [np.sin(r), np.cos(r), 0], [0, 0, 1]])
+    return ry @ rx @ rz
+
+
+def equirect_to_pixel(phi, theta, src_w, src_h):
+    """経度 phi・緯度 theta（ラジアン、緯度は下向きが正）を Equirect 画像の画素中心の座標 (u, v) にする"""
+    return (phi / np.pi + 1) * (src_w - 1) / 2, (theta / (np.pi / 2) + 1) * (src_h - 1) / 2
+
+
+def pixel_to_equirect(u, v, src_w, src_h):
+    """equirect_to_pixel の逆: 画素中心の座標 (u, v) → (経度, 緯度)（ラジアン）"""
+    return (u * 2 / (src_w - 1) - 1) * np.pi, (v * 2 / (src_h - 1) - 1) * (np.pi / 2)
+
+
+def view_directions(out_w, out_h, h_fov, v_fov):
+    """出力画素ごとの視線ベクトル（回転前、正規化済み）を (h, w, 3) で返す"""
+    xs = np.tan(np.radians(h_fov) / 2) * ((2 * np.arange(out_w) + 1) / out_w - 1)
+    ys = np.tan(np.radians(v_fov) / 2) * ((2 * np.arange(out_h) + 1) / out_h - 1)
+    x, y = np.meshgrid(xs, ys)
+    d = np.stack([x, y, np.ones_like(x)], axis=-1)
+    return d / np.linalg.norm(d, axis=-1, keepdims=True)
+
+
+def build_maps(yaw, pitch, roll, src_w, src_h, out_w=None, out_h=None, h_fov=None, v_fov=None):
+    """
+    cv2.remap 用の座標マップ (map_x, map_y) を float32 で作る
+
+    省略したパラメータは config の PERSPECTIVE_WIDTH / HEIGHT, HORIZONTAL_FOV / VERTICAL_FOV を使う
+    """
+    out_w = out_w or config.PERSPECTIVE_WIDTH
+    out_h = out_h or config.PERSPECTIVE_HEIGHT
+    h_fov = h_fov or config.HORIZONTAL_FOV
+    v_fov = v_fov or config.VERTICAL_FOV
+
+    d = view_directions(out_w, out_h, h_fov, v_fov) @ rotation_matrix(yaw, pitch, roll).T
+    phi = np.arctan2(d[..., 0], d[..., 2])
+    theta = np.arcsin(np.clip(d[..., 1], -1.0, 1.0))
+    map_x, map_y = equirect_to_pixel(phi, theta, src_w, src_h)
+    return map_x.astype(np.float32), map_y.astype(np.float32)
+
+
+class RemapCache:
+    """
+    座標マップのキャッシュ（スレッドセーフ）
+
+    マップは固定小数点形式（cv2.convertMaps の CV_16SC2）で保持する。
+    remap が速く、メモリも float32 2枚の半分で済む。
+    1024x1024 の出力で1方向あたり約 6MB。
+    """
+
+    def __init__(self):
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def get(self, yaw, pitch, roll, src_w, src_h, out_w=None, out_h=None, h_fov=None, v_fov=None):
+        """座標マップを返す（出力サイズ・FOV を省略した場合は config の値）"""
+        key = (yaw, pitch, roll, src_w, src_h,
+               out_w or config.PERSPECTIVE_WIDTH, out_h or config.PERSPECTIVE_HEIGHT,
+               h_fov or config.HORIZONTAL_FOV, v_fov or config.VERTICAL_FOV)
+        with self._lock:
+            maps = self._maps.get(key)
+        if maps is None:
+            map_x, map_y = build_maps(yaw, pitch, roll, src_w, src_h, *key[5:])
+            maps = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2)
+            with self._lock:
+                maps = self._maps.setdefault(key, maps)
+        return maps
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+
+
+# プロセス内で共有するキャッシュ
+_default_cache = RemapCache()
+
+
+def remap_view(image, yaw, pitch, roll, cache=None, out_w=None, out_h=None, h_fov=None, v_fov=None):
+    """Equirect 画像1枚から1方向のパースペクティブ画像を作る（サイズ・FOV の省略時は config の値）"""
+    cache = cache or _default_cache
+    h, w = image.shape[:2]
+    map1, map2 = cache.get(yaw, pitch, roll, w, h, out_w, out_h, h_fov, v_fov)
+    # 左右は 360 度つながっているので WRAP（上下はマップが画像内に収まる）
+    return cv2.remap(image, map1, map2, cv2.INTER_LINEAR, borderMode=cv2.BORDER_WRAP)
+
+
+def render_views(img_path, views, cache=None, process=None):
+    """
+    Equirect 画像を1回だけデコードし、全方向のパースペクティブ画像を保存する
+
+    Args:
+        img_path (str): 入力 Equirect 画像
+        views (list): [(yaw, pitch, roll, out_path), ...]
+        cache (RemapCache): 座標マップのキャッシュ（省略時はプロセス共有）
+        process (callable): 保存前に各方向の画像を加工する関数
+                            process(view, yaw, pitch, roll, src_w, src_h)（view をその場で書き換える）
+
+    Returns:
+        list: 保存に失敗した出力パスのリスト
+    """
+    image = cv2.imread(str(img_path), cv2.IMREAD_COLOR)
+    if image is None:
+        raise RuntimeError(f"画像を読み込めませんでした: {img_path}")
+
+    params = [cv2.IMWRITE_JPEG_QUALITY, config.REMAP_JPEG_QUALITY]
+    failed = []
+    for yaw, pitch, roll, out_path in views:
+        view = remap_view(image, yaw, pitch, roll, cache)
+        if process is not None:
+            process(view, yaw, pitch, roll, image.shape[1], image.shape[0])
+        if not cv2.imwrite(str(out_path), view, params):
+            failed.append(out_path)
+    return failed
+
+
+def view_points_to_directions(px, py, view_w, view_h, h_fov, v_fov, rotation):
+    """パースペクティブ画像上の点（画素の境界を整数とする座標）を、回転後の視線ベクトルにする"""
+    x = np.tan(np.radians(h_fov) / 2) * (2 * np.asarray(px, dtype=np.float64) / view_w - 1)
+    y = np.tan(np.radians(v_fov) / 2) * (2 * np.asarray(py, dtype=np.float64) / view_h - 1)
+    d = np.stack([x, y, np.ones_like(x)], axis=-1)
+    d /= np.linalg.norm(d, axis=-1, keepdims=True)
+    return d @ rotation.T
+
+
+def view_box_to_equirect(box, yaw, pitch, roll, view_w, view_h, h_fov, v_fov, src_w, src_h, samples=16):
+    """
+    パースペクティブ画像上の枠 (x, y, w, h) を、Equirect 画像上で囲む枠のリストにする
+
+    枠の周上の点を Equirect に写して外接矩形をとる。
+    左右の継ぎ目をまたぐ場合は2つの枠に分け、極を囲む場合は全経度の帯にする。
+    """
+    x, y, w, h = box[:4]
+    t = np.linspace(0.0, 1.0, samples, endpoint=False)
+    px = np.concatenate([x + w * t, np.full(samples, x + w), x + w * (1 - t), np.full(samples, x)])
+    py = np.concatenate([np.full(samples, y), y + h * t, np.full(samples, y + h), y + h * (1 - t)])
+    d = view_points_to_directions(px, py, view_w, view_h, h_fov, v_fov, rotation_matrix(yaw, pitch, roll))
+
+    # 周を一周たどって経度を連続にする（継ぎ目をまたいでも途切れない）
+    phi = np.unwrap(np.append(np.arctan2(d[:, 0], d[:, 2]), np.arctan2(d[0, 0], d[0, 2])))
+    theta = np.arcsin(np.clip(d[:, 1], -1.0, 1.0))
+    u, v = equirect_to_pixel(phi, theta, src_w, src_h)
+    # 画素中心の座標 → 境界の座標。経度 360 度は W-1 画素分
+    u, v = u + 0.5, v + 0.5
+    period = src_w - 1
+    v0, v1 = v.min(), v.max()
+
+    if abs(phi[-1] - phi[0]) > np.pi:
+        # 周が極を一周している: 全経度、極の側は画像の端まで
+        if v.mean() < src_h / 2:
+            v0 = 0
+        else:
+            v1 = src_h
+        return [(0, int(v0), src_w, int(np.ceil(v1)) - int(v0))]
+
+    u0, u1 = u.min(), u.max()
+    shift = np.floor(u0 / period) * period
+    u0, u1 = u0 - shift, u1 - shift
+    y0, y1 = max(0, int(v0)), min(src_h, int(np.ceil(v1)))
+    if u1 <= src_w:
+        return [(int(u0), y0, int(np.ceil(u1)) - int(u0), y1 - y0)]
+    return [
+        (int(u0), y0, src_w - int(u0), y1 - y0),
+        (0, y0, int(np.ceil(u1 - period)), y1 - y0),
+    ]
+
+
+def equirect_box_to_view(box, yaw, pitch, roll, src_w, src_h, view_w=None, view_h=None,
+                         h_fov=None, v_fov=None, samples=16):
+    """
+    Equirect 画像上の枠 (x, y, w, h) を、パースペクティブ画像上で囲む枠にする（view_box_to_equirect の逆）
+
+    枠の内部を格子状にサンプルして視線ベクトルにし、カメラの前にある点だけを投影して外接矩形をとる。
+    出力サイズ・FOV を省略した場合は config の値。
+
+    Returns:
+        tuple | None: (x, y, w, h)（パースペクティブ画像内に収めた整数座標）。写らない場合は None
+    """
+    view_w = view_w or config.PERSPECTIVE_WIDTH
+    view_h = view_h or config.PERSPECTIVE_HEIGHT
+    h_fov = h_fov or config.HORIZONTAL_FOV
+    v_fov = v_fov or config.VERTICAL_FOV
+
+    x, y, w, h = box[:4]
+    u, v = np.meshgrid(np.linspace(x, x + w, samples), np.linspace(y, y + h, samples))
+    # 境界の座標 → 画素中心の座標
+    phi, theta = pixel_to_equirect(u - 0.5, v - 0.5, src_w, src_h)
+    d = np.stack([np.cos(theta) * np.sin(phi), np.sin(theta), np.cos(theta) * np.cos(phi)], axis=-1)
+    # 回転後の視線ベクトル → 回転前（カメラ座標）に戻す
+    local = d.reshape(-1, 3) @ rotation_matrix(yaw, pitch, roll)
+    local = local[local[:, 2] > 1e-6]
+    if len(local) == 0:
+        return None
+
+    px = (local[:, 0] / local[:, 2] / np.tan(np.radians(h_fov) / 2) + 1) * view_w / 2
+    py = (local[:, 1] / local[:, 2] / np.tan(np.radians(v_fov) / 2) + 1) * view_h / 2
+    x0 = int(np.clip(px.min(), 0, view_w))
+    y0 = int(np.clip(py.min(), 0, view_h))
+    x1 = int(np.ceil(np.clip(px.max(), 0, view_w)))
+    y1 = int(np.ceil(np.clip(py.max(), 0, view_h)))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return (x0, y0, x1 - x0, y1 - y0)
@@ -1,77 +1,291 @@
 """
 画像内の顔を検出してぼかすスクリプト
 顔検出と Gaussian ぼかし処理を実装
+
+顔検出器（face_detect.FaceDetector）はプロセスごとに1回だけ読み込んで使い回す。
+process_folder はフレームをプロセスプールで並列に処理する（config.BLUR_WORKERS）。
+検出は config.FACE_DETECT_WIDTH の幅に縮小した画像で行い、
+見つかった枠を元の解像度に戻してからぼかす（5.7K など高解像度のフレームで大幅に速い）。
+検出器の種類（haar / yunet）と Equirect の見え方（equirect / tiles / cube）は face_detect.py を参照。
+追跡モード（config.FACE_TRACK_INTERVAL / --track K）では K フレームごとにだけ検出し、
+間のフレームは枠を追跡する（face_track.py）。連続したフレームをまとめて1つのワーカーに渡す。
+
+保存するのは顔が見つかったフレームだけ（JPEG の再エンコードによる劣化を避ける）で、
+一時ファイルに書いてから置き換える。出力フォルダの .blur_record.json に処理済みのフレームを記録し、
+再実行時はスキップする。
+検出した枠は入力フォルダの detections.npz に保存し、ぼかし直しや変換時のぼかしで使い回す。
 """
 import cv2
+import json
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
 import config
+from face_detect import BACKENDS, PROJECTIONS, FaceDetector
+from face_track import FaceTracker
+from detection_index import DetectionIndex
+
+# 出力フォルダに置く処理記録（再実行時に処理済みのフレームをスキップする）
+BLUR_RECORD_NAME = ".blur_record.json"
+BLUR_RECORD_VERSION = 1
 
 
-def blur_faces(image_path, output_path, blur_strength=51):
+def apply_blur(image, boxes, blur_strength):
     """
-    画像内の顔を検出してぼかす
+    画像（BGR 配列）の指定した枠をその場でぼかす
 
     Args:
-        image_path (str): 入力画像のパス
-        output_path (str): 出力画像のパス
+        image (numpy.ndarray): 入力画像（上書きされる）
+        boxes (list): ぼかす枠 [(x, y, w, h), ...]（5番目以降の要素は無視）
+        blur_strength (int): ぼかしの強さ（奇数、大きいほど強い）
+    """
+    # ぼかし強度を奇数に調整
+    if blur_strength % 2 == 0:
+        blur_strength += 1
+
+    # 検出された各顔にぼかしを適用
+    for box in boxes:
+        x, y, w, h = box[:4]
+        # 画像からはみ出した部分は除く（負の座標のままスライスすると空になり GaussianBlur が失敗する）
+        x0, y0 = max(0, int(x)), max(0, int(y))
+        x1, y1 = min(image.shape[1], int(x + w)), min(image.shape[0], int(y + h))
+        if x1 <= x0 or y1 <= y0:
+            continue
+        # 顔領域を取得
+        face_region = image[y0:y1, x0:x1]
+
+        # Gaussian ぼかしを適用
+        blurred_face = cv2.GaussianBlur(face_region, (blur_strength, blur_strength), 0)
+
+        # ぼかした顔を元の画像に戻す
+        image[y0:y1, x0:x1] = blurred_face
+
+
+def blur_faces_in_image(image, blur_strength, detector):
+    """
+    画像（BGR 配列）内の顔を検出し、その場でぼかす
+
+    Args:
+        image (numpy.ndarray): 入力画像（上書きされる）
         blur_strength (int): ぼかしの強さ（奇数、大きいほど強い）
+        detector (FaceDetector): 顔検出器
 
     Returns:
         int: 検出された顔の数
     """
-    # 画像を読み込む
+    boxes = detector.detect(image)
+    apply_blur(image, boxes, blur_strength)
+    return len(boxes)
+
+
+def write_image_atomic(path, image):
+    """一時ファイルに書いてから置き換える（途中で止まっても壊れたフレームを残さない）"""
+    path = str(path)
+    directory, name = os.path.split(path)
+    stem, ext = os.path.splitext(name)
+    # 拡張子で保存形式が決まるので、一時ファイルも同じ拡張子にする
+    tmp = os.path.join(directory, f".{stem}.tmp{ext}")
+    if not cv2.imwrite(tmp, image):
+        raise RuntimeError(f"画像を保存できませんでした: {path}")
+    os.replace(tmp, path)
+
+
+def _save_result(image, face_count, image_path, output_path):
+    """
+    ぼかした結果を保存する
+
+    顔がなかったフレームは再エンコードしない（上書きならそのまま、別フォルダならファイルをコピー）。
+    """
+    if face_count:
+        write_image_atomic(output_path, image)
+    elif os.path.abspath(output_path) != os.path.abspath(image_path):
+        tmp = os.path.join(os.path.dirname(output_path), f".{os.path.basename(output_path)}.tmp")
+        shutil.copy2(image_path, tmp)
+        os.replace(tmp, output_path)
+
+
+def _blur_path(image_path, output_path, blur_strength, detector, known=None):
+    """
+    1枚の画像の顔をぼかして保存する
+
+    known に記録済みの検出結果 ((幅, 高さ), 枠のリスト, 検出の設定) を渡すと、画像の大きさが同じなら検出せずにその枠をぼかす。
+
+    Returns:
+        tuple | None: ((幅, 高さ), ぼかした枠のリスト, 検出したか)。読み込めなければ None
+    """
     image = cv2.imread(image_path)
     if image is None:
         print(f"エラー: 画像 '{image_path}' を読み込めませんでした")
-        return 0
+        return None
+    size = (image.shape[1], image.shape[0])
+    detected = known is None or tuple(known[0]) != size
+    boxes = detector.detect(image) if detected else known[1]
+    apply_blur(image, boxes, blur_strength)
+    _save_result(image, len(boxes), image_path, output_path)
+    return size, boxes, detected
 
-    # グレースケールに変換
-    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-    # 顔検出器を読み込む（OpenCVのHaar Cascade分類器）
-    face_cascade = cv2.CascadeClassifier(
-        cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-    )
+def blur_tracked_frames(pairs, blur_strength, detector, track_every):
+    """
+    連続したフレームを順番に追跡モードでぼかして保存する
 
-    # 顔を検出
-    faces = face_cascade.detectMultiScale(
-        gray,
-        scaleFactor=1.1,
-        minNeighbors=5,
-        minSize=(30, 30)
-    )
+    Args:
+        pairs (list): [(入力パス, 出力パス), ...]（フレーム順）
 
-    # ぼかし強度を奇数に調整
-    if blur_strength % 2 == 0:
-        blur_strength += 1
+    Returns:
+        tuple: (フレームごとの ((幅, 高さ), 枠のリスト, True) のリスト（読み込めなかったフレームは None）, 検出を実行した回数)
+    """
+    tracker = FaceTracker(detector, detect_every=track_every)
+    results = []
+    for image_path, output_path in pairs:
+        image = cv2.imread(image_path)
+        if image is None:
+            print(f"エラー: 画像 '{image_path}' を読み込めませんでした")
+            tracker.reset()
+            results.append(None)
+            continue
+        boxes = tracker.update(image)
+        apply_blur(image, boxes, blur_strength)
+        _save_result(image, len(boxes), image_path, output_path)
+        results.append(((image.shape[1], image.shape[0]), boxes, True))
+    return results, tracker.detections
+
+
+def blur_faces(image_path, output_path, blur_strength=51, detector=None):
+    """
+    画像内の顔を検出してぼかす
 
-    # 検出された各顔にぼかしを適用
-    for (x, y, w, h) in faces:
-        # 顔領域を取得
-        face_region = image[y:y+h, x:x+w]
+    顔が見つかったときだけ保存する（一時ファイル経由で置き換え）。
+    顔がなく output_path が別のパスなら、入力をそのままコピーする。
 
-        # Gaussian ぼかしを適用
-        blurred_face = cv2.GaussianBlur(face_region, (blur_strength, blur_strength), 0)
+    Args:
+        image_path (str): 入力画像のパス
+        output_path (str): 出力画像のパス（入力と同じなら上書き）
+        blur_strength (int): ぼかしの強さ（奇数、大きいほど強い）
+        detector (FaceDetector): 顔検出器（省略時はその場で読み込む。繰り返し呼ぶ場合は渡すこと）
+
+    Returns:
+        int: 検出された顔の数
+    """
+    result = _blur_path(image_path, output_path, blur_strength, detector or FaceDetector())
+    return len(result[1]) if result else 0
+
+
+# プロセスプールの各ワーカーが持つ顔検出器（_init_worker で1回だけ読み込む）
+_worker_detector = None
+
+
+def _init_worker(detector_options, single_thread):
+    global _worker_detector
+    if single_thread:
+        # プロセス数ぶん並列にしているので、OpenCV 内部のスレッドは使わない
+        cv2.setNumThreads(1)
+    _worker_detector = FaceDetector(**detector_options)
 
-        # ぼかした顔を元の画像に戻す
-        image[y:y+h, x:x+w] = blurred_face
 
-    # 結果を保存
-    cv2.imwrite(output_path, image)
+def _blur_file(image_path, output_path, blur_strength, known=None):
+    """プロセスプール用: 1枚の画像の顔をぼかして保存する（戻り値は _blur_path と同じ）"""
+    return _blur_path(image_path, output_path, blur_strength, _worker_detector, known)
 
-    return len(faces)
 
+def _blur_chunk(pairs, blur_strength, track_every):
+    """プロセスプール用: 連続したフレームを追跡モードでぼかす"""
+    return blur_tracked_frames(pairs, blur_strength, _worker_detector, track_every)
 
-def process_folder(input_folder, blur_strength=51):
+
+def _split_chunks(items, count):
+    """フレームの並びを count 個の連続した区間に分ける"""
+    size, extra = divmod(len(items), count)
+    chunks, start = [], 0
+    for i in range(count):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(items[start:end])
+        start = end
+    return [chunk for chunk in chunks if chunk]
+
+
+class BlurRecord:
+    """
+    顔ぼかしの処理記録（出力フォルダの .blur_record.json）
+
+    frames: {フレーム名: [サイズ, mtime_ns, 顔の数, パラメータ]}
+    サイズ・mtime は処理後の入力フレームのもの（上書きなら保存後のファイル）。
+    再実行時、記録と一致するフレームは処理済みとしてスキップする。
+    """
+
+    def __init__(self, output_dir):
+        self.path = Path(output_dir) / BLUR_RECORD_NAME
+        self.frames = {}
+        self._dirty = False
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            if data.get("version") == BLUR_RECORD_VERSION:
+                self.frames = data.get("frames", {})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"[警告] 処理記録を読み込めないため作り直します: {self.path.name} ({e})")
+
+    def is_done(self, image_path, output_path, params, in_place):
+        """
+        処理済みなら True
+
+        上書きの場合は元のフレームが残っていないので、パラメータが変わっていても作り直さない。
+        別フォルダの場合はパラメータが同じで、出力が残っているときだけ処理済みとみなす。
+        """
+        rec = self.frames.get(image_path.name)
+        if rec is None:
+            return False
+        st = image_path.stat()
+        if rec[0] != st.st_size or rec[1] != st.st_mtime_ns:
+            return False
+        return in_place or (rec[3] == params and output_path.exists())
+
+    def record(self, image_path, face_count, params):
+        st = image_path.stat()
+        self.frames[image_path.name] = [st.st_size, st.st_mtime_ns, face_count, params]
+        self._dirty = True
+
+    def save(self):
+        """変更があれば保存する（一時ファイルに書いてから置き換える）"""
+        if not self._dirty:
+            return
+        data = {"version": BLUR_RECORD_VERSION, "frames": self.frames}
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
+        self._dirty = False
+
+
+def process_folder(input_folder, blur_strength=51, workers=None, detect_width=None,
+                   backend=None, projection=None, track_every=None, output_folder=None, force=False,
+                   from_detections=False):
     """
     フォルダ内の全画像の顔をぼかす
-    frames フォルダ内の画像を上書きして保存
+
+    output_folder を省略すると frames フォルダ内の画像を上書きする（顔のあったフレームだけ）。
+    処理記録（.blur_record.json）と一致するフレームはスキップする。
+    検出した枠は入力フォルダの detections.npz に記録する（detection_index.py）。
+    from_detections=True なら、記録のあるフレームは検出せずにその枠をぼかす
+    （別の強さでぼかし直す場合。上書き済みのフレームは force=True が必要）。
 
     Args:
         input_folder (str): 入力フォルダのパス（frames フォルダ）
         blur_strength (int): ぼかしの強さ
+        workers (int): 並列プロセス数（デフォルト: config.BLUR_WORKERS、1 なら逐次）
+        detect_width (int): 検出に使う縮小幅（デフォルト: config.FACE_DETECT_WIDTH、0 なら縮小しない）
+        backend (str): 顔検出器 "haar" / "yunet"（デフォルト: config.FACE_BACKEND）
+        projection (str): 検出モード "equirect" / "tiles" / "cube"（デフォルト: config.FACE_PROJECTION）
+        track_every (int): 追跡モードで検出する間隔 K（デフォルト: config.FACE_TRACK_INTERVAL、0 / 1 なら全フレームで検出）
+        output_folder (str): 出力フォルダ（省略時は入力を上書き）
+        force (bool): True なら処理記録を無視して全フレームを処理する
+        from_detections (bool): True なら detections.npz の枠を使い、記録のないフレームだけ検出する
+
+    Returns:
+        int: 検出した顔の総数
     """
     input_path = Path(input_folder)
 
@@ -82,10 +296,10 @@ def process_folder(input_folder, blur_strength=51):
     # サポートする画像拡張子
     image_extensions = {'.jpg', '.jpeg', '.png', '.bmp', '.tiff', '.webp'}
 
-    # フォルダ内の画像ファイルを取得
+    # フォルダ内の画像ファイルを取得（一時ファイルは除く）
     image_files = [
         f for f in input_path.iterdir()
-        if f.suffix.lower() in image_extensions
+        if f.suffix.lower() in image_extensions and not f.name.startswith('.')
     ]
 
     if not image_files:
@@ -95,31 +309,142 @@ def process_folder(input_folder, blur_strength=51):
     # ファイルをソート（順序を保証）
     image_files.sort()
 
-    print(f"処理対象: {len(image_files)} 枚の画像")
-    print(f"出力先: {input_path} (上書き)")
+    output_path = Path(output_folder) if output_folder else input_path
+    output_path.mkdir(parents=True, exist_ok=True)
+    in_place = output_path.resolve() == input_path.resolve()
+
+    if detect_width is None:
+        detect_width = config.FACE_DETECT_WIDTH
+    detector_options = dict(
+        detect_width=detect_width,
+        backend=backend or config.FACE_BACKEND,
+        projection=projection or config.FACE_PROJECTION,
+    )
+    if track_every is None:
+        track_every = config.FACE_TRACK_INTERVAL
+    tracking = bool(track_every and track_every > 1)
+    detect_params = (f"{detector_options['backend']}:{detector_options['projection']}"
+                     f":{detect_width}:{track_every if tracking else 0}")
+    params = f"{blur_strength}:{detect_params}"
+    index = DetectionIndex(input_path)
+
+    record = BlurRecord(output_path)
+    pending = [
+        f for f in image_files
+        if force or not record.is_done(f, output_path / f.name, params, in_place)
+    ]
+
+    print(f"処理対象: {len(pending)} 枚の画像（処理済みでスキップ: {len(image_files) - len(pending)} 枚）")
+    print(f"出力先: {output_path}" + (" (顔のあるフレームだけ上書き)" if in_place else ""))
+    if not pending:
+        print("すべて処理済みです（やり直す場合は --force）")
+        return 0
+
+    if workers is None:
+        workers = config.BLUR_WORKERS or os.cpu_count() or 1
+    workers = max(1, min(workers, len(pending)))
+
+    known = [None] * len(pending)
+    if from_detections:
+        known = [index.frames.get(f.name) for f in pending]
+        reused = sum(entry is not None for entry in known)
+        print(f"検出結果を再利用: {reused} 枚（{index.path.name}）、検出するフレーム: {len(pending) - reused} 枚")
+        other = sum(entry is not None and entry[2] != detect_params for entry in known)
+        if other:
+            print(f"（うち {other} 枚は今回と別の設定で検出した枠です。記録はその設定のまま残します）")
+        if tracking and reused:
+            # 記録された枠は追跡済みのものなので、追跡し直さない
+            print("（検出結果を再利用するため、追跡モードは使いません）")
+            tracking = False
+
     print(f"ぼかし強度: {blur_strength}")
+    print(f"並列数: {workers}  検出幅: {detect_width or '元の解像度'}"
+          f"  検出器: {detector_options['backend']}  検出モード: {detector_options['projection']}")
+    if tracking:
+        print(f"追跡モード: {track_every} フレームごと（またはシーン切り替え時）に検出")
     print("\n処理を開始します...\n")
 
     total_faces = 0
     processed_count = 0
+    failed_count = 0
+    detections = None
+    pairs = [(str(f), str(output_path / f.name)) for f in pending]
+
+    if tracking:
+        # 追跡は前のフレームに依存するので、連続した区間ごとに1つのワーカーで順番に処理する
+        chunks = _split_chunks(pairs, workers)
+        if workers == 1:
+            chunk_results = [blur_tracked_frames(chunks[0], blur_strength, FaceDetector(**detector_options),
+                                                 track_every)]
+            pool = None
+        else:
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(detector_options, True),
+            )
+            chunk_results = pool.map(_blur_chunk, chunks, [blur_strength] * len(chunks),
+                                     [track_every] * len(chunks))
+        detections = 0
+
+        def _counts():
+            nonlocal detections
+            for frame_results, n in chunk_results:
+                detections += n
+                yield from frame_results
+
+        results = _counts()
+    elif workers == 1:
+        # 逐次処理（検出器は1回だけ読み込む）
+        detector = FaceDetector(**detector_options)
+        results = (_blur_path(src, dst, blur_strength, detector, entry)
+                   for (src, dst), entry in zip(pairs, known))
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(detector_options, True),
+        )
+        # 順番どおりに結果を受け取る（プロセス間のやり取りを減らすため数枚ずつ渡す）
+        chunksize = max(1, min(8, len(pairs) // (workers * 4)))
+        results = pool.map(_blur_file, [src for src, _ in pairs], [dst for _, dst in pairs],
+                           [blur_strength] * len(pairs), known, chunksize=chunksize)
 
-    for i, image_file in enumerate(image_files, 1):
-        input_image_path = str(image_file)
-        # 同じファイルに上書き保存
-        output_image_path = str(image_file)
-
-        # 顔検出とぼかし処理
-        face_count = blur_faces(input_image_path, output_image_path, blur_strength)
-
-        total_faces += face_count
-        processed_count += 1
-
-        print(f"[{i}/{len(image_files)}] {image_file.name}: {face_count}個の顔を検出")
+    try:
+        for i, (image_file, result) in enumerate(zip(pending, results), 1):
+            if result is None:
+                failed_count += 1
+                continue
+            size, boxes, detected = result
+            face_count = len(boxes)
+            total_faces += face_count
+            processed_count += 1
+            if detected:
+                index.set(image_file.name, size, boxes, detect_params)
+                record.record(image_file, face_count, params)
+            else:
+                # 再利用した枠は、それを検出したときの設定で記録する
+                record.record(image_file, face_count, f"{blur_strength}:{index.params(image_file.name)}")
+
+            print(f"[{i}/{len(pending)}] {image_file.name}: {face_count}個の顔を検出")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        # 中断しても、終わったフレームの記録は残す
+        record.save()
+        index.save()
 
     print(f"\n完了!")
     print(f"  - 処理した画像: {processed_count} 枚")
+    if detections is not None:
+        print(f"  - 検出を実行したフレーム: {detections} 枚")
     print(f"  - 検出した顔の総数: {total_faces} 個")
-    print(f"  - 保存先: {input_path}")
+    print(f"  - 保存先: {output_path}")
+    print(f"  - 検出結果: {index.path}（{len(index)} フレーム）")
+    if failed_count:
+        print(f"\n⚠️  {failed_count} 枚の画像を読み込めませんでした")
+    return total_faces
 
 
 def main():
@@ -133,6 +458,22 @@ def main():
     parser.add_argument('folder', help='output/ 内のフォルダ名（例: test_145frames_0min4sec_20260122_211204）')
     parser.add_argument('-b', '--blur', type=int, default=51,
                         help='ぼかしの強さ（奇数、デフォルト: 51）')
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='並列プロセス数（デフォルト: config.BLUR_WORKERS）')
+    parser.add_argument('--detect-width', type=int, default=None,
+                        help='検出に使う縮小幅（0 = 縮小しない、デフォルト: config.FACE_DETECT_WIDTH）')
+    parser.add_argument('--backend', choices=BACKENDS, default=None,
+                        help='顔検出器（デフォルト: config.FACE_BACKEND）')
+    parser.add_argument('--projection', choices=PROJECTIONS, default=None,
+                        help='検出モード（デフォルト: config.FACE_PROJECTION）')
+    parser.add_argument('--track', type=int, default=None, metavar='K',
+                        help='追跡モード: K フレームごとにだけ検出し、間は枠を追跡（デフォルト: config.FACE_TRACK_INTERVAL）')
+    parser.add_argument('--separate', action='store_true',
+                        help=f'frames を上書きせず {config.BLUR_OUTPUT_FOLDER_NAME}/ に保存する')
+    parser.add_argument('--force', action='store_true',
+                        help='処理記録を無視して全フレームを処理し直す')
+    parser.add_argument('--from-detections', action='store_true',
+                        help='detections.npz の枠を使い、検出せずにぼかす（別の強さでぼかし直す場合）')
 
     args = parser.parse_args()
 
@@ -149,7 +490,10 @@ def main():
 
     # 顔ぼかし処理を実行
     try:
-        process_folder(str(frame_folder), args.blur)
+        output_folder = config.OUTPUT_DIR / folder_name / config.BLUR_OUTPUT_FOLDER_NAME if args.separate else None
+        process_folder(str(frame_folder), args.blur, args.workers, args.detect_width,
+                       args.backend, args.projection, args.track, output_folder, args.force,
+                       args.from_detections)
         return 0
     except Exception as e:
         print(f"エラー: {e}")
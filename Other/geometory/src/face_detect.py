@@ -0,0 +1,240 @@
+"""
+顔検出（face_blur.py / stream_pipeline.py で使用）
+
+検出器のバックエンド（config.FACE_BACKEND）:
+    haar  : OpenCV の Haar Cascade（追加ファイル不要。正面の顔のみ）
+    yunet : OpenCV の FaceDetectorYN（CPU で動く DNN。横顔・小さい顔に強い）
+            モデル face_detection_yunet_2023mar.onnx を別途ダウンロードし、
+            config.FACE_YUNET_MODEL にパスを設定する
+
+Equirect フレームの見え方（config.FACE_PROJECTION）:
+    equirect : フレーム全体を FACE_DETECT_WIDTH に縮小して検出（最速）
+    tiles    : 縮小したフレームを重なりのあるタイルに分けて検出。
+               左右の継ぎ目をまたぐタイルも作る（DNN は入力サイズが小さい方が安定する）
+    cube     : キューブマップの6面に変換して検出し、枠を Equirect に戻す。
+               極付近で歪んだ顔も、歪みの少ない面で検出できる。
+               面の境目で顔が切れないよう、各面は 90° より広い FACE_CUBE_FOV で作る
+
+複数のタイル・面で重なって検出された枠は NMS でまとめる。
+どのモードでも、枠は元の解像度の Equirect 座標 (x, y, w, h, score) で、画像内に収めて返す
+（左右にはみ出した枠は継ぎ目の反対側に回り込む2つの枠にする）。
+"""
+
+import cv2
+import numpy as np
+
+import config
+import equirect_remap
+
+BACKENDS = ("haar", "yunet")
+PROJECTIONS = ("equirect", "tiles", "cube")
+
+# キューブマップの6面 (yaw, pitch)
+CUBE_FACES = ((0, 0), (90, 0), (180, 0), (-90, 0), (0, 90), (0, -90))
+
+
+class HaarBackend:
+    """Haar Cascade（score は分類器の最終段の重み）"""
+
+    def __init__(self):
+        self.cascade = cv2.CascadeClassifier(
+            cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        )
+        if self.cascade.empty():
+            raise RuntimeError("顔検出器（haarcascade_frontalface_default.xml）を読み込めませんでした")
+
+    def detect(self, image, min_size):
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        faces, _, weights = self.cascade.detectMultiScale3(
+            gray,
+            scaleFactor=config.FACE_SCALE_FACTOR,
+            minNeighbors=config.FACE_MIN_NEIGHBORS,
+            minSize=(min_size, min_size),
+            outputRejectLevels=True
+        )
+        return [(int(x), int(y), int(w), int(h), float(s)) for (x, y, w, h), s in zip(faces, weights)]
+
+
+class YuNetBackend:
+    """OpenCV の FaceDetectorYN（score は 0-1 の信頼度）"""
+
+    def __init__(self):
+        model = config.FACE_YUNET_MODEL
+        if not model:
+            raise RuntimeError("yunet を使うには config.FACE_YUNET_MODEL に ONNX モデルのパスを設定してください")
+        self.detector = cv2.FaceDetectorYN.create(
+            str(model), "", (320, 320),
+            score_threshold=config.FACE_YUNET_SCORE,
+            nms_threshold=config.FACE_NMS_IOU,
+        )
+        self._size = (320, 320)
+
+    def detect(self, image, min_size):
+        h, w = image.shape[:2]
+        if (w, h) != self._size:
+            self.detector.setInputSize((w, h))
+            self._size = (w, h)
+        _, faces = self.detector.detect(image)
+        if faces is None:
+            return []
+        return [
+            (int(f[0]), int(f[1]), int(f[2]), int(f[3]), float(f[-1]))
+            for f in faces if f[2] >= min_size and f[3] >= min_size
+        ]
+
+
+def create_backend(name=None):
+    name = name or config.FACE_BACKEND
+    if name == "haar":
+        return HaarBackend()
+    if name == "yunet":
+        return YuNetBackend()
+    raise RuntimeError(f"不明な顔検出バックエンド: {name}（{', '.join(BACKENDS)} のいずれか）")
+
+
+def nms(boxes, iou_threshold=None):
+    """重なった枠をまとめる（score の高い枠を残す。Haar の score は負にもなるので自前で計算する）"""
+    if len(boxes) <= 1:
+        return list(boxes)
+    iou_threshold = config.FACE_NMS_IOU if iou_threshold is None else iou_threshold
+    b = np.array([box[:5] for box in boxes], dtype=np.float64)
+    x0, y0 = b[:, 0], b[:, 1]
+    x1, y1 = x0 + b[:, 2], y0 + b[:, 3]
+    area = b[:, 2] * b[:, 3]
+    order = list(np.argsort(-b[:, 4], kind="stable"))
+    keep = []
+    while order:
+        i = order.pop(0)
+        keep.append(boxes[i])
+        rest = np.array(order, dtype=int)
+        if rest.size == 0:
+            break
+        iw = np.clip(np.minimum(x1[i], x1[rest]) - np.maximum(x0[i], x0[rest]), 0, None)
+        ih = np.clip(np.minimum(y1[i], y1[rest]) - np.maximum(y0[i], y0[rest]), 0, None)
+        inter = iw * ih
+        iou = inter / np.maximum(area[i] + area[rest] - inter, 1e-9)
+        order = [j for j, o in zip(order, iou) if o <= iou_threshold]
+    return keep
+
+
+def wrap_boxes(boxes, width, height):
+    """
+    枠を Equirect 画像内に収める
+
+    上下にはみ出した分は切り詰め、左右にはみ出した分は継ぎ目の反対側の枠にする。
+    バックエンド（特に YuNet）は画像の端にかかる顔に負の座標や画像外まで伸びた枠を返す。
+    """
+    result = []
+    for (x, y, w, h, score) in boxes:
+        y0, y1 = max(0, int(y)), min(height, int(y + h))
+        if y1 <= y0 or w <= 0:
+            continue
+        x0 = int(x) % width
+        x1 = x0 + min(int(w), width)
+        if x1 > width:
+            result.append((x0, y0, width - x0, y1 - y0, score))
+            result.append((0, y0, x1 - width, y1 - y0, score))
+        else:
+            result.append((x0, y0, x1 - x0, y1 - y0, score))
+    return result
+
+
+def _tile_origins(length, tile, step):
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, step))
+    return origins + [length - tile]
+
+
+class FaceDetector:
+    """
+    顔検出器（バックエンドの読み込みは生成時の1回だけ）
+
+    detect_width を指定すると、その幅に縮小した画像で検出して枠を元の座標に戻す
+    （0 / None なら元の解像度で検出。cube の場合は面の大きさの基準になる）。
+    縮小すると、縮小後に約 24px 未満になる小さな顔は検出できなくなる。
+    """
+
+    def __init__(self, detect_width=None, backend=None, projection=None, min_size=None):
+        self.backend_name = backend or config.FACE_BACKEND
+        self.backend = create_backend(self.backend_name)
+        self.projection = projection or config.FACE_PROJECTION
+        if self.projection not in PROJECTIONS:
+            raise RuntimeError(f"不明な検出モード: {self.projection}（{', '.join(PROJECTIONS)} のいずれか）")
+        self.detect_width = config.FACE_DETECT_WIDTH if detect_width is None else detect_width
+        self.min_size = min_size or config.FACE_MIN_SIZE
+        self.cache = equirect_remap.RemapCache()
+
+    def detect(self, image):
+        """
+        画像（BGR の Equirect フレーム）から顔を検出する
+
+        Returns:
+            list: 元の解像度での顔の枠 [(x, y, w, h, score), ...]
+        """
+        height, width = image.shape[:2]
+        if self.projection == "cube":
+            return wrap_boxes(self._detect_cube(image), width, height)
+
+        scale = 1.0
+        small = image
+        if self.detect_width and width > self.detect_width:
+            scale = self.detect_width / width
+            small = cv2.resize(image, (self.detect_width, max(1, round(height * scale))),
+                               interpolation=cv2.INTER_AREA)
+        min_size = max(1, round(self.min_size * scale))
+
+        if self.projection == "tiles":
+            boxes = self._detect_tiles(small, min_size)
+        else:
+            boxes = self.backend.detect(small, min_size)
+        boxes = wrap_boxes(boxes, small.shape[1], small.shape[0])
+
+        if scale == 1.0:
+            return boxes
+        result = []
+        for (x, y, w, h, score) in boxes:
+            # 縮小前の座標に戻す（縮小の誤差ぶん1px広げ、画像内に収める）
+            x0 = max(0, int((x - 1) / scale))
+            y0 = max(0, int((y - 1) / scale))
+            x1 = min(width, int((x + w + 1) / scale + 0.5))
+            y1 = min(height, int((y + h + 1) / scale + 0.5))
+            result.append((x0, y0, x1 - x0, y1 - y0, score))
+        return result
+
+    def _detect_tiles(self, image, min_size):
+        """重なりのあるタイルで検出する（右端に左端を継ぎ足して、継ぎ目の顔も拾う）"""
+        height, width = image.shape[:2]
+        tile = min(config.FACE_TILE_SIZE, height, width)
+        step = max(1, int(tile * (1 - config.FACE_TILE_OVERLAP)))
+        pad = tile - step
+        wrapped = np.concatenate([image, image[:, :pad]], axis=1) if pad > 0 else image
+
+        boxes = []
+        for ty in _tile_origins(height, tile, step):
+            for tx in _tile_origins(wrapped.shape[1], tile, step):
+                crop = wrapped[ty:ty + tile, tx:tx + tile]
+                # 継ぎ目をまたぐ枠は左右に分ける
+                boxes += wrap_boxes([(x + tx, y + ty, w, h, score)
+                                     for (x, y, w, h, score) in self.backend.detect(crop, min_size)],
+                                    width, height)
+        return nms(boxes)
+
+    def _detect_cube(self, image):
+        """キューブマップの6面で検出し、枠を Equirect 座標に戻す"""
+        height, width = image.shape[:2]
+        base = self.detect_width or width
+        fov = config.FACE_CUBE_FOV
+        # 面の中心付近の画素の大きさを、縮小した Equirect の赤道付近と揃える
+        face_size = config.FACE_CUBE_SIZE or max(64, round(base / 4 * np.tan(np.radians(fov) / 2)))
+        min_size = max(1, round(self.min_size * face_size / (width / 4 * np.tan(np.radians(fov) / 2))))
+
+        boxes = []
+        for yaw, pitch in CUBE_FACES:
+            view = equirect_remap.remap_view(image, yaw, pitch, 0, self.cache,
+                                             out_w=face_size, out_h=face_size, h_fov=fov, v_fov=fov)
+            for box in self.backend.detect(view, min_size):
+                for (x, y, w, h) in equirect_remap.view_box_to_equirect(
+                        box, yaw, pitch, 0, face_size, face_size, fov, fov, width, height):
+                    boxes.append((x, y, w, h, box[4]))
+        return nms(boxes)
@@ -0,0 +1,145 @@
+"""
+顔の追跡（face_blur.py の追跡モードで使用）
+
+連続した動画フレームはほとんど同じなので、全フレームで顔検出をする代わりに
+    - K フレームごと（config.FACE_TRACK_INTERVAL）
+    - シーンが切り替わったとき（縮小画像の平均輝度差が config.FACE_TRACK_SCENE_THRESHOLD を超えた）
+だけ検出し、その間のフレームは直前の枠を optical flow（Lucas-Kanade）で動かす。
+検出の回数はおよそ 1/K になる。
+
+追跡した枠は動きの誤差ぶん config.FACE_TRACK_DILATE の割合だけ広げてからぼかす。
+検出で一時的に見つからなかった顔も、config.FACE_TRACK_MAX_MISSES 回までは追跡を続けるので、
+フレームごとに単独で検出する場合よりぼかしのちらつきが減る。
+"""
+
+import cv2
+import numpy as np
+
+import config
+
+# 直前の枠と新しい検出を同じ顔とみなす IoU
+MATCH_IOU = 0.3
+# 枠の移動量を決めるのに必要な、追跡できた特徴点の数
+MIN_TRACKED_POINTS = 3
+
+
+def _iou(a, b):
+    iw = max(0.0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    ih = max(0.0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    inter = iw * ih
+    union = a[2] * a[3] + b[2] * b[3] - inter
+    return inter / union if union > 0 else 0.0
+
+
+class FaceTracker:
+    """
+    1本の動画（連続したフレーム）用の追跡器
+
+    フレームは必ず順番に update() に渡すこと。別の動画・飛び飛びのフレームに使う場合は reset() する。
+    """
+
+    def __init__(self, detector, detect_every=None, scene_threshold=None, dilate=None,
+                 track_width=None, max_misses=None):
+        self.detector = detector
+        self.detect_every = max(1, detect_every or config.FACE_TRACK_INTERVAL or 1)
+        self.scene_threshold = config.FACE_TRACK_SCENE_THRESHOLD if scene_threshold is None else scene_threshold
+        self.dilate = config.FACE_TRACK_DILATE if dilate is None else dilate
+        self.track_width = track_width or config.FACE_TRACK_WIDTH
+        self.max_misses = config.FACE_TRACK_MAX_MISSES if max_misses is None else max_misses
+        self.detections = 0
+        self.frames = 0
+        self.reset()
+
+    def reset(self):
+        """追跡中の枠を捨て、次のフレームで必ず検出する"""
+        # 追跡中の枠 [x, y, w, h, score, 見逃した回数]（元の解像度、float）
+        self.tracks = []
+        self._prev_gray = None
+        self._prev_signature = None
+        self._since_detect = None
+
+    def update(self, image):
+        """
+        次のフレームの顔の枠を返す
+
+        Args:
+            image (numpy.ndarray): BGR のフレーム（元の解像度）
+
+        Returns:
+            list: ぼかす枠 [(x, y, w, h, score), ...]（広げたあと、画像内に収めた整数座標）
+        """
+        height, width = image.shape[:2]
+        scale = min(1.0, self.track_width / width)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        if scale < 1.0:
+            gray = cv2.resize(gray, (self.track_width, max(1, round(height * scale))),
+                              interpolation=cv2.INTER_AREA)
+        signature = cv2.resize(gray, (64, max(1, 64 * gray.shape[0] // gray.shape[1])),
+                               interpolation=cv2.INTER_AREA).astype(np.float32)
+
+        scene_changed = (
+            self._prev_signature is not None
+            and float(np.mean(np.abs(signature - self._prev_signature))) > self.scene_threshold
+        )
+        if scene_changed:
+            self.tracks = []
+        if self._since_detect is None or scene_changed or self._since_detect + 1 >= self.detect_every:
+            self._detect(image)
+            self._since_detect = 0
+        else:
+            self._propagate(self._prev_gray, gray, scale)
+            self._since_detect += 1
+
+        self._prev_gray = gray
+        self._prev_signature = signature
+        self.frames += 1
+        return self._output_boxes(width, height)
+
+    def _detect(self, image):
+        """検出結果で枠を置き換える（見つからなかった既存の枠は max_misses 回まで残す）"""
+        found = [list(map(float, box[:5])) + [0] for box in self.detector.detect(image)]
+        self.detections += 1
+        kept = []
+        for track in self.tracks:
+            if any(_iou(track, box) >= MATCH_IOU for box in found):
+                continue
+            track[5] += 1
+            if track[5] <= self.max_misses:
+                kept.append(track)
+        self.tracks = found + kept
+
+    def _propagate(self, prev_gray, gray, scale):
+        """各枠の中の特徴点を optical flow で追い、移動量の中央値だけ枠を動かす"""
+        for track in self.tracks:
+            x, y, w, h = (v * scale for v in track[:4])
+            x0, y0 = max(0, int(x)), max(0, int(y))
+            x1, y1 = min(gray.shape[1], int(np.ceil(x + w))), min(gray.shape[0], int(np.ceil(y + h)))
+            if x1 - x0 < 4 or y1 - y0 < 4:
+                continue
+            mask = np.zeros_like(prev_gray)
+            mask[y0:y1, x0:x1] = 255
+            points = cv2.goodFeaturesToTrack(prev_gray, maxCorners=40, qualityLevel=0.01,
+                                             minDistance=2, mask=mask)
+            if points is None or len(points) < MIN_TRACKED_POINTS:
+                continue
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(prev_gray, gray, points, None,
+                                                        winSize=(15, 15), maxLevel=2)
+            ok = status.ravel() == 1
+            if ok.sum() < MIN_TRACKED_POINTS:
+                # 追えなかった枠はその場に残す（広げた分で多少の動きは覆える）
+                continue
+            dx, dy = np.median((moved[ok] - points[ok]).reshape(-1, 2), axis=0) / scale
+            track[0] += float(dx)
+            track[1] += float(dy)
+
+    def _output_boxes(self, width, height):
+        boxes = []
+        for x, y, w, h, score, _ in self.tracks:
+            pad_w, pad_h = w * self.dilate, h * self.dilate
+            x0 = max(0, int(x - pad_w))
+            y0 = max(0, int(y - pad_h))
+            x1 = min(width, int(np.ceil(x + w + pad_w)))
+            y1 = min(height, int(np.ceil(y + h + pad_h)))
+            if x1 > x0 and y1 > y0:
+                boxes.append((x0, y0, x1 - x0, y1 - y0, score))
+        return boxes
@@ -2,10 +2,12 @@
 main.py - フレーム抽出 → (顔ぼかし) → パースペクティブ変換のメインスクリプト
 
 使用方法:
-    python main.py extract <video_file>
-    python main.py blur <output_folder>
-    python main.py convert <output_folder>
-    python main.py pipeline <video_file> [--blur] [--dense]
+    python main.py extract <video_file> [--interval N | --every-sec S | --timestamps T1,T2,...]
+                                        [--keyframes [--keyframes-target N]]
+    python main.py blur <output_folder> [--jobs N] [--backend haar|yunet] [--projection equirect|tiles|cube] [--track K] [--separate] [--force] [--from-detections]
+    python main.py convert <output_folder> [--dense] [--engine ffmpeg|ffmpeg-split|remap] [--jobs N] [--blur-faces]
+                                        [--views cube|fibonacci|rings|auto [--overlap R]]
+    python main.py pipeline <video_file> [--blur] [--dense | --views ...] [--engine ...] [--jobs N] [--direct | --stream]
 """
 
 import argparse
@@ -14,9 +16,17 @@ from pathlib import Path
 
 # config と各機能をインポート
 import config
-from video_frame_extractor import extract_frames
+from video_frame_extractor import (
+    extract_frames,
+    extract_frames_interval,
+    extract_keyframes,
+    parse_timestamps,
+)
 from face_blur import process_folder as blur_faces_folder
-from batch_equirect2persp_ffmpeg import process_frames as convert_equirect
+from face_detect import BACKENDS, PROJECTIONS
+from batch_equirect2persp_ffmpeg import ENGINES, process_frames as convert_equirect, process_video
+from stream_pipeline import run_stream_pipeline
+from view_planner import LAYOUTS
 
 
 def cmd_extract(args):
@@ -24,6 +34,8 @@ def cmd_extract(args):
     フレーム抽出コマンド
 
     data/input/ 配下の動画ファイルを output/ に展開
+    --interval / --every-sec / --timestamps を指定した場合は間引き抽出する
+    --keyframes を指定した場合はシーン変化とシャープさで選んだフレームだけ抽出する
     """
     print(f"\n{'='*60}")
     print(f"🎬 フレーム抽出を開始します")
@@ -35,13 +47,44 @@ def cmd_extract(args):
         print(f"❌ エラー: '{video_path}' が見つかりません")
         return False
 
+    interval = getattr(args, 'interval', 1)
+    every_sec = getattr(args, 'every_sec', None)
+    timestamps = getattr(args, 'timestamps', None)
+    keyframes = getattr(args, 'keyframes', False)
+
+    if keyframes and timestamps is not None:
+        print(f"❌ エラー: --keyframes と --timestamps は同時に指定できません")
+        return False
+
     try:
-        extract_frames(
-            str(video_path),
-            str(config.OUTPUT_DIR),
-            prefix=config.FRAME_PREFIX,
-            extension=config.FRAME_EXTENSION
-        )
+        if keyframes:
+            extract_keyframes(
+                str(video_path),
+                str(config.OUTPUT_DIR),
+                prefix=config.FRAME_PREFIX,
+                extension=config.FRAME_EXTENSION,
+                target_count=args.keyframes_target,
+                diff_threshold=args.keyframes_threshold,
+                interval=interval,
+                every_sec=every_sec
+            )
+        elif interval == 1 and every_sec is None and timestamps is None:
+            extract_frames(
+                str(video_path),
+                str(config.OUTPUT_DIR),
+                prefix=config.FRAME_PREFIX,
+                extension=config.FRAME_EXTENSION
+            )
+        else:
+            extract_frames_interval(
+                str(video_path),
+                str(config.OUTPUT_DIR),
+                interval=interval,
+                prefix=config.FRAME_PREFIX,
+                extension=config.FRAME_EXTENSION,
+                every_sec=every_sec,
+                timestamps=timestamps
+            )
         print(f"✅ フレーム抽出が完了しました\n")
         return True
     except Exception as e:
@@ -54,7 +97,8 @@ def cmd_blur(args):
     顔ぼかしコマンド
 
     output/<output_folder>/temp/frames/ 配下の画像に顔ぼかしを適用
-    結果を output/<output_folder>/face_blurred_frames/ に保存
+    顔のあったフレームだけ上書きする（--separate なら output/<output_folder>/face_blurred_frames/ に保存）
+    処理記録と一致するフレームはスキップする（--force でやり直し）
     """
     print(f"\n{'='*60}")
     print(f"😊 顔ぼかし処理を開始します")
@@ -70,7 +114,18 @@ def cmd_blur(args):
         return False
 
     try:
-        blur_faces_folder(str(frame_folder), config.BLUR_STRENGTH)
+        blur_faces_folder(
+            str(frame_folder),
+            config.BLUR_STRENGTH,
+            workers=getattr(args, 'jobs', None),
+            backend=getattr(args, 'backend', None),
+            projection=getattr(args, 'projection', None),
+            track_every=getattr(args, 'track', None),
+            output_folder=(config.OUTPUT_DIR / folder_name / config.BLUR_OUTPUT_FOLDER_NAME
+                           if getattr(args, 'separate', False) else None),
+            force=getattr(args, 'force', False),
+            from_detections=getattr(args, 'from_detections', False)
+        )
         print(f"✅ 顔ぼかしが完了しました\n")
         return True
     except Exception as e:
@@ -83,6 +138,8 @@ def cmd_convert(args):
     Equirect→パースペクティブ変換コマンド
 
     output/<output_folder>/temp/frames/ の画像を複数方向に変換
+    --jobs N で N 並列に変換する（Ctrl-C で中断すると実行中の ffmpeg も止める）
+    --blur-faces で blur の検出結果（detections.npz）を使い、各方向の出力側で顔をぼかす
     """
     print(f"\n{'='*60}")
     print(f"🔄 Equirect→パースペクティブ変換を開始します")
@@ -93,10 +150,18 @@ def cmd_convert(args):
     try:
         convert_equirect(
             folder_name,
-            use_dense_ring=args.dense
+            use_dense_ring=args.dense,
+            engine=getattr(args, 'engine', None),
+            jobs=getattr(args, 'jobs', None),
+            blur_faces=getattr(args, 'blur_faces', False),
+            views=getattr(args, 'views', None),
+            overlap=getattr(args, 'overlap', None)
         )
         print(f"✅ 変換が完了しました\n")
         return True
+    except KeyboardInterrupt:
+        print(f"❌ 中断しました\n")
+        return False
     except Exception as e:
         print(f"❌ エラー: {e}\n")
         return False
@@ -111,12 +176,13 @@ def cmd_pipeline(args):
     print(f"🚀 フルパイプラインを開始します")
     print(f"{'='*60}\n")
 
-    # Step 1: フレーム抽出
-    class ExtractArgs:
-        def __init__(self, video_file):
-            self.video_file = video_file
+    if args.direct:
+        return _pipeline_direct(args)
+    if args.stream:
+        return _pipeline_stream(args)
 
-    extract_ok = cmd_extract(ExtractArgs(args.video_file))
+    # Step 1: フレーム抽出（間引き指定もそのまま渡す）
+    extract_ok = cmd_extract(args)
     if not extract_ok:
         return False
 
@@ -146,11 +212,15 @@ def cmd_pipeline(args):
 
     # Step 3: パースペクティブ変換
     class ConvertArgs:
-        def __init__(self, folder, dense):
+        def __init__(self, folder, dense, engine, jobs, views=None, overlap=None):
             self.output_folder = folder
             self.dense = dense
+            self.engine = engine
+            self.jobs = jobs
+            self.views = views
+            self.overlap = overlap
 
-    convert_ok = cmd_convert(ConvertArgs(latest_folder, args.dense))
+    convert_ok = cmd_convert(ConvertArgs(latest_folder, args.dense, args.engine, args.jobs, args.views, args.overlap))
     if not convert_ok:
         return False
 
@@ -161,6 +231,104 @@ def cmd_pipeline(args):
     return True
 
 
+def add_sampling_args(parser):
+    """extract / pipeline 共通の間引き抽出・キーフレーム選択オプション"""
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--interval', type=int, default=1,
+                       help='Nフレームごとに1フレーム抽出 (デフォルト: 1=全フレーム)')
+    group.add_argument('--every-sec', type=float, default=None,
+                       help='N秒ごとに1フレーム抽出 (例: 2)')
+    group.add_argument('--timestamps', type=parse_timestamps, default=None,
+                       help='抽出する時刻（秒 または 分:秒、カンマ区切り。例: 0,12.5,1:30）')
+    parser.add_argument('--keyframes', action='store_true',
+                        help='シーン変化とシャープさでフレームを選んで抽出（--interval/--every-sec は候補の間引き）')
+    parser.add_argument('--keyframes-target', type=int, default=None,
+                        help='--keyframes で採用する枚数の目安（しきい値を自動調整）')
+    parser.add_argument('--keyframes-threshold', type=float, default=None,
+                        help='--keyframes の差分しきい値 0-255 (デフォルト: config.KEYFRAME_DIFF_THRESHOLD)')
+
+
+def add_view_args(parser):
+    """convert / pipeline 共通の方向の組の計画オプション"""
+    parser.add_argument('--views', choices=LAYOUTS, default=None,
+                        help='FOV と重なり率から方向の組を計画する (--dense より優先、デフォルト: config.VIEW_SET)')
+    parser.add_argument('--overlap', type=float, default=None,
+                        help='--views の方向ごとの重なり率の目標 0-1 (デフォルト: config.VIEW_OVERLAP)')
+
+
+def _pipeline_direct(args):
+    """
+    --direct: 動画から直接パースペクティブ画像を出力する
+    temp/frames の中間 JPEG を作らず、ffmpeg 1回の起動で全方向を書き出す
+    """
+    if args.blur:
+        print("❌ エラー: --direct では顔ぼかしは使えません（フレーム画像を作らないため）")
+        return False
+    if args.every_sec is not None or args.timestamps is not None or args.keyframes:
+        print("❌ エラー: --direct で使える間引き指定は --interval のみです")
+        return False
+
+    video_path = config.DATA_INPUT_DIR / args.video_file
+    if not video_path.exists():
+        print(f"❌ エラー: '{video_path}' が見つかりません")
+        return False
+
+    try:
+        output_dir = process_video(video_path, use_dense_ring=args.dense, interval=args.interval,
+                                   views=args.views, overlap=args.overlap)
+    except Exception as e:
+        print(f"❌ エラー: {e}\n")
+        return False
+
+    print(f"{'='*60}")
+    print(f"🎉 パイプライン完了！ ({output_dir.name})")
+    print(f"{'='*60}\n")
+    return True
+
+
+def _pipeline_stream(args):
+    """
+    --stream: デコード → (顔ぼかし) → 変換 → 保存 をメモリ上で流す
+    temp/frames を作らず、ディスクに書くのは最終出力だけ（変換は remap エンジン）
+    """
+    if args.keyframes:
+        print("❌ エラー: --stream では --keyframes は使えません")
+        return False
+    if args.engine not in (None, 'remap'):
+        print("❌ エラー: --stream の変換は remap エンジンのみです")
+        return False
+
+    video_path = config.DATA_INPUT_DIR / args.video_file
+    if not video_path.exists():
+        print(f"❌ エラー: '{video_path}' が見つかりません")
+        return False
+
+    try:
+        output_dir = run_stream_pipeline(
+            video_path,
+            use_dense_ring=args.dense,
+            blur=args.blur,
+            interval=args.interval,
+            every_sec=args.every_sec,
+            timestamps=args.timestamps,
+            workers=args.jobs,
+            memory_mb=args.memory_mb,
+            views=args.views,
+            overlap=args.overlap
+        )
+    except KeyboardInterrupt:
+        print(f"❌ 中断しました\n")
+        return False
+    except Exception as e:
+        print(f"❌ エラー: {e}\n")
+        return False
+
+    print(f"{'='*60}")
+    print(f"🎉 パイプライン完了！ ({output_dir.name})")
+    print(f"{'='*60}\n")
+    return True
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Equirect 360動画 → パースペクティブ画像 変換ツール",
@@ -170,9 +338,21 @@ def main():
   # フレーム抽出のみ
   python main.py extract video.mp4
 
+  # 2秒ごとに1フレームだけ抽出
+  python main.py extract video.mp4 --every-sec 2
+
+  # 変化のあるシャープなフレームを約300枚選んで抽出
+  python main.py extract video.mp4 --keyframes --keyframes-target 300
+
   # 顔ぼかしのみ
   python main.py blur test_145frames_0min4sec_20260122_220022
 
+  # 極付近の歪んだ顔も拾う（キューブマップ6面で検出）
+  python main.py blur test_145frames_0min4sec_20260122_220022 --projection cube
+
+  # 5 フレームごとにだけ検出し、間は顔を追跡（検出コストが約 1/5）
+  python main.py blur test_145frames_0min4sec_20260122_220022 --track 5
+
   # パースペクティブ変換のみ
   python main.py convert test_145frames_0min4sec_20260122_220022
 
@@ -181,6 +361,25 @@ def main():
 
   # 全処理を実行（顔ぼかしあり、密集度高い変換）
   python main.py pipeline video.mp4 --blur --dense
+
+  # 中間フレーム画像を作らず、動画から直接変換（ffmpeg 1回の起動）
+  python main.py pipeline video.mp4 --direct
+
+  # 顔ぼかしありで、中間ファイルなしのストリーミング処理（メモリ 2GB まで）
+  python main.py pipeline video.mp4 --blur --stream --memory-mb 2048
+
+  # ffmpeg を使わず NumPy/OpenCV で変換
+  python main.py convert test_145frames_0min4sec_20260122_220022 --engine remap
+
+  # 重なり率 60% を満たす最も少ない方向の組で変換
+  python main.py convert test_145frames_0min4sec_20260122_220022 --views auto --overlap 0.6
+
+  # CPU コア数ぶん並列に変換
+  python main.py convert test_145frames_0min4sec_20260122_220022 --jobs 0
+
+  # 検出は1回だけ: 元フレームを残して検出し、変換後の各方向でぼかす
+  python main.py blur test_145frames_0min4sec_20260122_220022 --separate
+  python main.py convert test_145frames_0min4sec_20260122_220022 --engine remap --blur-faces
         """
     )
 
@@ -189,21 +388,56 @@ def main():
     # === extract サブコマンド ===
     extract_parser = subparsers.add_parser('extract', help='動画からフレームを抽出')
     extract_parser.add_argument('video_file', help='data/input/ 内の動画ファイル名 (例: video.mp4)')
+    add_sampling_args(extract_parser)
 
     # === blur サブコマンド ===
     blur_parser = subparsers.add_parser('blur', help='抽出されたフレームの顔をぼかす')
     blur_parser.add_argument('output_folder', help='output/ 内のフォルダ名')
+    blur_parser.add_argument('--jobs', type=int, default=None,
+                             help='並列プロセス数 (デフォルト: config.BLUR_WORKERS)')
+    blur_parser.add_argument('--backend', choices=BACKENDS, default=None,
+                             help='顔検出器 (デフォルト: config.FACE_BACKEND)')
+    blur_parser.add_argument('--projection', choices=PROJECTIONS, default=None,
+                             help='検出モード: 全体縮小 / タイル / キューブマップ (デフォルト: config.FACE_PROJECTION)')
+    blur_parser.add_argument('--track', type=int, default=None, metavar='K',
+                             help='追跡モード: K フレームごと（とシーン切り替え時）にだけ検出し、間は枠を追跡 (デフォルト: config.FACE_TRACK_INTERVAL)')
+    blur_parser.add_argument('--separate', action='store_true',
+                             help=f'temp/frames を上書きせず {config.BLUR_OUTPUT_FOLDER_NAME}/ に保存')
+    blur_parser.add_argument('--force', action='store_true',
+                             help='処理記録を無視して全フレームを処理し直す')
+    blur_parser.add_argument('--from-detections', action='store_true',
+                             help='前回の検出結果 (temp/frames/detections.npz) を使い、検出せずにぼかす')
 
     # === convert サブコマンド ===
     convert_parser = subparsers.add_parser('convert', help='Equirect画像をパースペクティブ変換')
     convert_parser.add_argument('output_folder', help='output/ 内のフォルダ名')
     convert_parser.add_argument('--dense', action='store_true', help='密集度高い変換を使用')
+    convert_parser.add_argument('--engine', choices=ENGINES, default=None,
+                                help='変換エンジン (デフォルト: config.CONVERT_ENGINE)')
+    convert_parser.add_argument('--jobs', type=int, default=None,
+                                help='並列数 (0=CPU コア数、デフォルト: config.CONVERT_JOBS)')
+    convert_parser.add_argument('--blur-faces', action='store_true',
+                                help='blur の検出結果を使い、各方向の出力側で顔をぼかす (--engine remap のみ)')
+    add_view_args(convert_parser)
 
     # === pipeline サブコマンド ===
     pipeline_parser = subparsers.add_parser('pipeline', help='フレーム抽出→変換を一気に実行')
     pipeline_parser.add_argument('video_file', help='data/input/ 内の動画ファイル名 (例: video.mp4)')
+    add_sampling_args(pipeline_parser)
     pipeline_parser.add_argument('--blur', action='store_true', help='顔ぼかしを有効にする')
     pipeline_parser.add_argument('--dense', action='store_true', help='密集度高い変換を使用')
+    add_view_args(pipeline_parser)
+    pipeline_parser.add_argument('--engine', choices=ENGINES, default=None,
+                                 help='変換エンジン (デフォルト: config.CONVERT_ENGINE)')
+    pipeline_parser.add_argument('--jobs', type=int, default=None,
+                                 help='変換の並列数 (0=CPU コア数、デフォルト: config.CONVERT_JOBS)')
+    mode_group = pipeline_parser.add_mutually_exclusive_group()
+    mode_group.add_argument('--direct', action='store_true',
+                            help='フレーム画像を作らず動画から直接変換（ffmpeg、--blur 不可）')
+    mode_group.add_argument('--stream', action='store_true',
+                            help='デコード→顔ぼかし→変換をメモリ上で流す（中間ファイルなし、remap、--jobs はワーカー数）')
+    pipeline_parser.add_argument('--memory-mb', type=int, default=None,
+                                 help='--stream でデコード済みフレームに使うメモリの目安 (デフォルト: config.STREAM_MEMORY_MB)')
 
     # パースしてコマンド実行
     args = parser.parse_args()
@@ -0,0 +1,253 @@
+"""
+stream_pipeline.py - 動画 → (顔ぼかし) → パースペクティブ変換 を中間ファイルなしで流すパイプライン
+
+extract → blur → convert を別々に実行すると、各フレームが
+temp/frames への JPEG 保存 → 顔ぼかしでの再エンコード → 方向ごとのデコード を経由する。
+このモードではデコードしたフレームをメモリ上で流し、ディスクに書くのは最終出力だけにする。
+
+    デコード（メインスレッド）
+        ↓ 上限付きキュー（config.STREAM_MEMORY_MB から上限を決める）
+    ワーカー × N（config.STREAM_WORKERS）: 顔ぼかし → 全方向を remap → JPEG 保存
+
+ワーカーはフレーム単位で処理を分担する。顔検出・remap・JPEG エンコードは
+OpenCV が GIL を解放するので、スレッドでも複数コアを使える。
+変換は remap エンジン（equirect_remap.py）と同じ幾何で、出力ファイル名も
+extract → convert の場合と同じ（例: frame_000000_rc14_00_yaw+0_pit+90_rol+0.jpg）。
+"""
+
+import os
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+
+import config
+import equirect_remap
+import face_blur
+from batch_equirect2persp_ffmpeg import select_transforms, output_name
+from video_frame_extractor import (
+    _sample_frame_indices,
+    iter_frames_at,
+    output_folder_name,
+    sampling_mode,
+)
+
+
+def plan_memory(frame_width, frame_height, workers=None, memory_mb=None):
+    """
+    ワーカー数とキューの上限を決める
+
+    メモリ使用量の目安は (キュー上限 + ワーカー数) × 1フレームのサイズ。
+    上限に収まらない場合はワーカー数も減らす（最低 1 ワーカー・キュー 1）。
+
+    Returns:
+        tuple: (ワーカー数, キューの上限)
+    """
+    workers = workers or config.STREAM_WORKERS or os.cpu_count() or 1
+    memory_mb = memory_mb or config.STREAM_MEMORY_MB
+    frame_bytes = frame_width * frame_height * 3
+    budget_frames = max(2, int(memory_mb * 1024 * 1024 // max(1, frame_bytes)))
+    workers = max(1, min(workers, budget_frames - 1))
+    return workers, max(1, budget_frames - workers)
+
+
+def _iter_frames(video, indices, fps):
+    """全フレームなら read() で順に、間引き指定なら iter_frames_at で返す"""
+    if indices is None:
+        frame_index = 0
+        while True:
+            ret, frame = video.read()
+            if not ret:
+                return
+            yield frame_index, frame
+            frame_index += 1
+    else:
+        yield from iter_frames_at(video, indices, fps)
+
+
+class _StreamWorkers:
+    """キューからフレームを受け取り、顔ぼかし → 全方向の変換・保存を行うワーカー"""
+
+    def __init__(self, output_dir, transforms, preset_name, workers, queue_size, blur_strength=None):
+        self.output_dir = str(output_dir)
+        self.transforms = transforms
+        self.preset_name = preset_name
+        self.digits = len(str(len(transforms)))
+        self.blur_strength = blur_strength
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, config.REMAP_JPEG_QUALITY]
+        self.cache = equirect_remap.RemapCache()
+        self.stop = threading.Event()
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self.failed_frames = []  # 丸ごと失敗したフレーム（例外）
+        self.failed_views = []  # 保存に失敗した出力
+        self.error = None  # ワーカーの初期化（顔検出器の読み込み）に失敗した場合の例外
+        self.faces = 0
+        self.done = 0
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"stream-worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _worker(self):
+        # 顔検出器はワーカーごとに1回だけ読み込む
+        # 読み込めない場合は全体を止める（キューは流し続け、submit() が例外を送出する）
+        detector = None
+        try:
+            if self.blur_strength:
+                detector = face_blur.FaceDetector()
+        except Exception as e:
+            with self._lock:
+                self.error = self.error or e
+            self.stop.set()
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self.stop.is_set():
+                continue
+            saved_index, frame = item
+            base = f"{config.FRAME_PREFIX}_{saved_index:06d}"
+            faces = 0
+            failed = []
+            frame_failed = False
+            try:
+                if detector is not None:
+                    faces = face_blur.blur_faces_in_image(frame, self.blur_strength, detector)
+                for idx, (yaw, pitch, roll) in enumerate(self.transforms):
+                    out_name = output_name(base, self.preset_name, idx, self.digits, yaw, pitch, roll)
+                    view = equirect_remap.remap_view(frame, yaw, pitch, roll, self.cache)
+                    if not cv2.imwrite(os.path.join(self.output_dir, out_name), view, self.params):
+                        failed.append(out_name)
+            except Exception as e:
+                print(f" !! 失敗: {base}  ({e})")
+                frame_failed = True
+            with self._lock:
+                self.faces += faces
+                if frame_failed:
+                    self.failed_frames.append(base)
+                else:
+                    self.failed_views += failed
+                self.done += 1
+
+    def _put(self, item):
+        """キューに積む（満杯なら待つ）。生きているワーカーがいなければ積まずに False を返す"""
+        while any(t.is_alive() for t in self._threads):
+            try:
+                self._queue.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def check(self):
+        """ワーカーの初期化に失敗していれば RuntimeError を送出する"""
+        if self.error is not None:
+            raise RuntimeError(f"ワーカーを開始できませんでした: {self.error}") from self.error
+
+    def submit(self, saved_index, frame):
+        """フレームをキューに積む（満杯ならワーカーが追いつくまで待つ）"""
+        self.check()
+        if not self._put((saved_index, frame)):
+            raise RuntimeError("ストリーミング処理のワーカーが停止しています")
+
+    def close(self, cancel=False):
+        """キューを流しきってワーカーを終了する（cancel=True なら残りは処理しない）"""
+        if cancel:
+            self.stop.set()
+        for _ in self._threads:
+            if not self._put(None):
+                break
+        for t in self._threads:
+            t.join()
+
+
+def run_stream_pipeline(video_path, output_base_folder=None, use_dense_ring=False, blur=False,
+                        interval=1, every_sec=None, timestamps=None, workers=None, memory_mb=None,
+                        views=None, overlap=None):
+    """
+    動画から直接、顔ぼかし済みのパースペクティブ画像を出力する
+
+    Args:
+        video_path: 入力動画のパス
+        output_base_folder: 出力先ベースフォルダ（デフォルト: config.OUTPUT_DIR）
+        use_dense_ring: True なら密集度高い変換、False なら標準14方向
+        blur: True なら変換前に顔ぼかしを適用（強さは config.BLUR_STRENGTH）
+        interval / every_sec / timestamps: 間引き指定（extract と同じ。連番は保存順）
+        workers: ワーカー数（デフォルト: config.STREAM_WORKERS）
+        memory_mb: デコード済みフレームに使うメモリの目安（デフォルト: config.STREAM_MEMORY_MB）
+        views / overlap: 方向の組の計画（batch_equirect2persp_ffmpeg.process_frames と同じ）
+
+    Returns:
+        Path: 出力フォルダ
+    """
+    output_base_folder = Path(output_base_folder or config.OUTPUT_DIR)
+    video = cv2.VideoCapture(str(video_path))
+    if not video.isOpened():
+        raise RuntimeError(f"動画ファイル '{video_path}' を開けませんでした")
+
+    fps = video.get(cv2.CAP_PROP_FPS)
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    width = int(video.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(video.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    mode_name, mode_desc = sampling_mode(interval, every_sec, timestamps)
+    if mode_name is None:
+        indices = None
+        expected_frames = total_frames
+    else:
+        indices = _sample_frame_indices(total_frames, fps, interval, every_sec, timestamps)
+        expected_frames = len(indices)
+
+    output_dir = output_base_folder / output_folder_name(video_path, total_frames, fps, expected_frames, mode_name)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    transforms, preset_name = select_transforms(use_dense_ring, views, overlap)
+    workers, queue_size = plan_memory(width, height, workers, memory_mb)
+
+    print(f"動画情報:")
+    print(f"  - FPS: {fps}")
+    print(f"  - 解像度: {width}x{height}")
+    print(f"  - 抽出方法: {mode_desc}（{expected_frames} フレーム）")
+    print(f"  - 方向数: {len(transforms)}  プリセット: {preset_name}  顔ぼかし: {'あり' if blur else 'なし'}")
+    print(f"  - ワーカー: {workers}  キュー上限: {queue_size} フレーム")
+    print(f"  - 出力フォルダ: {output_dir.name}")
+    print(f"\nストリーミング処理を開始します...")
+
+    stream = _StreamWorkers(output_dir, transforms, preset_name, workers, queue_size,
+                            blur_strength=config.BLUR_STRENGTH if blur else None)
+    saved_count = 0
+    try:
+        for _, frame in _iter_frames(video, indices, fps):
+            stream.submit(saved_count, frame)
+            saved_count += 1
+            if saved_count % 100 == 0:
+                print(f"  処理中: {saved_count}/{expected_frames} フレーム")
+    except KeyboardInterrupt:
+        print("\n⚠️  中断します。処理中のフレームが終わるのを待っています...")
+        stream.close(cancel=True)
+        raise
+    except Exception:
+        stream.close(cancel=True)
+        raise
+    finally:
+        video.release()
+    stream.close()
+    stream.check()
+
+    failed_frames, failed_views = stream.failed_frames, stream.failed_views
+    written = (stream.done - len(failed_frames)) * len(transforms) - len(failed_views)
+    print(f"\n完了!")
+    print(f"  - 処理したフレーム数: {stream.done}")
+    print(f"  - 出力画像: {written} 枚")
+    if blur:
+        print(f"  - 検出した顔の総数: {stream.faces} 個")
+    print(f"  - 保存先: {output_dir}")
+    if failed_frames or failed_views:
+        examples = (failed_frames + failed_views)[0]
+        print(f"\n⚠️  失敗: フレーム {len(failed_frames)} 枚、出力 {len(failed_views)} 枚（例: {examples}）")
+        raise RuntimeError(f"フレーム {len(failed_frames)} 枚・出力 {len(failed_views)} 枚の処理に失敗しました")
+    return output_dir
@@ -1,19 +1,88 @@
 import cv2
 import os
+import queue
+import threading
 from pathlib import Path
 from datetime import datetime
 import config
 
 
-def extract_frames(video_path, output_base_folder, prefix="frame", extension="jpg"):
+class FrameWriter:
+    """
+    フレームの画像エンコード・保存をワーカースレッドで並列に行う
+
+    高解像度（5.7K など）の 360 動画ではデコードより JPEG エンコードが重いため、
+    デコード側は submit() でキューに積むだけにして、エンコードは複数スレッドで行う。
+    cv2.imwrite は処理中に GIL を解放するので、スレッドでも複数コアを使える。
+    キューは上限付き（メモリ使用量 ≒ queue_size × 1フレームのサイズ）。
+    """
+
+    def __init__(self, workers=None, queue_size=None):
+        if workers is None:
+            workers = config.EXTRACT_WORKERS or os.cpu_count() or 1
+        if queue_size is None:
+            queue_size = config.EXTRACT_QUEUE_SIZE
+        self._queue = queue.Queue(maxsize=max(1, queue_size))
+        self._lock = threading.Lock()
+        self.failed = []
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"frame-writer-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, frame = item
+            try:
+                ok = cv2.imwrite(path, frame)
+            except Exception:
+                # どの例外でもスレッドは止めない（全ワーカーが止まると submit/close が満杯のキューで待ち続ける）
+                ok = False
+            if not ok:
+                with self._lock:
+                    self.failed.append(path)
+
+    def submit(self, path, frame):
+        """フレームを保存キューに積む（キューが満杯ならエンコードが追いつくまで待つ）"""
+        self._queue.put((path, frame))
+
+    def close(self):
+        """キューを流しきってワーカーを終了する。保存に失敗したパスのリストを返す"""
+        for _ in self._threads:
+            self._queue.put(None)
+        for t in self._threads:
+            t.join()
+        return self.failed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def extract_frames(video_path, output_base_folder, prefix="frame", extension="jpg", workers=None):
     """
     動画をフレームごとに分割して指定フォルダに保存する
 
+    デコードは呼び出し元スレッドで順番に行い、エンコード・保存は FrameWriter で並列化する。
+    出力ファイル名と連番は逐次処理の場合と同じ。
+
     Args:
         video_path (str): 入力動画のパス
         output_base_folder (str): 出力先ベースフォルダのパス
         prefix (str): 出力ファイル名のプレフィックス (デフォルト: "frame")
         extension (str): 出力画像の拡張子 (デフォルト: "jpg")
+        workers (int): エンコードのワーカースレッド数 (デフォルト: config.EXTRACT_WORKERS)
+
+    Returns:
+        str: フレームの保存先フォルダ（動画を開けなかった場合は None）
     """
     # 動画ファイルを開く
     video = cv2.VideoCapture(video_path)
@@ -57,42 +126,139 @@ def extract_frames(video_path, output_base_folder, prefix="frame", extension="jp
     frame_count = 0
     saved_count = 0
 
-    while True:
-        # フレームを読み込む
-        ret, frame = video.read()
+    with FrameWriter(workers) as writer:
+        while True:
+            # フレームを読み込む
+            ret, frame = video.read()
 
-        # フレームの読み込みに失敗したら終了
-        if not ret:
-            break
+            # フレームの読み込みに失敗したら終了
+            if not ret:
+                break
 
-        # ファイル名を生成（ゼロパディング付き）
-        filename = f"{prefix}_{frame_count:06d}.{extension}"
-        output_path = os.path.join(output_folder, filename)
+            # ファイル名を生成（ゼロパディング付き）
+            filename = f"{prefix}_{frame_count:06d}.{extension}"
+            output_path = os.path.join(output_folder, filename)
 
-        # フレームを保存
-        cv2.imwrite(output_path, frame)
-        saved_count += 1
+            # フレームを保存キューへ（エンコードはワーカースレッドで行う）
+            writer.submit(output_path, frame)
+            saved_count += 1
 
-        # 進捗表示
-        if (frame_count + 1) % 100 == 0:
-            print(f"  処理中: {frame_count + 1}/{total_frames} フレーム")
+            # 進捗表示
+            if (frame_count + 1) % 100 == 0:
+                print(f"  処理中: {frame_count + 1}/{total_frames} フレーム")
 
-        frame_count += 1
+            frame_count += 1
 
     # リソースを解放
     video.release()
 
+    if writer.failed:
+        print(f"警告: {len(writer.failed)} フレームの保存に失敗しました（例: {writer.failed[0]}）")
+        saved_count -= len(writer.failed)
+
     print(f"\n完了!")
     print(f"  - 保存されたフレーム数: {saved_count}")
     print(f"  - 保存先: {output_folder}")
+    return output_folder
 
 
-def extract_frames_interval(video_path, output_base_folder, interval=1, prefix="frame", extension="jpg"):
+def output_folder_name(video_path, total_frames, fps, expected_frames=None, mode_name=None):
     """
-    動画から指定間隔でフレームを抽出して保存する
+    出力フォルダ名を作る（extract / pipeline 共通）
 
-    注: 現在 main.py からは呼び出されていません
-    スタンドアロン実行時のみ使用可能です
+    形式: "動画名_フレーム数frames[_抽出方法]_時間min秒sec_タイムスタンプ"
+    mode_name を省略した場合は全フレーム抽出の形式（フレーム数は動画の総フレーム数）
+    """
+    duration_sec = total_frames / fps if fps > 0 else 0
+    minutes = int(duration_sec // 60)
+    seconds = int(duration_sec % 60)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    if mode_name is None:
+        return f"{Path(video_path).stem}_{total_frames}frames_{minutes}min{seconds}sec_{timestamp}"
+    return f"{Path(video_path).stem}_{expected_frames}frames_{mode_name}_{minutes}min{seconds}sec_{timestamp}"
+
+
+def sampling_mode(interval=1, every_sec=None, timestamps=None):
+    """間引き指定からフォルダ名用の名前と表示用の説明を返す（全フレームなら (None, "全フレーム")）"""
+    if timestamps is not None:
+        return f"ts{len(timestamps)}", f"指定時刻 {len(timestamps)} 点"
+    if every_sec is not None:
+        return f"every{every_sec:g}s", f"{every_sec:g}秒ごと"
+    if interval > 1:
+        return f"interval{interval}", f"{interval}フレームごと"
+    return None, "全フレーム"
+
+
+def _sample_frame_indices(total_frames, fps, interval=None, every_sec=None, timestamps=None):
+    """
+    抽出するフレーム番号のリスト（昇順・重複なし）を作る
+
+    interval: Nフレームごと / every_sec: N秒ごと / timestamps: 秒のリスト
+    """
+    if timestamps is not None:
+        if fps <= 0:
+            raise ValueError("FPS が取得できないため時刻指定は使えません")
+        indices = [int(round(t * fps)) for t in timestamps if t >= 0]
+    elif every_sec is not None:
+        if fps <= 0:
+            raise ValueError("FPS が取得できないため秒間隔指定は使えません")
+        if every_sec <= 0:
+            raise ValueError("every_sec は正の値を指定してください")
+        duration = total_frames / fps
+        count = int(duration / every_sec) + 1
+        indices = [int(round(i * every_sec * fps)) for i in range(count)]
+    else:
+        indices = list(range(0, total_frames, max(1, interval or 1)))
+    if total_frames > 0:
+        indices = [i for i in indices if i < total_frames]
+    return sorted(set(indices))
+
+
+def iter_frames_at(video, indices, fps):
+    """
+    指定したフレーム番号のフレームだけを (番号, フレーム) で順に返す
+
+    飛ばすフレームは grab() のみ（色変換・コピーをしない）で読み進め、
+    config.SEEK_MIN_GAP_SEC 以上離れている場合はシークする。
+    シークは直前のキーフレームからのデコードで済むため、処理時間は
+    動画の長さではなく抽出するフレーム数に比例する。
+    シークが行き過ぎる動画では、一度だけ先頭に戻って残りを順に読む。
+    """
+    seek_gap = max(1, int(config.SEEK_MIN_GAP_SEC * fps)) if fps > 0 else None
+    pos = 0  # 次に grab() で読まれるフレーム番号
+    for target in indices:
+        if seek_gap is not None and target - pos >= seek_gap:
+            video.set(cv2.CAP_PROP_POS_FRAMES, target)
+            pos = int(video.get(cv2.CAP_PROP_POS_FRAMES))
+            if pos > target:
+                # バックエンドのシークが行き過ぎた場合は先頭に戻し、以降はシークせず grab() で読み進める
+                # （抽出するフレームごとに先頭から読み直すと O(n²) のデコードになる）
+                video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                pos = 0
+                seek_gap = None
+        ok = True
+        while pos < target:
+            ok = video.grab()
+            if not ok:
+                break
+            pos += 1
+        if not ok or not video.grab():
+            return
+        pos += 1
+        ret, frame = video.retrieve()
+        if not ret:
+            return
+        yield target, frame
+
+
+def extract_frames_interval(video_path, output_base_folder, interval=1, prefix="frame", extension="jpg",
+                            every_sec=None, timestamps=None, workers=None):
+    """
+    動画から指定間隔（フレーム数・秒数）または指定時刻のフレームだけを抽出して保存する
+
+    不要なフレームはデコード後の変換をせず読み飛ばし、間隔が長い場合はシークするため、
+    長時間・高解像度の動画でも処理時間は抽出枚数に比例する。
+    出力ファイル名は保存順の連番（frame_000000, frame_000001, ...）。
 
     Args:
         video_path (str): 入力動画のパス
@@ -100,6 +266,12 @@ def extract_frames_interval(video_path, output_base_folder, interval=1, prefix="
         interval (int): フレーム抽出間隔（1なら全フレーム、2なら1フレームおき）
         prefix (str): 出力ファイル名のプレフィックス
         extension (str): 出力画像の拡張子
+        every_sec (float): 指定した場合、N秒ごとに1フレーム抽出（interval より優先）
+        timestamps (list[float]): 指定した場合、その時刻（秒）のフレームを抽出（最優先）
+        workers (int): エンコードのワーカースレッド数 (デフォルト: config.EXTRACT_WORKERS)
+
+    Returns:
+        str: フレームの保存先フォルダ（動画を開けなかった場合は None）
     """
     video = cv2.VideoCapture(video_path)
 
@@ -111,21 +283,19 @@ def extract_frames_interval(video_path, output_base_folder, interval=1, prefix="
     total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
     duration_sec = total_frames / fps if fps > 0 else 0
 
-    # 動画ファイル名（拡張子なし）を取得
-    video_filename = Path(video_path).stem
-
     # 時間を分秒形式に変換
     minutes = int(duration_sec // 60)
     seconds = int(duration_sec % 60)
 
-    # 抽出予定フレーム数を計算
-    expected_frames = (total_frames + interval - 1) // interval
+    # 抽出するフレーム番号を決める
+    indices = _sample_frame_indices(total_frames, fps, interval, every_sec, timestamps)
+    expected_frames = len(indices)
 
-    # フォルダ名を生成
-    # 形式: "動画名_フレーム数frames_interval間隔_時間min秒sec_タイムスタンプ"
+    # フォルダ名を生成（pipeline と共通）
     # 例: "video_300frames_interval10_1min40sec_20260122_143025"
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    folder_name = f"{video_filename}_{expected_frames}frames_interval{interval}_{minutes}min{seconds}sec_{timestamp}"
+    #     "video_50frames_every2s_1min40sec_20260122_143025"
+    mode_name, mode_desc = sampling_mode(interval, every_sec, timestamps)
+    folder_name = output_folder_name(video_path, total_frames, fps, expected_frames, mode_name)
 
     # 出力フォルダのパスを作成（temp/frames/ 内に保存）
     output_folder = os.path.join(output_base_folder, folder_name, "temp", "frames")
@@ -135,35 +305,215 @@ def extract_frames_interval(video_path, output_base_folder, interval=1, prefix="
     print(f"  - FPS: {fps}")
     print(f"  - 総フレーム数: {total_frames}")
     print(f"  - 再生時間: {minutes}分{seconds}秒")
-    print(f"  - 抽出間隔: {interval}フレームごと")
+    print(f"  - 抽出方法: {mode_desc}（{expected_frames} フレーム）")
     print(f"  - 出力フォルダ: {folder_name}")
     print(f"\nフレーム抽出を開始します...")
 
-    frame_count = 0
     saved_count = 0
 
-    while True:
-        ret, frame = video.read()
-        if not ret:
-            break
-
-        # 指定間隔でフレームを保存
-        if frame_count % interval == 0:
+    with FrameWriter(workers) as writer:
+        for frame_index, frame in iter_frames_at(video, indices, fps):
             filename = f"{prefix}_{saved_count:06d}.{extension}"
-            output_path = os.path.join(output_folder, filename)
-            cv2.imwrite(output_path, frame)
+            writer.submit(os.path.join(output_folder, filename), frame)
             saved_count += 1
 
             if saved_count % 100 == 0:
-                print(f"  処理中: {saved_count} フレーム保存済み")
+                print(f"  処理中: {saved_count}/{expected_frames} フレーム保存済み")
+
+    video.release()
+
+    if writer.failed:
+        print(f"警告: {len(writer.failed)} フレームの保存に失敗しました（例: {writer.failed[0]}）")
+        saved_count -= len(writer.failed)
 
-        frame_count += 1
+    print(f"\n完了!")
+    print(f"  - 保存されたフレーム数: {saved_count}")
+    print(f"  - 保存先: {output_folder}")
+    return output_folder
+
+
+def analyze_frame(frame, analysis_width=None, signature_width=None):
+    """
+    キーフレーム選択用に、縮小グレースケールでフレームを評価する
+
+    Returns:
+        tuple: (signature, sharpness)
+            signature: 差分比較用の小さなグレースケール画像（uint8。全候補フレーム分を保持するため float にしない）
+            sharpness: ラプラシアンの分散（大きいほどシャープ、ブレ・ボケで小さくなる）
+    """
+    analysis_width = analysis_width or config.KEYFRAME_ANALYSIS_WIDTH
+    signature_width = signature_width or config.KEYFRAME_SIGNATURE_WIDTH
+    h, w = frame.shape[:2]
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    if w > analysis_width:
+        gray = cv2.resize(gray, (analysis_width, max(1, h * analysis_width // w)),
+                          interpolation=cv2.INTER_AREA)
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    sh = max(1, gray.shape[0] * signature_width // gray.shape[1])
+    signature = cv2.resize(gray, (signature_width, sh), interpolation=cv2.INTER_AREA)
+    return signature, sharpness
+
+
+def select_keyframes(signatures, sharpness, diff_threshold, window, min_sharpness=0.0):
+    """
+    フレーム評価値からキーフレームを選ぶ（先頭から1パス）
+
+    直前に採用したフレームとの平均輝度差が diff_threshold を超えたら、そこから
+    window フレームの中で最もシャープなフレームを採用する。
+    sharpness が min_sharpness 未満のフレームは採用しない。
+
+    Returns:
+        list[int]: 採用したフレームの位置（signatures のインデックス）
+    """
+    kept = []
+    last = None
+    i = 0
+    n = len(signatures)
+    while i < n:
+        # uint8 同士の差は cv2.absdiff で取る（numpy の引き算はオーバーフローする）
+        if last is not None and float(cv2.absdiff(signatures[i], last).mean()) < diff_threshold:
+            i += 1
+            continue
+        # 変化が大きくなった（または先頭）: window 内で最もシャープなフレームを探す
+        end = min(n, i + max(1, window))
+        best = max(range(i, end), key=lambda j: sharpness[j])
+        if sharpness[best] >= min_sharpness:
+            kept.append(best)
+            last = signatures[best]
+        i = best + 1 if sharpness[best] >= min_sharpness else end
+    return kept
+
+
+def _threshold_for_target(signatures, sharpness, target, window, min_sharpness):
+    """採用数が target 以下で最大になる差分しきい値を二分探索する"""
+    lo, hi = 0.0, 255.0
+    for _ in range(20):
+        mid = (lo + hi) / 2
+        if len(select_keyframes(signatures, sharpness, mid, window, min_sharpness)) > target:
+            lo = mid
+        else:
+            hi = mid
+    return hi
+
+
+def extract_keyframes(video_path, output_base_folder, prefix="frame", extension="jpg",
+                      target_count=None, diff_threshold=None, min_sharpness=None,
+                      interval=1, every_sec=None, workers=None):
+    """
+    シーン変化とシャープさでフレームを選び、選んだフレームだけを保存する
+
+    フォトグラメトリ用に、ほぼ静止している区間の重複フレームやブレたフレームを除く。
+    1パス目で候補フレームを縮小グレースケールで評価し（差分・ラプラシアン分散）、
+    2パス目で採用したフレームだけをシークして取り出し保存する。
+
+    Args:
+        video_path (str): 入力動画のパス
+        output_base_folder (str): 出力先ベースフォルダのパス
+        prefix (str): 出力ファイル名のプレフィックス
+        extension (str): 出力画像の拡張子
+        target_count (int): 採用する枚数の目安（指定時は差分しきい値を自動調整）
+        diff_threshold (float): 直前の採用フレームとの平均輝度差のしきい値（0-255）
+                                (デフォルト: config.KEYFRAME_DIFF_THRESHOLD)
+        min_sharpness (float): これ未満のシャープさのフレームは採用しない
+                               (デフォルト: config.KEYFRAME_MIN_SHARPNESS)
+        interval (int): 候補を Nフレームごとに間引く（評価自体のコストを下げる）
+        every_sec (float): 候補を N秒ごとに間引く
+        workers (int): エンコードのワーカースレッド数
+
+    Returns:
+        str: フレームの保存先フォルダ（動画を開けなかった場合は None）
+    """
+    if diff_threshold is None:
+        diff_threshold = config.KEYFRAME_DIFF_THRESHOLD
+    if min_sharpness is None:
+        min_sharpness = config.KEYFRAME_MIN_SHARPNESS
+
+    video = cv2.VideoCapture(video_path)
+    if not video.isOpened():
+        print(f"エラー: 動画ファイル '{video_path}' を開けませんでした")
+        return
+
+    fps = video.get(cv2.CAP_PROP_FPS)
+    total_frames = int(video.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration_sec = total_frames / fps if fps > 0 else 0
+    minutes = int(duration_sec // 60)
+    seconds = int(duration_sec % 60)
+    candidates = _sample_frame_indices(total_frames, fps, interval, every_sec)
+    # 採用候補を探す範囲（約0.5秒分の候補）
+    step = candidates[1] - candidates[0] if len(candidates) > 1 else 1
+    window = max(1, int(round(fps * config.KEYFRAME_WINDOW_SEC / step))) if fps > 0 else 1
+
+    print(f"動画情報:")
+    print(f"  - FPS: {fps}")
+    print(f"  - 総フレーム数: {total_frames}")
+    print(f"  - 再生時間: {minutes}分{seconds}秒")
+    print(f"\nフレームを評価しています（候補 {len(candidates)} フレーム）...")
+
+    # 1パス目: 評価のみ（縮小グレースケール）
+    frame_ids, signatures, sharpness = [], [], []
+    for frame_index, frame in iter_frames_at(video, candidates, fps):
+        signature, sharp = analyze_frame(frame)
+        frame_ids.append(frame_index)
+        signatures.append(signature)
+        sharpness.append(sharp)
+        if len(frame_ids) % 500 == 0:
+            print(f"  評価中: {len(frame_ids)}/{len(candidates)} フレーム")
+
+    if target_count is not None:
+        diff_threshold = _threshold_for_target(signatures, sharpness, target_count, window, min_sharpness)
+    selected = select_keyframes(signatures, sharpness, diff_threshold, window, min_sharpness)
+    print(f"  - 差分しきい値: {diff_threshold:.2f}  採用: {len(selected)}/{len(frame_ids)} フレーム")
+
+    video_filename = Path(video_path).stem
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    folder_name = f"{video_filename}_{len(selected)}frames_key_{minutes}min{seconds}sec_{timestamp}"
+    output_folder = os.path.join(output_base_folder, folder_name, "temp", "frames")
+    Path(output_folder).mkdir(parents=True, exist_ok=True)
+
+    # どの元フレームを採用したかを残す（フォトグラメトリ側で時刻を参照できるように）
+    list_path = os.path.join(output_base_folder, folder_name, "temp", "keyframes.csv")
+    with open(list_path, "w", encoding="utf-8") as f:
+        f.write("filename,frame_index,time_sec,sharpness\n")
+        for saved, pos in enumerate(selected):
+            t = frame_ids[pos] / fps if fps > 0 else 0.0
+            f.write(f"{prefix}_{saved:06d}.{extension},{frame_ids[pos]},{t:.3f},{sharpness[pos]:.1f}\n")
+
+    print(f"  - 出力フォルダ: {folder_name}")
+    print(f"\nキーフレームを保存しています...")
+
+    # 2パス目: 採用したフレームだけシークして保存
+    wanted = [frame_ids[pos] for pos in selected]
+    video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+    saved_count = 0
+    with FrameWriter(workers) as writer:
+        for frame_index, frame in iter_frames_at(video, wanted, fps):
+            writer.submit(os.path.join(output_folder, f"{prefix}_{saved_count:06d}.{extension}"), frame)
+            saved_count += 1
 
     video.release()
 
+    if writer.failed:
+        print(f"警告: {len(writer.failed)} フレームの保存に失敗しました（例: {writer.failed[0]}）")
+        saved_count -= len(writer.failed)
+
     print(f"\n完了!")
     print(f"  - 保存されたフレーム数: {saved_count}")
     print(f"  - 保存先: {output_folder}")
+    return output_folder
+
+
+def parse_timestamps(text):
+    """ "0,12.5,1:30" のような時刻リスト（秒 または 分:秒）を秒の float リストにする"""
+    values = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        minutes, _, sec = part.rpartition(":")
+        values.append((float(minutes) * 60 if minutes else 0.0) + float(sec))
+    if not values:
+        raise ValueError("時刻が指定されていません")
+    return values
 
 
 def main():
@@ -177,6 +527,10 @@ def main():
     parser.add_argument('filename', help='data/input フォルダ内の動画ファイル名 (例: video.mp4)')
     parser.add_argument('interval', type=int, nargs='?', default=1,
                         help='フレーム抽出間隔 (デフォルト: 1=全フレーム)')
+    parser.add_argument('--every-sec', type=float, default=None,
+                        help='N秒ごとに1フレーム抽出 (例: 2)')
+    parser.add_argument('--timestamps', type=parse_timestamps, default=None,
+                        help='抽出する時刻（秒、カンマ区切り。例: 0,12.5,60）')
 
     args = parser.parse_args()
 
@@ -193,11 +547,12 @@ def main():
 
     # フレーム抽出を実行
     try:
-        if args.interval == 1:
+        if args.interval == 1 and args.every_sec is None and args.timestamps is None:
             extract_frames(str(video_path), str(output_base_folder), prefix, extension)
         else:
             extract_frames_interval(str(video_path), str(output_base_folder), args.interval,
-                                    prefix, extension)
+                                    prefix, extension,
+                                    every_sec=args.every_sec, timestamps=args.timestamps)
         return 0
     except Exception as e:
         print(f"エラー: {e}")
@@ -0,0 +1,280 @@
+"""
+view_planner.py - パースペクティブ変換の方向（yaw, pitch, roll）の組を計画する
+
+build_transforms_14 / build_transforms_dense は決め打ちの方向リストで、
+dense では重なりが多すぎる・少なすぎるを調整できない。
+ここでは FOV と目標の重なり率から、条件を満たす最小の方向の組を作る。
+
+レイアウト（config.VIEW_SET / convert --views）:
+    cube      : キューブマップの6方向（FOV 90° で全天をちょうど覆う。重なりはほぼ 0）
+                固定のプリセットなので重なり率の目標は使わず、被覆率だけを確かめる
+    fibonacci : 球面上に Fibonacci 格子で均等に並べる。条件を満たす最小の数を探す
+    rings     : 赤道・±pitch のリングと天頂・天底。リングの間隔を詰めて条件を満たす最小の組を探す
+    auto      : 上の3つのうち、条件を満たす最も少ない組
+
+評価は NumPy で数値的に行う（equirect_remap と同じ幾何）。
+    全天の被覆率 : 球面上に均等に置いたサンプル方向のうち、いずれかの方向に写る割合
+    方向ごとの重なり率 : その方向の画像の画素のうち、ほかの方向にも写る割合（写真測量で必要な重なり）
+条件は「被覆率 >= config.VIEW_MIN_COVERAGE」かつ「すべての方向の重なり率 >= 目標」
+（auto が cube を選ぶのも、cube がこの条件を満たす場合だけ）。
+
+使用方法（計画だけを表示）:
+    python view_planner.py [--views auto] [--overlap 0.3] [--fov 90]
+"""
+
+import argparse
+import math
+import sys
+
+import numpy as np
+
+import config
+import equirect_remap
+
+LAYOUTS = ("cube", "fibonacci", "rings", "auto")
+
+CUBE_VIEWS = [(0, 0, 0), (90, 0, 0), (180, 0, 0), (-90, 0, 0), (0, 90, 0), (0, -90, 0)]
+
+# 探索する方向数の上限
+MAX_VIEWS = 400
+
+
+def _wrap_yaw(yaw):
+    """yaw を (-180, 180] の整数にする"""
+    yaw = int(round(yaw)) % 360
+    return yaw - 360 if yaw > 180 else yaw
+
+
+def fibonacci_views(count):
+    """球面上の Fibonacci 格子で count 方向を作る（整数度に丸める）"""
+    golden = math.pi * (3 - math.sqrt(5))
+    views = []
+    for i in range(count):
+        pitch = math.degrees(math.asin(1 - 2 * (i + 0.5) / count))
+        yaw = math.degrees(i * golden)
+        view = (_wrap_yaw(yaw), int(round(pitch)), 0)
+        if view not in views:
+            views.append(view)
+    return views
+
+
+def ring_views(h_fov, v_fov, step_ratio):
+    """
+    赤道から極に向かうリングと天頂・天底の方向を作る
+
+    リングの pitch の間隔は v_fov * step_ratio、各リングの yaw の数は
+    リングの赤道側の端で h_fov * step_ratio ごとに並ぶように決める（step_ratio が小さいほど重なる）。
+    """
+    pitch_step = v_fov * step_ratio
+    pitches = [0.0]
+    p = pitch_step
+    # 天頂・天底の方向で覆えない高さまでリングを置く
+    while p - pitch_step / 2 < 90 - v_fov / 2:
+        pitches += [p, -p]
+        p += pitch_step
+
+    views = [(0, 90, 0), (0, -90, 0)]
+    for pitch in pitches:
+        if abs(pitch) >= 90:
+            continue
+        edge = max(0.0, abs(pitch) - v_fov / 2)
+        count = max(1, math.ceil(360 * math.cos(math.radians(edge)) / (h_fov * step_ratio)))
+        for j in range(count):
+            view = (_wrap_yaw(360 * j / count), int(round(pitch)), 0)
+            if view not in views:
+                views.append(view)
+    return views
+
+
+def sphere_samples(count):
+    """球面上に均等に並べたサンプル方向 (count, 3)（equirect_remap と同じく y は下向き）"""
+    i = np.arange(count) + 0.5
+    y = 1 - 2 * i / count
+    r = np.sqrt(1 - y * y)
+    phi = i * math.pi * (3 - math.sqrt(5))
+    return np.stack([r * np.sin(phi), -y, r * np.cos(phi)], axis=-1)
+
+
+def _rotations(views):
+    return np.stack([equirect_remap.rotation_matrix(*view) for view in views])
+
+
+def visibility(directions, rotations, h_fov, v_fov):
+    """
+    各方向の画像に各視線ベクトルが写るか
+
+    Args:
+        directions: 視線ベクトル (M, 3)
+        rotations: 各方向の回転行列 (V, 3, 3)
+
+    Returns:
+        numpy.ndarray: (V, M) の bool
+    """
+    # 回転後の視線ベクトル → 各方向のカメラ座標（R^T d）
+    local = np.einsum("mj,vjk->vmk", directions, rotations)
+    z = local[..., 2]
+    return (
+        (z > 1e-9)
+        & (np.abs(local[..., 0]) <= math.tan(math.radians(h_fov) / 2) * z)
+        & (np.abs(local[..., 1]) <= math.tan(math.radians(v_fov) / 2) * z)
+    )
+
+
+def evaluate_view_set(views, h_fov=None, v_fov=None, samples=None, grid=None):
+    """
+    方向の組の被覆率と重なり率を数値的に求める
+
+    Returns:
+        dict:
+            coverage   : 全天の被覆率（0-1）
+            overlap    : 方向ごとの重なり率 (V,)（画素のうち、ほかの方向にも写る割合）
+            redundancy : 写っている方向の平均の重複数（1 = 重なりなし）
+    """
+    h_fov = h_fov or config.HORIZONTAL_FOV
+    v_fov = v_fov or config.VERTICAL_FOV
+    samples = samples or config.VIEW_COVERAGE_SAMPLES
+    grid = grid or config.VIEW_OVERLAP_GRID
+    rotations = _rotations(views)
+
+    counts = visibility(sphere_samples(samples), rotations, h_fov, v_fov).sum(axis=0)
+    covered = counts > 0
+
+    # 各方向の画素（grid x grid）を回転して、ほかの方向に写るかを調べる
+    pixels = equirect_remap.view_directions(grid, grid, h_fov, v_fov).reshape(-1, 3)
+    overlap = np.empty(len(views))
+    for i, rotation in enumerate(rotations):
+        seen = visibility(pixels @ rotation.T, rotations, h_fov, v_fov)
+        seen[i] = False
+        overlap[i] = seen.any(axis=0).mean()
+
+    return {
+        "coverage": float(covered.mean()),
+        "overlap": overlap,
+        "redundancy": float(counts[covered].mean()) if covered.any() else 0.0,
+    }
+
+
+def _satisfies(stats, overlap, min_coverage):
+    return stats["coverage"] >= min_coverage and stats["overlap"].min() >= overlap
+
+
+def _search_fibonacci(overlap, h_fov, v_fov, min_coverage):
+    # 全天の立体角を1方向の立体角で割った数から探し始める
+    tx, ty = math.tan(math.radians(h_fov) / 2), math.tan(math.radians(v_fov) / 2)
+    solid_angle = 4 * math.asin(tx * ty / math.sqrt((1 + tx * tx) * (1 + ty * ty)))
+    start = max(2, int(4 * math.pi / solid_angle))
+    for count in range(start, MAX_VIEWS + 1):
+        views = fibonacci_views(count)
+        stats = evaluate_view_set(views, h_fov, v_fov)
+        if _satisfies(stats, overlap, min_coverage):
+            return views, stats
+    return None
+
+
+def _search_rings(overlap, h_fov, v_fov, min_coverage):
+    # 間隔の広い（方向の少ない）側から詰めていき、条件を満たす最も少ない組を選ぶ
+    best = None
+    ratio = 1.0
+    while ratio > 0.1:
+        views = ring_views(h_fov, v_fov, ratio)
+        if len(views) > MAX_VIEWS or (best is not None and len(views) > 2 * len(best[0])):
+            break
+        stats = evaluate_view_set(views, h_fov, v_fov)
+        if _satisfies(stats, overlap, min_coverage) and (best is None or len(views) < len(best[0])):
+            best = (views, stats)
+        ratio -= 0.025
+    return best
+
+
+def plan_view_set(layout=None, overlap=None, h_fov=None, v_fov=None, min_coverage=None):
+    """
+    方向の組を計画する
+
+    Args:
+        layout: "cube" / "fibonacci" / "rings" / "auto"（デフォルト: config.VIEW_SET）
+        overlap: 方向ごとの重なり率の目標 0-1（デフォルト: config.VIEW_OVERLAP。cube では使わない）
+        h_fov / v_fov: FOV（デフォルト: config.HORIZONTAL_FOV / VERTICAL_FOV）
+        min_coverage: 全天の被覆率の下限（デフォルト: config.VIEW_MIN_COVERAGE）
+
+    Returns:
+        tuple: (方向のリスト [(yaw, pitch, roll), ...], プリセット名（ファイル名に入る）, 評価結果)
+
+    Raises:
+        RuntimeError: 不明なレイアウト、または MAX_VIEWS 方向以内で条件を満たす組がない場合
+    """
+    layout = layout or config.VIEW_SET or "auto"
+    overlap = config.VIEW_OVERLAP if overlap is None else overlap
+    h_fov = h_fov or config.HORIZONTAL_FOV
+    v_fov = v_fov or config.VERTICAL_FOV
+    min_coverage = config.VIEW_MIN_COVERAGE if min_coverage is None else min_coverage
+    if layout not in LAYOUTS:
+        raise RuntimeError(f"不明な方向の組: {layout}（{', '.join(LAYOUTS)} のいずれか）")
+
+    if layout == "cube":
+        # 重なりのない固定の組として選ぶものなので、重なり率の目標では判定しない
+        views = list(CUBE_VIEWS)
+        stats = evaluate_view_set(views, h_fov, v_fov)
+        if stats["coverage"] < min_coverage:
+            print(f"[警告] cube では全天を覆えません（被覆率 {stats['coverage']:.1%}、FOV {h_fov}x{v_fov}）")
+        return views, "cube", stats
+
+    candidates = []
+    if layout in ("fibonacci", "auto"):
+        found = _search_fibonacci(overlap, h_fov, v_fov, min_coverage)
+        if found:
+            candidates.append((found[0], f"fib{len(found[0])}", found[1]))
+    if layout in ("rings", "auto"):
+        found = _search_rings(overlap, h_fov, v_fov, min_coverage)
+        if found:
+            candidates.append((found[0], f"ring{len(found[0])}", found[1]))
+    if layout == "auto":
+        stats = evaluate_view_set(CUBE_VIEWS, h_fov, v_fov)
+        if _satisfies(stats, overlap, min_coverage):
+            candidates.append((list(CUBE_VIEWS), "cube", stats))
+
+    if not candidates:
+        raise RuntimeError(f"{MAX_VIEWS} 方向以内で条件（重なり率 {overlap:.0%}、被覆率 {min_coverage:.0%}）"
+                           f"を満たす {layout} の組が見つかりません。FOV を広げるか重なり率を下げてください")
+    return min(candidates, key=lambda c: len(c[0]))
+
+
+def describe(name, views, stats):
+    """評価結果を1行で表す"""
+    return (f"{name:10s}: {len(views):3d} 方向  被覆率 {stats['coverage']:6.1%}  "
+            f"重なり率 最小 {stats['overlap'].min():5.1%} / 平均 {stats['overlap'].mean():5.1%}  "
+            f"平均重複 {stats['redundancy']:.2f}")
+
+
+def main():
+    from batch_equirect2persp_ffmpeg import build_transforms_14, build_transforms_dense
+
+    parser = argparse.ArgumentParser(description="パースペクティブ変換の方向の組を計画して評価する")
+    parser.add_argument("--views", choices=LAYOUTS, default=None, help="レイアウト（デフォルト: config.VIEW_SET）")
+    parser.add_argument("--overlap", type=float, default=None, help="方向ごとの重なり率の目標 0-1")
+    parser.add_argument("--fov", type=float, default=None, help="FOV（水平・垂直とも。デフォルト: config の値）")
+    parser.add_argument("--list", action="store_true", help="計画した方向を一覧表示する")
+    args = parser.parse_args()
+
+    h_fov = args.fov or config.HORIZONTAL_FOV
+    v_fov = args.fov or config.VERTICAL_FOV
+    print(f"FOV: {h_fov}x{v_fov}  目標の重なり率: {config.VIEW_OVERLAP if args.overlap is None else args.overlap:.0%}"
+          f"  被覆率の下限: {config.VIEW_MIN_COVERAGE:.0%}")
+    print("\n[既存のプリセット]")
+    for name, views in (("rc14", build_transforms_14()), (f"dense{config.RING_STEP_DEG}", build_transforms_dense())):
+        print("  " + describe(name, views, evaluate_view_set(views, h_fov, v_fov)))
+
+    try:
+        views, name, stats = plan_view_set(args.views, args.overlap, h_fov, v_fov)
+    except RuntimeError as e:
+        print(f"\nエラー: {e}")
+        return 1
+    print("\n[計画]")
+    print("  " + describe(name, views, stats))
+    if args.list:
+        for (yaw, pitch, roll), ov in zip(views, stats["overlap"]):
+            print(f"    yaw={yaw:+4d} pitch={pitch:+3d} roll={roll:+d}  重なり率 {ov:5.1%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+detection_index.DetectionIndex の保存・読み込みのチェック
+
+実行: python -m pytest -q tests
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import detection_index  # noqa: E402
+from detection_index import DetectionIndex  # noqa: E402
+
+
+class DetectionIndexTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_round_trip_including_frames_without_faces(self):
+        index = DetectionIndex(self.dir)
+        index.set("frame_000000.jpg", (640, 320), [(10, 20, 30, 40, 0.9), (100, 50, 20, 20, 0.5)], "haar:cube:0:0")
+        index.set("frame_000001.jpg", (640, 320), [], "haar:cube:0:0")
+        index.set("frame_000002.jpg", (640, 320), [(1, 2, 3, 4)], "haar:cube:0:0")
+        index.save()
+
+        loaded = DetectionIndex(self.dir)
+        self.assertEqual(sorted(loaded.frames), ["frame_000000.jpg", "frame_000001.jpg", "frame_000002.jpg"])
+        boxes = loaded.boxes("frame_000000.jpg")
+        self.assertEqual([b[:4] for b in boxes], [(10, 20, 30, 40), (100, 50, 20, 20)])
+        self.assertAlmostEqual(boxes[0][4], 0.9, places=5)
+        # 顔のないフレームも「検出済み・0 個」として残る（未検出の None とは区別する）
+        self.assertEqual(loaded.boxes("frame_000001.jpg"), [])
+        self.assertEqual(loaded.boxes("frame_000002.jpg"), [(1, 2, 3, 4, 0.0)])
+        self.assertIsNone(loaded.boxes("frame_000003.jpg"))
+        # 大きさが違うフレームの枠は使わない
+        self.assertIsNone(loaded.boxes("frame_000000.jpg", (1280, 640)))
+        self.assertFalse(loaded.modified)
+
+    def test_round_trip_of_an_index_without_faces(self):
+        index = DetectionIndex(self.dir)
+        index.set("frame_000000.jpg", (64, 32), [], "haar:cube:0:0")
+        index.save()
+        self.assertEqual(DetectionIndex(self.dir).frames, {"frame_000000.jpg": ((64, 32), [], "haar:cube:0:0")})
+
+    def test_params_are_kept_per_frame(self):
+        index = DetectionIndex(self.dir)
+        index.set("frame_000000.jpg", (64, 32), [(1, 1, 8, 8, 0.9)], "haar:cube:0:0")
+        index.save()
+
+        # 別の設定で一部だけ検出し直しても、残りのフレームの設定は書き換わらない
+        index = DetectionIndex(self.dir)
+        index.set("frame_000001.jpg", (64, 32), [(2, 2, 8, 8, 0.8)], "yunet:cube:960:0")
+        index.save()
+
+        loaded = DetectionIndex(self.dir)
+        self.assertEqual(loaded.params("frame_000000.jpg"), "haar:cube:0:0")
+        self.assertEqual(loaded.params("frame_000001.jpg"), "yunet:cube:960:0")
+        self.assertIsNone(loaded.params("frame_000002.jpg"))
+
+    def test_reads_the_old_single_params_format(self):
+        np.savez_compressed(
+            self.dir / detection_index.DETECTIONS_NAME,
+            frames=np.array(["a.jpg", "b.jpg"]),
+            frame_size=np.array([[64, 32], [64, 32]], dtype=np.int32),
+            frame_id=np.array([0], dtype=np.int32),
+            bbox=np.array([[1, 2, 3, 4]], dtype=np.int32),
+            score=np.array([0.7], dtype=np.float32),
+            params=np.array("haar:cube:0:0"),
+        )
+        loaded = DetectionIndex(self.dir)
+        self.assertEqual(loaded.params("a.jpg"), "haar:cube:0:0")
+        self.assertEqual(loaded.params("b.jpg"), "haar:cube:0:0")
+        self.assertEqual(loaded.boxes("b.jpg"), [])
+        self.assertEqual(len(loaded.boxes("a.jpg")), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
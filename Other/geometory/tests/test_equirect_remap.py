@@ -0,0 +1,149 @@
+"""
+equirect_remap の幾何チェック
+
+Equirect 画像の各画素に自分の座標 (u, v) を書いた合成画像を変換し、
+出力画素が指す座標を、回転行列を使わずに解析的に求めた値と比べる。
+座標はどちらの方向にも線形なので、バイリニア補間しても値は変わらない
+（誤差は固定小数点マップの 1/32 画素程度）。
+ffmpeg がある場合は、v360 フィルタの出力とも画素比較する（ない場合は skip）。
+
+実行: python -m pytest -q tests（または python -m unittest discover tests）
+"""
+
+import math
+import shutil
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import batch_equirect2persp_ffmpeg as persp  # noqa: E402
+import benchmark  # noqa: E402
+import equirect_remap  # noqa: E402
+
+SRC_W, SRC_H = 2048, 1024
+OUT = 64
+FOV = 90
+# 固定小数点マップ（1/32 画素）とバイリニア補間の誤差の上限
+TOLERANCE = 0.1
+
+
+def coordinate_image(width=SRC_W, height=SRC_H):
+    """各画素の値が (u, v, 0) の float32 の Equirect 画像"""
+    u, v = np.meshgrid(np.arange(width, dtype=np.float32), np.arange(height, dtype=np.float32))
+    return np.dstack([u, v, np.zeros_like(u)])
+
+
+def expected_uv(lon_deg, lat_deg, width=SRC_W, height=SRC_H):
+    """経度・緯度（度、緯度は下向きが正）の Equirect 座標"""
+    return (lon_deg / 180 + 1) * (width - 1) / 2, (lat_deg / 90 + 1) * (height - 1) / 2
+
+
+def pixel_tangent(i, size=OUT, fov=FOV):
+    """出力画素 i の中心の、視線に対する接平面上の位置"""
+    return math.tan(math.radians(fov) / 2) * ((2 * i + 1) / size - 1)
+
+
+class RemapGeometryTest(unittest.TestCase):
+    def setUp(self):
+        self.image = coordinate_image()
+        self.cache = equirect_remap.RemapCache()
+
+    def render(self, yaw, pitch, roll):
+        return equirect_remap.remap_view(self.image, yaw, pitch, roll, self.cache,
+                                         out_w=OUT, out_h=OUT, h_fov=FOV, v_fov=FOV)
+
+    def assertSamples(self, view, i, j, lon, lat):
+        u, v = expected_uv(lon, lat)
+        self.assertAlmostEqual(float(view[j, i, 0]), u, delta=TOLERANCE, msg=f"u at ({i}, {j})")
+        self.assertAlmostEqual(float(view[j, i, 1]), v, delta=TOLERANCE, msg=f"v at ({i}, {j})")
+
+    def test_horizontal_views_follow_rectilinear_projection(self):
+        # pitch = roll = 0: 経度 = yaw + atan(x)、緯度 = atan(y / sqrt(1 + x²))
+        for yaw in (0, 45, -90, 135):
+            view = self.render(yaw, 0, 0)
+            for i in range(0, OUT, 7):
+                for j in range(0, OUT, 7):
+                    x, y = pixel_tangent(i), pixel_tangent(j)
+                    lon = yaw + math.degrees(math.atan(x))
+                    lat = math.degrees(math.atan(y / math.hypot(1, x)))
+                    self.assertSamples(view, i, j, lon, lat)
+
+    def test_view_center_points_at_yaw_and_pitch(self):
+        # 出力の中心（偶数サイズなので中央4画素の平均）は (yaw, pitch) の方向。pitch +90 が真上
+        for yaw, pitch in ((30, 20), (-120, -45), (90, 60), (0, -70)):
+            view = self.render(yaw, pitch, 0)
+            center = view[OUT // 2 - 1:OUT // 2 + 1, OUT // 2 - 1:OUT // 2 + 1].mean(axis=(0, 1))
+            u, v = expected_uv(yaw, -pitch)
+            self.assertAlmostEqual(float(center[0]), u, delta=TOLERANCE)
+            self.assertAlmostEqual(float(center[1]), v, delta=TOLERANCE)
+
+    def test_roll_rotates_the_view(self):
+        # roll 90: 出力の (x, y) は roll 0 の (-y, x) の方向（右向きが下、下向きが左になる）
+        view = self.render(0, 0, 90)
+        for i in range(0, OUT, 7):
+            for j in range(0, OUT, 7):
+                x, y = pixel_tangent(i), pixel_tangent(j)
+                lon = math.degrees(math.atan(-y))
+                lat = math.degrees(math.atan(x / math.hypot(1, y)))
+                self.assertSamples(view, i, j, lon, lat)
+
+
+class BoxConventionTest(unittest.TestCase):
+    def test_view_box_matches_the_map(self):
+        # 出力画素の中心を通る枠なら、辺の上の点が remap で読む Equirect の位置（境界座標に直したもの）と、
+        # view_box_to_equirect の枠は、整数への丸め（1画素未満）しか違わない
+        size = 512
+        for yaw, pitch in ((0, 0), (-90, 20), (90, -30), (178, 0)):
+            boxes = equirect_remap.view_box_to_equirect(
+                (100.5, 150.5, 299, 199), yaw, pitch, 0, size, size, FOV, FOV, SRC_W, SRC_H)
+            map_x, map_y = equirect_remap.build_maps(yaw, pitch, 0, SRC_W, SRC_H, size, size, FOV, FOV)
+            edge = np.zeros(map_x.shape, dtype=bool)
+            edge[[150, 349], 100:400] = True
+            edge[150:350, [100, 399]] = True
+            xs, ys = map_x[edge] + 0.5, map_y[edge] + 0.5
+            x, y, w, h = boxes[0]
+            right = x + w
+            if len(boxes) == 2:
+                # 継ぎ目をまたぐ: 左端側の点は右端の続き（経度 360 度 = W-1 画素）
+                xs = np.where(xs < SRC_W / 2, xs + (SRC_W - 1), xs)
+                right = boxes[1][2] + (SRC_W - 1)
+            for edge_value, expected in ((x, xs.min()), (right, xs.max()), (y, ys.min()), (y + h, ys.max())):
+                self.assertAlmostEqual(edge_value, expected, delta=1.0, msg=(yaw, pitch, boxes))
+        self.assertEqual(len(boxes), 2)
+
+    def test_equirect_box_round_trip(self):
+        box = (1000, 400, 60, 80)
+        view = equirect_remap.equirect_box_to_view(box, 0, 0, 0, SRC_W, SRC_H, OUT, OUT, FOV, FOV)
+        (back,) = equirect_remap.view_box_to_equirect(view, 0, 0, 0, OUT, OUT, FOV, FOV, SRC_W, SRC_H)
+        # 出力画素への丸め（両側で1画素ずつ、90 度 = W/4 を OUT 画素）の分だけ広がるが、元の枠を含む
+        self.assertLessEqual(back[0], box[0])
+        self.assertLessEqual(back[1], box[1])
+        self.assertGreaterEqual(back[0] + back[2], box[0] + box[2])
+        self.assertGreaterEqual(back[1] + back[3], box[1] + box[3])
+        self.assertLessEqual(back[2], box[2] + 2 * SRC_W / 4 / OUT)
+        self.assertLessEqual(back[3], box[3] + 2 * SRC_W / 4 / OUT)
+
+
+@unittest.skipUnless(shutil.which("ffmpeg"), "ffmpeg が見つからない")
+class FfmpegParityTest(unittest.TestCase):
+    # benchmark.py convert の --min-psnr の既定値と同じ
+    MIN_PSNR = 40.0
+
+    def test_remap_matches_ffmpeg_v360(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            png = tmp / "equirect.png"
+            cv2.imwrite(str(png), benchmark.make_synthetic_equirect(1024, 512))
+            results = benchmark.check_remap_against_ffmpeg(png, persp.build_transforms_14(), tmp)
+        for transform, psnr, _ in results:
+            self.assertGreaterEqual(psnr, self.MIN_PSNR, transform)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+"""
+画像の端にかかる顔の枠のチェック（検出器のモデル不要）
+
+実行: python -m pytest -q tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import face_blur  # noqa: E402
+import face_detect  # noqa: E402
+
+
+class StubBackend:
+    """決まった枠を返すバックエンド"""
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+
+    def detect(self, image, min_size):
+        return list(self.boxes)
+
+
+def stub_detector(boxes, projection="equirect", detect_width=0):
+    detector = face_detect.FaceDetector.__new__(face_detect.FaceDetector)
+    detector.backend = StubBackend(boxes)
+    detector.projection = projection
+    detector.detect_width = detect_width
+    detector.min_size = 10
+    return detector
+
+
+class EdgeBoxTest(unittest.TestCase):
+    def setUp(self):
+        self.image = np.random.default_rng(0).integers(0, 255, (100, 200, 3), dtype=np.uint8)
+
+    def test_wrap_boxes_splits_at_the_seam_and_clips_vertically(self):
+        boxes = face_detect.wrap_boxes(
+            [(-5, 10, 30, 30, 0.9), (190, -5, 30, 30, 0.8), (50, 90, 10, 20, 0.7)], 200, 100)
+        self.assertEqual(boxes, [
+            (195, 10, 5, 30, 0.9), (0, 10, 25, 30, 0.9),
+            (190, 0, 10, 25, 0.8), (0, 0, 20, 25, 0.8),
+            (50, 90, 10, 10, 0.7),
+        ])
+
+    def test_detect_returns_boxes_inside_the_image(self):
+        for projection, detect_width in (("equirect", 0), ("equirect", 100), ("tiles", 0)):
+            boxes = stub_detector([(-4, -2, 20, 20, 0.9)], projection, detect_width).detect(self.image)
+            self.assertTrue(boxes)
+            for x, y, w, h, _ in boxes:
+                self.assertTrue(0 <= x and x + w <= 200 and 0 <= y and y + h <= 100, (projection, boxes))
+            # 左端からはみ出した分は右端に回り込む
+            self.assertTrue(any(x + w == 200 for x, _, w, _, _ in boxes), (projection, boxes))
+
+    def test_apply_blur_ignores_the_part_outside_the_image(self):
+        before = self.image.copy()
+        face_blur.apply_blur(self.image, [(-5, 10, 30, 30, 0.9), (300, 300, 5, 5, 0.9)], 51)
+        self.assertFalse(np.array_equal(self.image[10:40, 0:25], before[10:40, 0:25]))
+        self.assertTrue(np.array_equal(self.image[:, 25:], before[:, 25:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
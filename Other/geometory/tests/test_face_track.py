@@ -0,0 +1,102 @@
+"""
+face_track.FaceTracker のチェック（検出器は決まった枠を返すスタブ、フレームは合成）
+
+実行: python -m pytest -q tests
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import face_track  # noqa: E402
+
+WIDTH, HEIGHT = 320, 160
+PATCH = 40
+
+
+class ScriptedDetector:
+    """detect() が呼ばれたフレーム番号を記録し、boxes(フレーム番号) の枠を返す"""
+
+    def __init__(self, boxes):
+        self.boxes = boxes
+        self.frame = 0
+        self.calls = []
+
+    def detect(self, image):
+        self.calls.append(self.frame)
+        return list(self.boxes(self.frame))
+
+
+def moving_frames(count, start=(60, 60), velocity=(3, 1), seed=0):
+    """なめらかな背景の上を、模様のある正方形が一定速度で動くフレーム列（と正方形の位置）"""
+    rng = np.random.default_rng(seed)
+    background = cv2.GaussianBlur(rng.integers(60, 120, (HEIGHT, WIDTH, 3), dtype=np.uint8), (15, 15), 0)
+    patch = cv2.GaussianBlur(rng.integers(0, 255, (PATCH, PATCH, 3), dtype=np.uint8), (3, 3), 0)
+    frames, positions = [], []
+    for i in range(count):
+        x, y = start[0] + velocity[0] * i, start[1] + velocity[1] * i
+        image = background.copy()
+        image[y:y + PATCH, x:x + PATCH] = patch
+        frames.append(image)
+        positions.append((x, y))
+    return frames, positions
+
+
+def run(tracker, detector, frames):
+    results = []
+    for i, frame in enumerate(frames):
+        detector.frame = i
+        results.append(tracker.update(frame))
+    return results
+
+
+class FaceTrackerTest(unittest.TestCase):
+    def test_detects_every_k_frames_and_tracks_in_between(self):
+        frames, positions = moving_frames(10)
+        detector = ScriptedDetector(lambda i: [(*positions[i], PATCH, PATCH, 0.9)])
+        tracker = face_track.FaceTracker(detector, detect_every=4, dilate=0, track_width=WIDTH)
+        results = run(tracker, detector, frames)
+
+        self.assertEqual(detector.calls, [0, 4, 8])
+        self.assertEqual((tracker.detections, tracker.frames), (3, 10))
+        # 検出しないフレームでも、枠は正方形と一緒に動く（optical flow の誤差は 1px 程度）
+        for (x, y), boxes in zip(positions, results):
+            (bx, by, bw, bh, _), = boxes
+            self.assertLessEqual(abs(bx - x), 1.5)
+            self.assertLessEqual(abs(by - y), 1.5)
+            # 追跡中は位置が小数になり、整数に丸めると 1px 大きくなることがある
+            self.assertIn(bw, (PATCH, PATCH + 1))
+            self.assertIn(bh, (PATCH, PATCH + 1))
+
+    def test_scene_change_triggers_detection(self):
+        frames, positions = moving_frames(8)
+        frames[5:] = [255 - f for f in frames[5:]]  # 5 フレーム目から別のシーン
+        detector = ScriptedDetector(lambda i: [(*positions[i], PATCH, PATCH, 0.9)])
+        tracker = face_track.FaceTracker(detector, detect_every=100, track_width=WIDTH)
+        run(tracker, detector, frames)
+        self.assertEqual(detector.calls, [0, 5])
+
+    def test_missed_faces_expire_after_max_misses(self):
+        frames, _ = moving_frames(5, velocity=(0, 0))
+        detector = ScriptedDetector(lambda i: [(60, 60, PATCH, PATCH, 0.9)] if i == 0 else [])
+        tracker = face_track.FaceTracker(detector, detect_every=1, max_misses=2, track_width=WIDTH)
+        results = run(tracker, detector, frames)
+        # 0: 検出、1・2: 見逃し 1・2 回目（残す）、3: 3 回目で捨てる
+        self.assertEqual([len(boxes) for boxes in results], [1, 1, 1, 0, 0])
+
+    def test_boxes_are_dilated_and_clipped(self):
+        frames, _ = moving_frames(1)
+        detector = ScriptedDetector(lambda i: [(10, 20, 40, 40, 0.9), (290, -5, 40, 40, 0.8)])
+        tracker = face_track.FaceTracker(detector, detect_every=1, dilate=0.25, track_width=WIDTH)
+        (boxes,) = run(tracker, detector, frames)
+        # 各辺 40 * 0.25 = 10px 広げ、画像内に収める
+        self.assertEqual(boxes, [(0, 10, 60, 60, 0.9), (280, 0, 40, 45, 0.8)])
+
+
+if __name__ == "__main__":
+    unittest.main()
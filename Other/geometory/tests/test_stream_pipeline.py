@@ -0,0 +1,110 @@
+"""
+stream_pipeline の失敗時の挙動のチェック（小さな合成動画を使う）
+
+実行: python -m pytest -q tests
+"""
+
+import contextlib
+import io
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import benchmark  # noqa: E402
+import equirect_remap  # noqa: E402
+import stream_pipeline  # noqa: E402
+import video_frame_extractor  # noqa: E402
+
+FRAMES = 12
+TRANSFORMS = [(0, 0, 0), (90, 0, 0), (180, 0, 0)]
+
+
+class StreamPipelineTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = Path(tmp.name)
+        self.video = self.tmp / "video.avi"
+        benchmark.make_synthetic_video(self.video, FRAMES, 256, 128)
+        patcher = mock.patch.object(stream_pipeline, "select_transforms", return_value=(TRANSFORMS, "t3"))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_pipeline(self, timeout=30, **kwargs):
+        """別スレッドで実行し、(例外, 標準出力) を返す。timeout 秒で終わらなければ失敗にする"""
+        result = {}
+        out = io.StringIO()
+
+        def target():
+            try:
+                with contextlib.redirect_stdout(out):
+                    stream_pipeline.run_stream_pipeline(self.video, self.tmp / "out", **kwargs)
+            except Exception as e:
+                result["error"] = e
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+        thread.join(timeout)
+        self.assertFalse(thread.is_alive(), "パイプラインが止まったまま終わらない")
+        return result.get("error"), out.getvalue()
+
+    def test_detector_load_failure_stops_the_pipeline(self):
+        # キュー1枚・ワーカー2つ: 以前は全ワーカーが終了し、submit() が満杯のキューで止まっていた
+        with mock.patch.object(stream_pipeline.face_blur, "FaceDetector", side_effect=RuntimeError("no model")):
+            error, _ = self.run_pipeline(blur=True, workers=2, memory_mb=256 * 128 * 3 * 3 / 1024 / 1024)
+        self.assertIsInstance(error, RuntimeError)
+        self.assertIn("no model", str(error))
+
+    def test_failed_frames_and_views_are_counted_separately(self):
+        real_remap = equirect_remap.remap_view
+        calls = {"n": 0}
+        lock = threading.Lock()
+
+        def remap_view(frame, yaw, pitch, roll, cache):
+            with lock:
+                calls["n"] += 1
+                n = calls["n"]
+            if n == 1:
+                raise RuntimeError("boom")  # このフレームは丸ごと失敗
+            return real_remap(frame, yaw, pitch, roll, cache)
+
+        real_imwrite = stream_pipeline.cv2.imwrite
+
+        def imwrite(path, image, params):
+            if path.endswith("frame_000003_t3_1_yaw+90_pit+0_rol+0.jpg"):
+                return False  # このフレームは1方向だけ失敗
+            return real_imwrite(path, image, params)
+
+        with mock.patch.object(stream_pipeline.equirect_remap, "remap_view", remap_view), \
+                mock.patch.object(stream_pipeline.cv2, "imwrite", imwrite):
+            error, out = self.run_pipeline(workers=1)
+        self.assertIsInstance(error, RuntimeError)
+        self.assertIn(f"出力画像: {(FRAMES - 1) * len(TRANSFORMS) - 1} 枚", out)
+        self.assertIn("フレーム 1 枚、出力 1 枚", out)
+        (output_dir,) = (self.tmp / "out").iterdir()
+        self.assertEqual(len(list(output_dir.glob("*.jpg"))), (FRAMES - 1) * len(TRANSFORMS) - 1)
+
+
+class OutputFolderNameTest(unittest.TestCase):
+    def test_extract_uses_the_shared_folder_name(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+            video = tmp / "clip.avi"
+            benchmark.make_synthetic_video(video, FRAMES, 128, 64, fps=4)
+            with contextlib.redirect_stdout(io.StringIO()):
+                frames_dir = video_frame_extractor.extract_frames_interval(str(video), str(tmp), every_sec=1)
+            folder = Path(frames_dir).parent.parent.name
+            mode_name, _ = video_frame_extractor.sampling_mode(every_sec=1)
+            expected = video_frame_extractor.output_folder_name(str(video), FRAMES, 4, 3, mode_name)
+        # 末尾の時刻（HHMMSS）以外は同じ
+        self.assertEqual(folder[:-6], expected[:-6])
+        self.assertTrue(folder.startswith("clip_3frames_every1s_0min3sec_"), folder)
+
+
+if __name__ == "__main__":
+    unittest.main()
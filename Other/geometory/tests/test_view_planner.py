@@ -0,0 +1,89 @@
+"""
+view_planner の方向の組の計画・評価のチェック
+
+実行: python -m pytest -q tests
+"""
+
+import contextlib
+import io
+import sys
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+
+import view_planner  # noqa: E402
+
+MIN_COVERAGE = 0.999
+
+
+def plan(layout, overlap, fov=90):
+    """plan_view_set を実行し、(方向, プリセット名, 評価結果, 標準出力) を返す"""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        views, name, stats = view_planner.plan_view_set(layout, overlap, fov, fov, MIN_COVERAGE)
+    return views, name, stats, out.getvalue()
+
+
+class EvaluateViewSetTest(unittest.TestCase):
+    def test_cube_covers_the_sphere_once_at_fov_90(self):
+        stats = view_planner.evaluate_view_set(view_planner.CUBE_VIEWS, 90, 90)
+        self.assertAlmostEqual(stats["coverage"], 1.0, places=3)
+        self.assertAlmostEqual(stats["redundancy"], 1.0, places=2)
+        self.assertLess(stats["overlap"].max(), 0.05)
+
+    def test_narrow_cube_leaves_gaps(self):
+        stats = view_planner.evaluate_view_set(view_planner.CUBE_VIEWS, 60, 60)
+        self.assertLess(stats["coverage"], 0.9)
+
+
+class PlanViewSetTest(unittest.TestCase):
+    def assert_meets(self, stats, overlap):
+        self.assertGreaterEqual(stats["coverage"], MIN_COVERAGE)
+        self.assertGreaterEqual(stats["overlap"].min(), overlap)
+
+    def test_fibonacci_meets_the_targets(self):
+        for overlap in (0.3, 0.6):
+            with self.subTest(overlap=overlap):
+                views, name, stats, _ = plan("fibonacci", overlap)
+                self.assert_meets(stats, overlap)
+                self.assertEqual(name, f"fib{len(views)}")
+                # 1つ少ない組は条件を満たさない（最小の組を選んでいる）
+                fewer = view_planner.evaluate_view_set(view_planner.fibonacci_views(len(views) - 1), 90, 90)
+                self.assertFalse(view_planner._satisfies(fewer, overlap, MIN_COVERAGE))
+
+    def test_auto_meets_the_targets_with_the_fewest_views(self):
+        views, _, stats, _ = plan("auto", 0.3)
+        self.assert_meets(stats, 0.3)
+        fib, _, _, _ = plan("fibonacci", 0.3)
+        rings, _, _, _ = plan("rings", 0.3)
+        self.assertEqual(len(views), min(len(fib), len(rings)))
+
+    def test_six_views_suffice_without_an_overlap_target(self):
+        views, _, stats, _ = plan("auto", 0.0)
+        self.assert_meets(stats, 0.0)
+        self.assertEqual(len(views), len(view_planner.CUBE_VIEWS))
+
+    def test_cube_ignores_the_overlap_target(self):
+        views, name, stats, out = plan("cube", 0.3)
+        self.assertEqual((name, views), ("cube", view_planner.CUBE_VIEWS))
+        self.assertEqual(out, "")
+        # 全天を覆えない FOV では警告する
+        _, _, _, out = plan("cube", 0.3, fov=60)
+        self.assertIn("[警告]", out)
+
+    def test_impossible_target_raises(self):
+        with mock.patch.object(view_planner, "MAX_VIEWS", 12):
+            with self.assertRaises(RuntimeError):
+                plan("fibonacci", 0.95)
+            with self.assertRaises(RuntimeError):
+                plan("auto", 0.95)
+
+    def test_unknown_layout_raises(self):
+        with self.assertRaises(RuntimeError):
+            plan("hexagon", 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Benchmarks for vrcSendDiscord.py (stdlib-only, no network).
+
+  packing : posts per 1,000 images and fill ratio, greedy vs binpack, over
+            synthetic screenshot size distributions.
+  scan    : collect + filter + chunk time and stat calls (os.stat and
+            DirEntry.stat) on a screenshot tree, old Path.rglob/stat
+            pipeline vs scan_image_files records.
+
+Usage examples:
+  python bench_vrcSendDiscord.py packing
+  python bench_vrcSendDiscord.py packing --images 20000 --max-bytes 25000000
+  python bench_vrcSendDiscord.py scan --files 100000
+  python bench_vrcSendDiscord.py scan --root /mnt/nas/VRChat
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import os
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import vrcSendDiscord as vsd
+
+
+MB = 1024 * 1024
+
+
+def _size_distributions() -> Dict[str, Callable[[random.Random], int]]:
+    return {
+        # 1080p PNGs: fairly uniform sizes
+        "uniform_1-3MB": lambda r: int(r.uniform(1.0, 3.0) * MB),
+        # mixed resolutions: long tail towards 4K
+        "lognormal_2MB": lambda r: int(min(r.lognormvariate(0.7, 0.6), 7.5) * MB),
+        # camera JPEGs mixed with 4K PNGs
+        "bimodal_0.4/5MB": lambda r: int(
+            (r.uniform(0.2, 0.6) if r.random() < 0.6 else r.uniform(4.0, 7.0)) * MB
+        ),
+    }
+
+
+def _synthetic_items(
+    n: int, size_fn: Callable[[random.Random], int], seed: int
+) -> List[Tuple[int, int, float]]:
+    """(id, size, mtime): bursts of shots separated by idle gaps, like a play session."""
+    r = random.Random(seed)
+    items: List[Tuple[int, int, float]] = []
+    t = 0.0
+    for i in range(n):
+        t += r.expovariate(1 / 5.0) if r.random() < 0.9 else r.uniform(600, 7200)
+        items.append((i, size_fn(r), t))
+    return items
+
+
+def bench_packing(args: argparse.Namespace) -> int:
+    overhead = 200_000
+    print(
+        f"images={args.images} max_bytes={vsd._human_bytes(args.max_bytes)} "
+        f"max_files={args.max_files} window={args.window}"
+    )
+    print(f"{'distribution':<18} {'packer':<8} {'posts/1k':>9} {'fill':>7} {'time':>8}")
+    for name, size_fn in _size_distributions().items():
+        items = _synthetic_items(args.images, size_fn, args.seed)
+        total = sum(sz for _, sz, _ in items)
+        sizes = {i: sz for i, sz, _ in items}
+        packers = {
+            "greedy": lambda: vsd.pack_greedy(items, args.max_bytes, args.max_files, overhead),
+            "binpack": lambda: vsd.pack_binpack(
+                items, args.max_bytes, args.max_files, overhead, window=args.window
+            ),
+        }
+        for packer, fn in packers.items():
+            t0 = time.perf_counter()
+            chunks = fn()
+            elapsed = time.perf_counter() - t0
+            assert sorted(i for ch in chunks for i in ch) == list(range(len(items)))
+            for ch in chunks:
+                if len(ch) > 1:
+                    assert sum(sizes[i] for i in ch) + overhead <= args.max_bytes
+            posts_per_1k = len(chunks) * 1000 / len(items)
+            fill = total / (len(chunks) * args.max_bytes)
+            print(
+                f"{name:<18} {packer:<8} {posts_per_1k:>9.1f} {fill:>6.1%} {elapsed * 1000:>6.1f}ms"
+            )
+    return 0
+
+
+def _make_tree(root: Path, n_files: int, seed: int) -> None:
+    """VRChat-like layout: one folder per month, ~2% non-image files."""
+    r = random.Random(seed)
+    per_month = 2000
+    for i in range(n_files):
+        month = root / f"2025-{i // per_month:03d}"
+        if i % per_month == 0:
+            month.mkdir(parents=True, exist_ok=True)
+        ext = ".txt" if r.random() < 0.02 else ".png"
+        (month / f"VRChat_{i:07d}_3840x2160{ext}").write_bytes(b"x" * r.randint(1, 64))
+
+
+def _legacy_collect_and_chunk(root: Path, max_bytes: int, max_files: int) -> int:
+    """The pre-ImageFile pipeline: rglob + is_file, stat in filter and sort keys, stat per chunk."""
+    files = [p for p in root.rglob("*") if p.is_file() and p.suffix.lower() in vsd.IMAGE_EXTS]
+    files = sorted(files, key=lambda p: p.stat().st_mtime)
+    chunks: List[List[Path]] = []
+    current: List[Path] = []
+    current_size = 200_000
+    for f in files:
+        sz = f.stat().st_size
+        if current and (len(current) >= max_files or current_size + sz > max_bytes):
+            chunks.append(current)
+            current, current_size = [], 200_000
+        current.append(f)
+        current_size += sz
+    if current:
+        chunks.append(current)
+    # dry-run size summary
+    for ch in chunks:
+        sum(p.stat().st_size for p in ch if p.exists())
+    return len(files)
+
+
+def _records_collect_and_chunk(root: Path, max_bytes: int, max_files: int) -> int:
+    files = vsd.filter_since(vsd.scan_image_files(root, recursive=True), since=None)
+    chunks = vsd.chunk_files_by_size(files, max_bytes=max_bytes, max_files_per_post=max_files)
+    for ch in chunks:
+        sum(p.size for p in ch)
+    return len(files)
+
+
+class _CountingDirEntry:
+    """os.DirEntry proxy that counts stat() calls (DirEntry cannot be patched)."""
+
+    def __init__(self, entry: os.DirEntry, calls: List[int]):
+        self._entry = entry
+        self._calls = calls
+
+    def stat(self, *, follow_symlinks: bool = True) -> os.stat_result:
+        self._calls[0] += 1
+        return self._entry.stat(follow_symlinks=follow_symlinks)
+
+    def __getattr__(self, name: str):
+        return getattr(self._entry, name)
+
+    def __fspath__(self) -> str:
+        return self._entry.path
+
+
+class _CountingScandir:
+    def __init__(self, it: Iterator[os.DirEntry], calls: List[int]):
+        self._it = it
+        self._calls = calls
+
+    def __iter__(self) -> "_CountingScandir":
+        return self
+
+    def __next__(self) -> _CountingDirEntry:
+        return _CountingDirEntry(next(self._it), self._calls)
+
+    def __enter__(self) -> "_CountingScandir":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._it.close()
+
+    def close(self) -> None:
+        self._it.close()
+
+
+@contextlib.contextmanager
+def _count_stats() -> Iterator[List[int]]:
+    """
+    Count os.stat and os.DirEntry.stat calls made inside the block. A
+    DirEntry.stat call is counted even when the result was already cached
+    (it is on Windows), so this is an upper bound on stat syscalls.
+    """
+    calls = [0]
+    real_stat, real_scandir = os.stat, os.scandir
+
+    def counting_stat(*a, **kw):
+        calls[0] += 1
+        return real_stat(*a, **kw)
+
+    os.stat = counting_stat
+    os.scandir = lambda *a, **kw: _CountingScandir(real_scandir(*a, **kw), calls)
+    try:
+        yield calls
+    finally:
+        os.stat, os.scandir = real_stat, real_scandir
+
+
+def bench_scan(args: argparse.Namespace) -> int:
+    tmp = None
+    if args.root:
+        root = Path(args.root).expanduser()
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="vrcSendDiscord-bench-")
+        root = Path(tmp.name)
+        t0 = time.perf_counter()
+        _make_tree(root, args.files, args.seed)
+        print(f"created {args.files} files in {time.perf_counter() - t0:.1f}s: {root}")
+
+    runs = {
+        "rglob+stat (old)": _legacy_collect_and_chunk,
+        "scan_image_files": _records_collect_and_chunk,
+    }
+    try:
+        print(f"{'pipeline':<18} {'images':>8} {'best':>8} {'stat calls':>11}")
+        for name, fn in runs.items():
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                n = fn(root, 8 * MB, 10)
+                best = min(best, time.perf_counter() - t0)
+            # Counted in a separate run so the wrappers do not skew the timing.
+            with _count_stats() as stat_calls:
+                fn(root, 8 * MB, 10)
+            print(f"{name:<18} {n:>8} {best:>7.2f}s {stat_calls[0]:>11}")
+    finally:
+        if tmp is not None:
+            tmp.cleanup()
+    return 0
+
+
+def parse_args(argv: List[str]) -> argparse.Namespace:
+    p = argparse.ArgumentParser(description="Benchmarks for vrcSendDiscord.py.")
+    sub = p.add_subparsers(dest="command", required=True)
+
+    pk = sub.add_parser("packing", help="Compare greedy and binpack chunk packing.")
+    pk.add_argument("--images", type=int, default=10_000)
+    pk.add_argument("--max-bytes", type=int, default=8 * MB)
+    pk.add_argument("--max-files", type=int, default=10)
+    pk.add_argument("--window", type=int, default=100)
+    pk.add_argument("--seed", type=int, default=1)
+    pk.set_defaults(func=bench_packing)
+
+    sc = sub.add_parser("scan", help="Compare the old and record-based scan pipelines.")
+    sc.add_argument("--root", default=None, help="Existing screenshot tree (default: synthetic).")
+    sc.add_argument("--files", type=int, default=100_000, help="Synthetic tree size.")
+    sc.add_argument("--repeat", type=int, default=3)
+    sc.add_argument("--seed", type=int, default=1)
+    sc.set_defaults(func=bench_scan)
+
+    return p.parse_args(argv)
+
+
+def main(argv: List[str]) -> int:
+    args = parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
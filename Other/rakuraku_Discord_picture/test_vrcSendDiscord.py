@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tests for vrcSendDiscord.py (stdlib-only, no network: a local stand-in
+webhook server is used where real HTTP behaviour matters).
+
+Usage:
+  python -m unittest test_vrcSendDiscord
+  python -m pytest -q test_vrcSendDiscord.py
+"""
+
+from __future__ import annotations
+
+import contextlib
+import http.client
+import http.server
+import io
+import os
+from pathlib import Path
+import re
+import struct
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+import zlib
+from typing import Callable, List, Optional, Tuple
+
+import vrcSendDiscord as vsd
+
+
+class FakeWebhook:
+    """
+    Local stand-in for a Discord webhook on 127.0.0.1.
+
+    respond(n, content) is called for the n-th request (1-based) with the
+    post's message text and returns (status, headers, body), or None to
+    close the connection without answering (after reading the whole body).
+    Every request is recorded as (time.monotonic(), content, status or 0).
+    Connections are kept alive and closed by the server after idle_timeout
+    seconds without a request.
+    """
+
+    def __init__(
+        self,
+        respond: Callable[[int, str], Optional[Tuple[int, dict, bytes]]],
+        idle_timeout: Optional[float] = None,
+    ):
+        self.respond = respond
+        self.requests: List[Tuple[float, str, int]] = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            timeout = idle_timeout
+
+            def setup(self) -> None:
+                super().setup()
+                with fake._lock:
+                    fake.connections += 1
+
+            def do_POST(self) -> None:
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                m = re.search(rb'"content": "([^"]*)"', body)
+                content = m.group(1).decode("utf-8") if m else ""
+                with fake._lock:
+                    n = len(fake.requests) + 1
+                    answer = fake.respond(n, content)
+                    fake.requests.append((time.monotonic(), content, answer[0] if answer else 0))
+                if answer is None:
+                    self.close_connection = True
+                    return
+                status, headers, data = answer
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/api/webhooks/1/token"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def accepted(self) -> List[str]:
+        return [content for _, content, status in self.requests if 200 <= status < 300]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _write_png(path: Path, level: int, width: int = 64, height: int = 64) -> vsd.ImageFile:
+    """Grayscale PNG whose IDAT is deflated at `level`."""
+
+    def chunk(ctype: bytes, body: bytes) -> bytes:
+        return struct.pack(">I", len(body)) + ctype + body + struct.pack(">I", zlib.crc32(ctype + body))
+
+    raw = b"".join(b"\x00" + bytes((x * y) & 0xFF for x in range(width)) for y in range(height))
+    path.write_bytes(
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 0, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(raw, level))
+        + chunk(b"IEND", b"")
+    )
+    return vsd.ImageFile.from_path(path)
+
+
+def _jobs(n: int) -> List[vsd.PostJob]:
+    return [vsd.PostJob(i, f"post-{i}", []) for i in range(1, n + 1)]
+
+
+class ScanImageFilesTest(unittest.TestCase):
+    def test_symlinked_directory_cycle_is_not_followed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            (root / "2024-01").mkdir()
+            _write_png(root / "2024-01" / "a.png", level=9)
+            _write_png(root / "b.png", level=9)
+            try:
+                (root / "2024-01" / "loop").symlink_to(root, target_is_directory=True)
+            except (OSError, NotImplementedError):
+                self.skipTest("symlinks not available")
+            names = sorted(r.name for r in vsd.scan_image_files(root, recursive=True))
+        self.assertEqual(names, ["a.png", "b.png"])
+
+
+class HTTPConnectionPoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = vsd.HTTPConnectionPool()
+        self.addCleanup(self.pool.close)
+
+    def _post(self, hook: FakeWebhook, content: str) -> None:
+        vsd.discord_webhook_post(hook.url, content, [], pool=self.pool, timeout_sec=5)
+
+    def test_idle_connection_closed_by_server_is_not_reused(self) -> None:
+        hook = FakeWebhook(lambda n, content: (204, {}, b""), idle_timeout=0.2)
+        self.addCleanup(hook.close)
+        self._post(hook, "first")
+        self._post(hook, "second")
+        self.assertTrue(self.pool.last_timing.reused)
+        time.sleep(0.5)  # the server drops the kept-alive connection meanwhile
+        self._post(hook, "third")
+        self.assertFalse(self.pool.last_timing.reused)
+        self.assertEqual(hook.accepted(), ["first", "second", "third"])
+        self.assertEqual(hook.connections, 2)
+
+    def test_lost_response_after_full_body_is_not_replayed(self) -> None:
+        # The second post reaches the server on the reused connection, which
+        # is then closed without a response: it may have been accepted.
+        hook = FakeWebhook(lambda n, content: None if n == 2 else (204, {}, b""))
+        self.addCleanup(hook.close)
+        self._post(hook, "first")
+        with self.assertRaises(http.client.RemoteDisconnected):
+            self._post(hook, "second")
+        self.assertEqual([content for _, content, _ in hook.requests], ["first", "second"])
+
+
+class UploadSchedulerServerTest(unittest.TestCase):
+    """UploadScheduler with the real discord_webhook_post against FakeWebhook."""
+
+    def tearDown(self) -> None:
+        vsd.HTTP_POOL.close()
+
+    def test_429_waits_retry_after_and_sends_once(self) -> None:
+        def respond(n: int, content: str) -> Tuple[int, dict, bytes]:
+            if n == 1:
+                return 429, {"Retry-After": "0.3", "Content-Type": "application/json"}, (
+                    b'{"message": "You are being rate limited.", "retry_after": 0.3, "global": false}'
+                )
+            return 204, {}, b""
+
+        hook = FakeWebhook(respond)
+        self.addCleanup(hook.close)
+        jobs = _jobs(3)
+        vsd.UploadScheduler([hook.url], concurrency=1, backoff_base=0.01).run(jobs)
+
+        self.assertEqual(sorted(hook.accepted()), ["post-1", "post-2", "post-3"])
+        (t_429, first, _), (t_retry, retried, _) = hook.requests[:2]
+        self.assertEqual(first, retried)
+        self.assertGreaterEqual(t_retry - t_429, 0.29)
+        self.assertEqual([j.rate_limited for j in jobs], [1, 0, 0])
+
+    def test_ratelimit_headers_pace_concurrent_posts(self) -> None:
+        limit, window = 2, 0.4
+        state = {"start": None, "used": 0}
+
+        def respond(n: int, content: str) -> Tuple[int, dict, bytes]:
+            now = time.monotonic()
+            if state["start"] is None or now - state["start"] >= window:
+                state["start"], state["used"] = now, 0
+            reset_after = window - (now - state["start"])
+            if state["used"] >= limit:
+                return 429, {"Retry-After": f"{reset_after:.3f}"}, b""
+            state["used"] += 1
+            return 204, {
+                "X-RateLimit-Limit": str(limit),
+                "X-RateLimit-Remaining": str(limit - state["used"]),
+                "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            }, b""
+
+        hook = FakeWebhook(respond)
+        self.addCleanup(hook.close)
+        t0 = time.monotonic()
+        vsd.UploadScheduler([hook.url], concurrency=4, backoff_base=0.01).run(_jobs(6))
+        elapsed = time.monotonic() - t0
+
+        accepted = hook.accepted()
+        self.assertEqual(sorted(accepted), sorted(f"post-{i}" for i in range(1, 7)))
+        self.assertEqual(len(accepted), len(set(accepted)))
+        # 6 posts at 2 per window need at least two full windows. How many
+        # 429s the first (still unknown) window costs depends on thread timing,
+        # so only delivery and pacing are asserted.
+        self.assertGreaterEqual(elapsed, 2 * window - 0.05)
+
+    def test_sleep_sec_default_keeps_one_second_spacing(self) -> None:
+        args = vsd.parse_args(["--webhook-url", "http://127.0.0.1/x"])
+        self.assertEqual(args.sleep_sec, 1.0)
+
+
+class DedupWatchTest(unittest.TestCase):
+    """PerceptualDeduper with fixed hashes (no Pillow needed)."""
+
+    HASHES = {"a.png": 0x0, "b.png": 0x1, "c.png": 0xFFFF_0000_FFFF_0000}
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        with mock.patch.object(vsd, "Image", object()):
+            self.deduper = vsd.PerceptualDeduper(self.root / "dedup.sqlite3", max_distance=4)
+        self.addCleanup(self.deduper.close)
+        self.deduper.hashes = lambda files: {r: self.HASHES[r.name] for r in files}
+
+    def _file(self, name: str) -> vsd.ImageFile:
+        return _write_png(self.root / name, level=9)
+
+    def test_index_carries_across_batches(self) -> None:
+        a, b, c = (self._file(n) for n in ("a.png", "b.png", "c.png"))
+        seen = vsd.HammingIndex(self.deduper.max_distance)
+        self.assertEqual(self.deduper.dedup([a], index=seen), [a])
+        self.assertEqual(self.deduper.dedup([b, c], index=seen), [c])
+        # A retried file (e.g. its post failed) is not a duplicate of itself.
+        self.assertEqual(self.deduper.dedup([a], index=seen), [a])
+
+    def test_watch_dedups_each_batch(self) -> None:
+        shots = self.root / "shots"
+        shots.mkdir()
+        sender = vsd.vrcSendDiscord(shots, "http://127.0.0.1/x", deduper=self.deduper)
+        batches: List[List[str]] = []
+
+        def send_batched(images: List[vsd.ImageFile], *args, **kwargs) -> None:
+            batches.append(sorted(r.name for r in images))
+            raise KeyboardInterrupt
+
+        def shoot() -> None:
+            time.sleep(0.3)
+            for name in ("a.png", "b.png", "c.png"):
+                _write_png(shots / name, level=9)
+
+        threading.Thread(target=shoot, daemon=True).start()
+        with mock.patch.object(sender, "send_batched", send_batched), \
+                contextlib.redirect_stdout(io.StringIO()):
+            sender.watch(
+                max_bytes=25 * 1024 * 1024,
+                max_files_per_post=10,
+                settle_sec=0.2,
+                batch_window_sec=0.3,
+                poll_interval=0.1,
+                force_polling=True,
+            )
+        self.assertEqual(batches, [["a.png", "c.png"]])
+
+
+class WatchRetryTest(unittest.TestCase):
+    def test_permanent_failures_are_dropped_and_retries_capped(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            shots = Path(tmp)
+            sender = vsd.vrcSendDiscord(shots, "http://127.0.0.1/x")
+            batches: List[List[str]] = []
+
+            def send_batched(images: List[vsd.ImageFile], *args, **kwargs) -> None:
+                names = sorted(r.name for r in images)
+                batches.append(names)
+                if "c.png" in names:
+                    raise KeyboardInterrupt
+                jobs = [vsd.PostJob(i, "", [r]) for i, r in enumerate(sorted(images), 1)]
+                errors = {
+                    "a.png": vsd.DiscordHTTPError(413, "Payload Too Large", {}),
+                    "b.png": vsd.DiscordHTTPError(429, "Too Many Requests", {}),
+                }
+                raise vsd.UploadFailed([(job, errors[job.files[0].name]) for job in jobs])
+
+            def shoot() -> None:
+                time.sleep(0.2)
+                for name in ("a.png", "b.png"):
+                    _write_png(shots / name, level=9)
+                time.sleep(1.5)
+                _write_png(shots / "c.png", level=9)
+
+            threading.Thread(target=shoot, daemon=True).start()
+            with mock.patch.object(sender, "send_batched", send_batched), \
+                    contextlib.redirect_stdout(io.StringIO()), \
+                    contextlib.redirect_stderr(io.StringIO()) as err:
+                sender.watch(
+                    max_bytes=25 * 1024 * 1024,
+                    max_files_per_post=10,
+                    settle_sec=0.2,
+                    batch_window_sec=0.1,
+                    poll_interval=0.1,
+                    force_polling=True,
+                    retry_delay_sec=0.2,
+                    max_attempts=2,
+                )
+        # a.png (413) is not retried; b.png (429) is sent twice, then dropped.
+        self.assertEqual(batches, [["a.png", "b.png"], ["b.png"], ["c.png"]])
+        self.assertIn("a.png (rejected permanently)", err.getvalue())
+        self.assertIn("b.png after 2 attempts", err.getvalue())
+
+
+class UploadMetricsConcurrencyTest(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.prom = Path(tmp.name) / "vrcsend.prom"
+        self.metrics = vsd.UploadMetrics(prom_path=self.prom)
+        self.addCleanup(self.metrics.close)
+
+    def test_concurrent_flushes(self) -> None:
+        errors: List[BaseException] = []
+
+        def flush_many() -> None:
+            for _ in range(200):
+                try:
+                    self.metrics.inc("vrcsend_posts_total", result="ok")
+                    self.metrics.flush()
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=flush_many) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertIn('vrcsend_posts_total{result="ok"} 800', self.prom.read_text(encoding="utf-8"))
+
+    def test_delivered_posts_are_not_failed_by_metrics(self) -> None:
+        headers = {"X-RateLimit-Limit": "1000", "X-RateLimit-Remaining": "999", "X-RateLimit-Reset-After": "1"}
+        scheduler = vsd.UploadScheduler(
+            ["http://127.0.0.1/x"], concurrency=8, post_func=lambda *a, **k: headers, metrics=self.metrics
+        )
+        failed: List[vsd.PostJob] = []
+        done: List[vsd.PostJob] = []
+        scheduler.run(_jobs(400), on_success=done.append, on_failure=lambda job, err: failed.append(job))
+        self.assertEqual((len(done), failed), (400, []))
+        self.assertIn('vrcsend_posts_total{result="ok"} 400', self.prom.read_text(encoding="utf-8"))
+
+        # Even a broken metrics sink must not turn a delivered post into a failure.
+        with mock.patch.object(self.metrics, "flush", side_effect=OSError("disk full")), \
+                contextlib.redirect_stderr(io.StringIO()) as err:
+            done.clear()
+            scheduler.run(_jobs(20), on_success=done.append, on_failure=lambda job, err: failed.append(job))
+        self.assertEqual((len(done), failed), (20, []))
+        self.assertIn("metrics update failed", err.getvalue())
+
+
+class UploadJournalTest(unittest.TestCase):
+    def test_rate_limit_and_timeout_failures_are_resumed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp:
+            journal = vsd.UploadJournal(Path(tmp) / "upload.journal")
+            jobs = _jobs(4)
+            plan_id = journal.start_plan(jobs)
+            journal.mark_done(plan_id, jobs[0])
+            journal.mark_failed(plan_id, jobs[1], vsd.DiscordHTTPError(429, "Too Many Requests", {}))
+            journal.mark_failed(plan_id, jobs[2], vsd.DiscordHTTPError(408, "Request Timeout", {}))
+            journal.mark_failed(plan_id, jobs[3], vsd.DiscordHTTPError(413, "Payload Too Large", {}))
+            ((_, pending, total, _),) = journal.pending_plans()
+        self.assertEqual(total, 4)
+        # 413 is permanent; 429 and 408 are sent again on resume.
+        self.assertEqual([j.index for j in pending], [2, 3])
+
+
+class TranscoderCacheTest(unittest.TestCase):
+    """Lossless PNG transcoding (works without Pillow)."""
+
+    def setUp(self) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.root = Path(tmp.name)
+        self.transcoder = vsd.Transcoder("png", cache_dir=self.root / "cache", workers=1)
+
+    def _run(self, files: List[vsd.ImageFile]) -> Tuple[dict, str, int]:
+        """(result, stdout, number of source hashes)"""
+        out = io.StringIO()
+        with mock.patch.object(vsd, "_sha256_file", wraps=vsd._sha256_file) as sha, \
+                contextlib.redirect_stdout(out):
+            result = self.transcoder.run(files)
+        return result, out.getvalue(), sha.call_count
+
+    def test_unchanged_sources_are_not_hashed_or_reencoded(self) -> None:
+        kept = _write_png(self.root / "kept.png", level=9)
+        shrunk = _write_png(self.root / "shrunk.png", level=0)
+
+        result, out, hashed = self._run([kept, shrunk])
+        self.assertIn("Transcoding 2 image(s)", out)
+        self.assertEqual(hashed, 2)
+        self.assertEqual(result[kept], kept)
+        (small,) = [f for f, src in result.items() if src == shrunk]
+        self.assertLess(small.size, shrunk.size)
+
+        # Second run: both decisions come from the index.
+        result, out, hashed = self._run([kept, shrunk])
+        self.assertNotIn("Transcoding", out)
+        self.assertEqual(hashed, 0)
+        self.assertEqual(set(result.values()), {kept, shrunk})
+        self.assertEqual(result[kept], kept)
+
+        # A new mtime means a rehash, but the same content reuses the output.
+        os.utime(shrunk.path, ns=(shrunk.mtime_ns + 10**9, shrunk.mtime_ns + 10**9))
+        touched = vsd.ImageFile.from_path(shrunk.path)
+        result, out, hashed = self._run([kept, touched])
+        self.assertNotIn("Transcoding", out)
+        self.assertEqual(hashed, 1)
+        self.assertIn(small, result)
+
+    def test_estimate_writes_nothing(self) -> None:
+        kept = _write_png(self.root / "kept.png", level=9)
+        shrunk = _write_png(self.root / "shrunk.png", level=0)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            estimate = self.transcoder.estimate([kept, shrunk])
+        self.assertEqual(estimate, {kept: kept, shrunk: shrunk})
+        self.assertIn("2 image(s) not transcoded yet", out.getvalue())
+        self.assertFalse((self.root / "cache").exists())
+
+        result, _, _ = self._run([kept, shrunk])
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            estimate = self.transcoder.estimate([kept, shrunk])
+        self.assertEqual(estimate, result)
+        self.assertIn("0 image(s) not transcoded yet", out.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -8,32 +8,83 @@ Features:
 - Try to auto-detect VRChat screenshot directories on Windows/macOS/Linux.
 - Or specify --screenshots-dir (recommended for reliability).
 - Collect images and send them in chunks before hitting Discord payload size limit.
-- Standard library only: urllib + multipart/form-data.
+- Standard library only: http.client + multipart/form-data (attachments streamed from disk),
+  with keep-alive connections reused across posts.
+- Optional SQLite upload ledger (--ledger) so reruns only send new screenshots.
+- Concurrent posting (--concurrency) that follows Discord rate limit headers.
+- Watch mode (--watch) that uploads new screenshots within seconds of landing.
+- Optional recompression (--transcode) to fit more screenshots per post.
+- Optional near-duplicate filter (--dedup) based on perceptual hashes.
+- Resumable batches (--journal): a rerun continues from the first unfinished post.
+- Upload metrics as JSON lines (--metrics-jsonl) and Prometheus text
+  (--metrics-prom file, --metrics-port endpoint).
 
 Usage examples:
   python vrcSendDiscord.py --webhook-url "https://discord.com/api/webhooks/...."
   python vrcSendDiscord.py --webhook-url "..." --screenshots-dir "/path/to/VRChat"
   python vrcSendDiscord.py --webhook-url "..." --since-days 7
+  python vrcSendDiscord.py --webhook-url "..." --ledger ~/.vrcSendDiscord/ledger.sqlite3
+  python vrcSendDiscord.py --webhook-url "URL1" --webhook-url "URL2" --concurrency 4 --sleep-sec 0
+  python vrcSendDiscord.py --webhook-url "..." --recursive --journal backfill.journal
+  python vrcSendDiscord.py --webhook-url "..." --recursive --watch --ledger ledger.sqlite3
+  python vrcSendDiscord.py --webhook-url "..." --transcode webp --quality 90 --max-dim 2560
+  python vrcSendDiscord.py --webhook-url "..." --metrics-jsonl run.jsonl --metrics-port 9464
 """
 
 from __future__ import annotations
 
 import argparse
+import bisect
+import concurrent.futures
+import contextlib
 import datetime as _dt
+import hashlib
+import http.client
+import http.server
 import json
 import mimetypes
 import os
 from pathlib import Path
+import queue
+import random
+import select
+import sqlite3
+import stat
+import struct
 import sys
+import threading
 import time
+import urllib.parse
 import urllib.request
-import urllib.error
 import uuid
-from typing import Iterable, List, Optional, Tuple
+import zlib
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    TypeVar,
+    Union,
+)
+
+
+try:
+    # Optional: only needed for --transcode webp/jpeg, --max-dim and --dedup.
+    from PIL import Image
+except ImportError:
+    Image = None
 
 
 IMAGE_EXTS = {".png", ".jpg", ".jpeg", ".gif", ".webp"}
 
+T = TypeVar("T")
+
 
 def _now() -> _dt.datetime:
     return _dt.datetime.now()
@@ -101,51 +152,214 @@ def find_existing_dir(candidates: Iterable[Path]) -> Optional[Path]:
     return None
 
 
+class ImageFile(NamedTuple):
+    """
+    A scanned image: path plus size/mtime taken from a single stat.
+
+    Records flow through the whole send pipeline (filter, ledger, chunking,
+    multipart body) so no stage has to stat the file again. Usable wherever
+    a path is accepted (os.PathLike).
+    """
+
+    path: Path
+    size: int
+    mtime_ns: int
+
+    @classmethod
+    def from_path(cls, p: Union[Path, str, "ImageFile"]) -> "ImageFile":
+        if isinstance(p, ImageFile):
+            return p
+        st = os.stat(p)
+        return cls(Path(p), st.st_size, st.st_mtime_ns)
+
+    @property
+    def mtime(self) -> float:
+        return self.mtime_ns / 1e9
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def stem(self) -> str:
+        return self.path.stem
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+
+def scan_image_files(root: Path, recursive: bool = True) -> Iterator[ImageFile]:
+    """
+    os.scandir based scanner. Entries are pruned by extension before any stat,
+    directories are recognized from d_type (no stat on Linux/macOS), and each
+    image is stat'ed exactly once (free on Windows, where scandir returns it).
+    """
+    stack = [str(root)]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        with it:
+            for e in it:
+                try:
+                    # Like rglob, do not descend into symlinked directories (cycles).
+                    if e.is_dir(follow_symlinks=False):
+                        if recursive:
+                            stack.append(e.path)
+                        continue
+                    if os.path.splitext(e.name)[1].lower() not in IMAGE_EXTS:
+                        continue
+                    st = e.stat()
+                except OSError:
+                    continue
+                if stat.S_ISREG(st.st_mode):
+                    yield ImageFile(Path(e.path), st.st_size, st.st_mtime_ns)
+
+
 def iter_image_files(root: Path, recursive: bool = True) -> Iterable[Path]:
-    if recursive:
-        for p in root.rglob("*"):
-            if p.is_file() and p.suffix.lower() in IMAGE_EXTS:
-                yield p
-    else:
-        for p in root.iterdir():
-            if p.is_file() and p.suffix.lower() in IMAGE_EXTS:
-                yield p
+    for rec in scan_image_files(root, recursive=recursive):
+        yield rec.path
 
 
-def filter_since(files: Iterable[Path], since: Optional[_dt.datetime]) -> List[Path]:
-    if since is None:
-        return sorted(files, key=lambda p: p.stat().st_mtime)
-    out: List[Path] = []
-    since_ts = since.timestamp()
-    for p in files:
+def _as_records(files: Iterable[Union[Path, ImageFile]]) -> Iterator[ImageFile]:
+    """Accept plain paths too (stat'ed here); records pass through untouched."""
+    for f in files:
         try:
-            if p.stat().st_mtime >= since_ts:
-                out.append(p)
+            yield ImageFile.from_path(f)
         except OSError:
             continue
-    return sorted(out, key=lambda p: p.stat().st_mtime)
 
 
-def chunk_files_by_size(
-    files: List[Path],
+def filter_since(
+    files: Iterable[Union[Path, ImageFile]], since: Optional[_dt.datetime]
+) -> List[ImageFile]:
+    records = _as_records(files)
+    if since is not None:
+        since_ns = int(since.timestamp() * 1e9)
+        records = (r for r in records if r.mtime_ns >= since_ns)
+    return sorted(records, key=lambda r: r.mtime_ns)
+
+
+def _sha256_file(p: Path, bufsize: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(p, "rb") as f:
+        while True:
+            buf = f.read(bufsize)
+            if not buf:
+                break
+            h.update(buf)
+    return h.hexdigest()
+
+
+class UploadLedger:
+    """
+    Local SQLite record of files that were already posted.
+
+    A file counts as sent when its (path, size, mtime) was recorded, or, with
+    use_hash=True, when a file with the same SHA-256 was recorded (survives
+    renames/moves; only files not matched by path+size+mtime get hashed).
+    Rows are committed right after each successful post, so an interrupted
+    run resumes from the first file that was not acknowledged by Discord.
+    """
+
+    def __init__(self, db_path: Path, use_hash: bool = False):
+        self.db_path = db_path
+        self.use_hash = use_hash
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Posts complete on scheduler worker threads; access is serialized by _lock.
+        self._conn = sqlite3.connect(str(db_path), check_same_thread=False)
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sent ("
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT,"
+            " sent_at REAL NOT NULL,"
+            " PRIMARY KEY (path, size, mtime_ns))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sent_sha256 ON sent (sha256)")
+        self._conn.commit()
+
+        # Load keys once: a set lookup per file is much cheaper than a query
+        # per file when the screenshots tree holds tens of thousands of images.
+        self._stat_keys: Set[Tuple[str, int, int]] = set()
+        self._hashes: Set[str] = set()
+        for path, size, mtime_ns, sha in self._conn.execute(
+            "SELECT path, size, mtime_ns, sha256 FROM sent"
+        ):
+            self._stat_keys.add((path, size, mtime_ns))
+            if sha:
+                self._hashes.add(sha)
+
+    @staticmethod
+    def _stat_key(p: Union[Path, ImageFile]) -> Tuple[str, int, int]:
+        rec = ImageFile.from_path(p)
+        return (os.path.abspath(rec.path), rec.size, rec.mtime_ns)
+
+    def is_sent(self, p: Union[Path, ImageFile]) -> bool:
+        try:
+            key = self._stat_key(p)
+        except OSError:
+            return False
+        if key in self._stat_keys:
+            return True
+        if self.use_hash and self._hashes:
+            try:
+                return _sha256_file(p) in self._hashes
+            except OSError:
+                return False
+        return False
+
+    def filter_unsent(self, files: Iterable[ImageFile]) -> List[ImageFile]:
+        return [p for p in files if not self.is_sent(p)]
+
+    def mark_sent(self, files: Iterable[Union[Path, ImageFile]]) -> None:
+        now = time.time()
+        rows = []
+        for p in files:
+            try:
+                key = self._stat_key(p)
+            except OSError:
+                continue
+            sha = None
+            if self.use_hash:
+                try:
+                    sha = _sha256_file(p)
+                except OSError:
+                    pass
+            rows.append((key[0], key[1], key[2], sha, now))
+            self._stat_keys.add(key)
+            if sha:
+                self._hashes.add(sha)
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO sent VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+PACKING_MODES = ("greedy", "binpack")
+
+
+def pack_greedy(
+    items: List[Tuple[T, int, float]],
     max_bytes: int,
     max_files_per_post: int,
     overhead_bytes: int = 200_000,
-) -> List[List[Path]]:
+) -> List[List[T]]:
     """
-    Group files into chunks where total size + overhead stays below max_bytes.
-    overhead_bytes: rough safety margin for multipart headers + json payload.
+    items: (item, size, mtime) in send order. Fills the current chunk until the
+    next item does not fit, then starts a new one (keeps exact input order).
     """
-    chunks: List[List[Path]] = []
-    current: List[Path] = []
+    chunks: List[List[T]] = []
+    current: List[T] = []
     current_size = overhead_bytes
 
-    for f in files:
-        try:
-            sz = f.stat().st_size
-        except OSError:
-            continue
-
+    for f, sz, _mtime in items:
         # If single file is too large, send alone and let it fail or user adjust max_bytes
         # (alternatively: skip; but user asked to split before limit, not compress/resize).
         if not current:
@@ -173,6 +387,611 @@ def chunk_files_by_size(
     return chunks
 
 
+def _pack_decreasing_fill(
+    entries: List[Tuple[T, int, float]],
+    capacity: int,
+    max_files_per_post: int,
+) -> List[Tuple[int, List[Tuple[T, int, float]]]]:
+    """
+    Decreasing-size packing for both limits (bytes and file count).
+    Each post starts with the largest remaining file, then repeatedly takes the
+    largest file that still leaves room for the smallest files to fill the
+    remaining slots. Returns [(free_bytes, entries)].
+    """
+    pool = sorted(entries, key=lambda e: e[1])
+    sizes = [e[1] for e in pool]
+    bins: List[Tuple[int, List[Tuple[T, int, float]]]] = []
+    while pool:
+        first = pool.pop()
+        sizes.pop()
+        free = capacity - first[1]
+        current = [first]
+        while pool and len(current) < max_files_per_post:
+            slots = max_files_per_post - len(current)
+            reserve = sum(sizes[: slots - 1]) if slots > 1 else 0
+            i = bisect.bisect_right(sizes, free - reserve) - 1
+            if i < 0:
+                i = bisect.bisect_right(sizes, free) - 1
+                if i < 0:
+                    break
+            entry = pool.pop(i)
+            sizes.pop(i)
+            free -= entry[1]
+            current.append(entry)
+        bins.append((free, current))
+    return bins
+
+
+def pack_binpack(
+    items: List[Tuple[T, int, float]],
+    max_bytes: int,
+    max_files_per_post: int,
+    overhead_bytes: int = 200_000,
+    window: int = 100,
+) -> List[List[T]]:
+    """
+    items: (item, size, mtime) sorted by mtime.
+
+    Packs consecutive windows of `window` files with _pack_decreasing_fill.
+    Underfilled posts are carried into the next window (once) instead of being
+    sent half-empty. A file can therefore only move about one window away from
+    its mtime position, and posts are sent in order of their oldest file, so the
+    result stays roughly chronological while using fewer, fuller posts than
+    pack_greedy.
+    """
+    capacity = max_bytes - overhead_bytes
+    window = max(1, window)
+    posts: List[List[Tuple[T, int, float]]] = []
+    carry: List[Tuple[T, int, float]] = []
+    for start in range(0, len(items), window):
+        is_last = start + window >= len(items)
+        packable: List[Tuple[T, int, float]] = list(carry)
+        carried = {id(e) for e in carry}
+        carry = []
+        for entry in items[start : start + window]:
+            if entry[1] > capacity or max_files_per_post <= 0:
+                # single oversized file: post alone (see pack_greedy)
+                posts.append([entry])
+            else:
+                packable.append(entry)
+        if not packable:
+            continue
+        smallest = min(e[1] for e in packable)
+        for free, entries in _pack_decreasing_fill(packable, capacity, max_files_per_post):
+            underfilled = len(entries) < max_files_per_post and free >= smallest
+            if underfilled and not is_last and not any(id(e) in carried for e in entries):
+                carry.extend(entries)
+            else:
+                posts.append(entries)
+
+    for entries in posts:
+        entries.sort(key=lambda e: e[2])
+    posts.sort(key=lambda entries: entries[0][2])
+    return [[e[0] for e in entries] for entries in posts]
+
+
+def _dhash_one(path: str, hash_size: int = 8) -> Optional[int]:
+    """
+    Process-pool worker: 64-bit difference hash (dHash) of an image.
+    Compares neighbouring pixels of a (hash_size+1)x hash_size grayscale
+    thumbnail, so it survives re-encoding and small changes.
+    """
+    try:
+        with Image.open(path) as im:
+            # JPEG: let the decoder downscale by 1/8 instead of decoding full size.
+            im.draft("L", (hash_size * 16, hash_size * 16))
+            small = im.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR)
+            px = list(small.getdata())
+    except Exception as e:
+        print(f"Warning: cannot hash {os.path.basename(path)}: {e}", file=sys.stderr)
+        return None
+    value = 0
+    w = hash_size + 1
+    for y in range(hash_size):
+        row = px[y * w : (y + 1) * w]
+        for x in range(hash_size):
+            value = (value << 1) | (1 if row[x] > row[x + 1] else 0)
+    return value
+
+
+_popcount: Callable[[int], int] = getattr(int, "bit_count", None) or (lambda x: bin(x).count("1"))
+
+
+class HammingIndex:
+    """
+    Near-neighbour index for 64-bit hashes (multi-index hashing).
+
+    The hash is split into max_distance+1 bit ranges; by pigeonhole, two
+    hashes within max_distance bits agree exactly on at least one range, so
+    a lookup only compares against the few entries sharing a range value.
+    Unlike a BK-tree this stays fast on well-spread hashes at 100k entries.
+    """
+
+    def __init__(self, max_distance: int, bits: int = 64) -> None:
+        self.max_distance = max_distance
+        parts = max_distance + 1
+        edges = [bits * i // parts for i in range(parts + 1)]
+        self._ranges = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(edges, edges[1:])]
+        self._tables: List[Dict[int, List[Tuple[int, object]]]] = [{} for _ in self._ranges]
+
+    def add(self, h: int, item: object) -> None:
+        for table, (shift, mask) in zip(self._tables, self._ranges):
+            table.setdefault((h >> shift) & mask, []).append((h, item))
+
+    def find(self, h: int) -> Optional[object]:
+        """Any item within max_distance bits of h, or None."""
+        for table, (shift, mask) in zip(self._tables, self._ranges):
+            for other, item in table.get((h >> shift) & mask, ()):
+                if _popcount(h ^ other) <= self.max_distance:
+                    return item
+        return None
+
+
+class PerceptualDeduper:
+    """
+    Optional stage in collect_images that drops near-identical screenshots
+    (burst shots, photo camera repeats): an image whose dHash is within
+    max_distance bits of an earlier selected image is skipped.
+
+    Hashes are computed in a process pool and cached in SQLite keyed by
+    path+mtime; lookups go through a HammingIndex so they stay fast at 100k images.
+    Requires Pillow.
+    """
+
+    def __init__(self, index_path: Path, max_distance: int = 4, workers: Optional[int] = None):
+        if Image is None:
+            raise RuntimeError("--dedup requires Pillow (pip install pillow).")
+        self.max_distance = max_distance
+        self.workers = workers
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(index_path))
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dhash ("
+            " path TEXT NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " hash TEXT NOT NULL,"
+            " PRIMARY KEY (path, mtime_ns))"
+        )
+        self._conn.commit()
+
+    def hashes(self, files: List[ImageFile]) -> Dict[ImageFile, int]:
+        cached: Dict[Tuple[str, int], int] = {
+            (p, m): int(h, 16)
+            for p, m, h in self._conn.execute("SELECT path, mtime_ns, hash FROM dhash")
+        }
+        out: Dict[ImageFile, int] = {}
+        todo: List[ImageFile] = []
+        for r in files:
+            h = cached.get((os.path.abspath(r.path), r.mtime_ns))
+            if h is None:
+                todo.append(r)
+            else:
+                out[r] = h
+
+        if todo:
+            print(f"Hashing {len(todo)} image(s) for dedup ({len(out)} cached)...")
+            rows = []
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as pool:
+                paths = [str(r.path) for r in todo]
+                for r, h in zip(todo, pool.map(_dhash_one, paths, chunksize=16)):
+                    if h is None:
+                        continue
+                    out[r] = h
+                    rows.append((os.path.abspath(r.path), r.mtime_ns, f"{h:016x}"))
+            self._conn.executemany("INSERT OR REPLACE INTO dhash VALUES (?, ?, ?)", rows)
+            self._conn.commit()
+        return out
+
+    def dedup(self, files: List[ImageFile], index: Optional[HammingIndex] = None) -> List[ImageFile]:
+        """
+        Keep the first image of each near-duplicate group (input order).
+        Pass the same index to compare against images selected by earlier
+        calls (watch mode batches); a file is never a duplicate of itself.
+        """
+        hashes = self.hashes(files)
+        if index is None:
+            index = HammingIndex(self.max_distance)
+        kept: List[ImageFile] = []
+        dropped = 0
+        for r in files:
+            h = hashes.get(r)
+            if h is None:
+                kept.append(r)
+                continue
+            match = index.find(h)
+            if match is not None and match.path != r.path:
+                dropped += 1
+                continue
+            if match is None:
+                index.add(h, r)
+            kept.append(r)
+        if dropped:
+            print(f"Dedup: dropped {dropped} near-duplicate image(s) (distance <= {self.max_distance}).")
+        return kept
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def chunk_files_by_size(
+    files: List[Union[Path, ImageFile]],
+    max_bytes: int,
+    max_files_per_post: int,
+    overhead_bytes: int = 200_000,
+    packing: str = "greedy",
+    window: int = 100,
+) -> List[List[ImageFile]]:
+    """
+    Group files into chunks where total size + overhead stays below max_bytes.
+    overhead_bytes: rough safety margin for multipart headers + json payload.
+    packing: "greedy" (input order) or "binpack" (decreasing-size packing over
+    windows of `window` files, see pack_binpack).
+    """
+    items = [(r, r.size, r.mtime) for r in _as_records(files)]
+
+    if packing == "binpack":
+        return pack_binpack(items, max_bytes, max_files_per_post, overhead_bytes, window=window)
+    if packing != "greedy":
+        raise ValueError(f"Unknown packing mode: {packing}")
+    return pack_greedy(items, max_bytes, max_files_per_post, overhead_bytes)
+
+
+def _png_recompress(src: Path, dst: Path) -> None:
+    """
+    Lossless PNG optimize without third-party libraries: merge all IDAT chunks
+    and deflate them again at level 9. Every other chunk is kept as-is.
+    """
+    data = src.read_bytes()
+    sig = b"\x89PNG\r\n\x1a\n"
+    if not data.startswith(sig):
+        raise ValueError(f"Not a PNG file: {src}")
+    chunks: List[Tuple[bytes, bytes]] = []
+    idat = bytearray()
+    idat_index = -1
+    pos = len(sig)
+    while pos + 8 <= len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        ctype = data[pos + 4 : pos + 8]
+        body = data[pos + 8 : pos + 8 + length]
+        pos += 12 + length
+        if ctype == b"IDAT":
+            if idat_index < 0:
+                idat_index = len(chunks)
+                chunks.append((ctype, b""))
+            idat += body
+        else:
+            chunks.append((ctype, body))
+        if ctype == b"IEND":
+            break
+    if idat_index < 0:
+        raise ValueError(f"PNG without image data: {src}")
+    chunks[idat_index] = (b"IDAT", zlib.compress(zlib.decompress(bytes(idat)), 9))
+
+    out = bytearray(sig)
+    for ctype, body in chunks:
+        out += struct.pack(">I", len(body)) + ctype + body
+        out += struct.pack(">I", zlib.crc32(ctype + body) & 0xFFFFFFFF)
+    dst.write_bytes(bytes(out))
+
+
+def _transcode_one(src: str, dst: str, fmt: str, quality: int, max_dim: Optional[int]) -> str:
+    """
+    Process-pool worker. Writes the transcoded image to dst and returns dst,
+    or returns src when the result would not be smaller (or cannot be made).
+    """
+    src_p, dst_p = Path(src), Path(dst)
+    tmp = dst_p.with_name(dst_p.name + f".{os.getpid()}.tmp")
+    resized = False
+    try:
+        if Image is None:
+            # Only reachable for lossless PNG (checked by Transcoder).
+            if src_p.suffix.lower() != ".png":
+                return src
+            _png_recompress(src_p, tmp)
+        else:
+            with Image.open(src_p) as im:
+                im.load()
+                if max_dim and max(im.size) > max_dim:
+                    im.thumbnail((max_dim, max_dim), Image.LANCZOS)
+                    resized = True
+                if fmt == "png":
+                    im.save(tmp, format="PNG", optimize=True)
+                elif fmt == "webp":
+                    im.save(tmp, format="WEBP", quality=quality, method=4)
+                elif fmt == "webp-lossless":
+                    im.save(tmp, format="WEBP", lossless=True, quality=quality, method=4)
+                elif fmt == "jpeg":
+                    if im.mode not in ("RGB", "L"):
+                        im = im.convert("RGB")
+                    im.save(tmp, format="JPEG", quality=quality, optimize=True, progressive=True)
+                else:
+                    raise ValueError(f"Unknown transcode format: {fmt}")
+        # Keep the original when recompression does not pay off (unless resized).
+        if not resized and tmp.stat().st_size >= src_p.stat().st_size:
+            tmp.unlink()
+            return src
+        os.replace(tmp, dst_p)
+        return dst
+    except Exception as e:
+        print(f"Warning: transcode failed for {src_p.name}: {e}", file=sys.stderr)
+        try:
+            tmp.unlink()
+        except OSError:
+            pass
+        return src
+
+
+class Transcoder:
+    """
+    Optional stage between collect_images and chunk_files_by_size that shrinks
+    images so more of them fit in one post.
+
+    Outputs are written to cache_dir/<sha256(source)+settings>/<stem>.<ext>,
+    so reruns reuse them and the attachment keeps its original name. Source
+    files are only ever read. Work runs in a process pool.
+
+    cache_dir/index.sqlite3 remembers each source's hash and whether it was
+    kept as-is (transcode failed or did not shrink it), keyed by
+    path+size+mtime, so unchanged sources are neither hashed nor re-encoded.
+    """
+
+    INDEX_NAME = "index.sqlite3"
+
+    FORMATS = ("png", "webp", "webp-lossless", "jpeg")
+    _EXT = {"png": ".png", "webp": ".webp", "webp-lossless": ".webp", "jpeg": ".jpg"}
+
+    def __init__(
+        self,
+        fmt: str,
+        cache_dir: Path,
+        quality: int = 85,
+        max_dim: Optional[int] = None,
+        workers: Optional[int] = None,
+    ):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"Unknown transcode format: {fmt}")
+        if Image is None and (fmt != "png" or max_dim):
+            raise RuntimeError(
+                f"--transcode {fmt}{' with --max-dim' if max_dim else ''} requires Pillow "
+                "(pip install pillow). Lossless --transcode png works without it."
+            )
+        self.fmt = fmt
+        self.cache_dir = cache_dir
+        self.quality = quality
+        self.max_dim = max_dim
+        self.workers = workers
+
+    def settings_key(self) -> str:
+        engine = "pil" if Image is not None else "zlib"
+        return f"{self.fmt}-q{self.quality}-d{self.max_dim or 0}-{engine}"
+
+    def _cache_path(self, src: ImageFile, sha: str) -> Path:
+        digest = hashlib.sha256((sha + self.settings_key()).encode("ascii")).hexdigest()
+        return self.cache_dir / digest[:32] / (src.stem + self._EXT[self.fmt])
+
+    def _open_index(self) -> sqlite3.Connection:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(str(self.cache_dir / self.INDEX_NAME))
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS source ("
+            " path TEXT NOT NULL,"
+            " settings TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " keep_original INTEGER NOT NULL,"
+            " PRIMARY KEY (path, settings))"
+        )
+        return conn
+
+    def run(self, files: List[ImageFile]) -> Dict[ImageFile, ImageFile]:
+        """
+        Returns {file_to_send: source_file} in the order of `files`. A source
+        maps to itself when transcoding did not make it smaller.
+        """
+        with contextlib.closing(self._open_index()) as conn, conn:
+            return self._run(files, conn)
+
+    def _known(self, conn: sqlite3.Connection) -> Dict[str, Tuple[int, int, str, int]]:
+        """path -> (size, mtime_ns, sha256, keep_original) for the current settings."""
+        return {
+            p: (size, m, sha, keep)
+            for p, size, m, sha, keep in conn.execute(
+                "SELECT path, size, mtime_ns, sha256, keep_original FROM source WHERE settings = ?",
+                (self.settings_key(),),
+            )
+        }
+
+    def estimate(self, files: List[ImageFile]) -> Dict[ImageFile, ImageFile]:
+        """
+        Dry-run counterpart of run(): nothing is hashed, encoded or written.
+        Unchanged sources map to their cached output (or to themselves when
+        they were kept as-is); the others are counted at their original size.
+        """
+        known: Dict[str, Tuple[int, int, str, int]] = {}
+        index = self.cache_dir / self.INDEX_NAME
+        if index.exists():
+            uri = f"{index.resolve().as_uri()}?mode=ro"
+            with contextlib.closing(sqlite3.connect(uri, uri=True)) as conn:
+                known = self._known(conn)
+        ordered: Dict[ImageFile, ImageFile] = {}
+        unknown = before = after = 0
+        for src in files:
+            row = known.get(os.path.abspath(src.path))
+            out = src
+            if row is not None and row[:2] == (src.size, src.mtime_ns) and not row[3]:
+                try:
+                    out = ImageFile.from_path(self._cache_path(src, row[2]))
+                except OSError:
+                    unknown += 1
+            elif row is None or row[:2] != (src.size, src.mtime_ns):
+                unknown += 1
+            ordered[out] = src
+            before += src.size
+            after += out.size
+        if before:
+            print(
+                f"Transcode (estimate): {_human_bytes(before)} -> {_human_bytes(after)} "
+                f"({after / before:.0%}); {unknown} image(s) not transcoded yet, counted at original size"
+            )
+        return ordered
+
+    def _run(self, files: List[ImageFile], conn: sqlite3.Connection) -> Dict[ImageFile, ImageFile]:
+        settings = self.settings_key()
+        known = self._known(conn)
+        result: Dict[ImageFile, Path] = {}
+        todo: List[Tuple[ImageFile, Path]] = []
+        rows: List[Tuple[str, str, int, int, str, int]] = []
+        shas: Dict[ImageFile, str] = {}
+        for src in files:
+            row = known.get(os.path.abspath(src.path))
+            if row is not None and row[:2] == (src.size, src.mtime_ns):
+                # Unchanged since the last run: trust the recorded hash/decision.
+                sha = row[2]
+                if row[3]:
+                    result[src] = src.path
+                    continue
+            else:
+                try:
+                    sha = _sha256_file(src)
+                except OSError:
+                    continue
+            shas[src] = sha
+            dst = self._cache_path(src, sha)
+            if dst.exists():
+                result[src] = dst
+                if row is None or row[:3] != (src.size, src.mtime_ns, sha):
+                    rows.append((os.path.abspath(src.path), settings, src.size, src.mtime_ns, sha, 0))
+            else:
+                todo.append((src, dst))
+
+        if todo:
+            print(f"Transcoding {len(todo)} image(s) to {self.fmt} ({len(files) - len(todo)} cached)...")
+            with concurrent.futures.ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {}
+                for src, dst in todo:
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    fut = pool.submit(
+                        _transcode_one, str(src.path), str(dst), self.fmt, self.quality, self.max_dim
+                    )
+                    futures[fut] = src
+                for fut in concurrent.futures.as_completed(futures):
+                    src = futures[fut]
+                    result[src] = Path(fut.result())
+                    keep = int(result[src] == src.path)
+                    rows.append((os.path.abspath(src.path), settings, src.size, src.mtime_ns, shas[src], keep))
+        if rows:
+            conn.executemany("INSERT OR REPLACE INTO source VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+        before = after = 0
+        ordered: Dict[ImageFile, ImageFile] = {}
+        for src in files:
+            if src not in result:
+                continue
+            try:
+                out = src if result[src] == src.path else ImageFile.from_path(result[src])
+            except OSError:
+                continue
+            ordered[out] = src
+            before += src.size
+            after += out.size
+        if before:
+            print(f"Transcode: {_human_bytes(before)} -> {_human_bytes(after)} ({after / before:.0%})")
+        return ordered
+
+
+class MultipartBody:
+    """
+    multipart/form-data body that streams file parts from disk.
+
+    files: list of (fieldname, content, filename), where content is bytes, a
+    Path or an ImageFile (whose scanned size is used without another stat).
+    Only boundaries/headers are kept in memory; file contents
+    are read in chunk_size pieces while the request is being sent, so peak
+    memory does not grow with attachment size. len() is the exact
+    Content-Length, and the body can be iterated again (e.g. for a retry).
+    """
+
+    def __init__(
+        self,
+        payload_json: dict,
+        files: List[Tuple[str, Union[bytes, Path, ImageFile], str]],
+        chunk_size: int = 64 * 1024,
+    ):
+        self.boundary = f"------------------------{uuid.uuid4().hex}"
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.chunk_size = chunk_size
+        # Each segment is raw bytes or (path, size) to be streamed.
+        self._segments: List[Union[bytes, Tuple[Path, int]]] = []
+        self._length = 0
+        # Time spent reading attachments during the last iteration.
+        self.read_sec = 0.0
+
+        payload_bytes = json.dumps(payload_json, ensure_ascii=False).encode("utf-8")
+        self._add_bytes(
+            self._part_header(
+                'Content-Disposition: form-data; name="payload_json"',
+                "application/json; charset=utf-8",
+            )
+        )
+        self._add_bytes(payload_bytes + b"\r\n")
+
+        for fieldname, content, filename in files:
+            ctype, _ = mimetypes.guess_type(filename)
+            if not ctype:
+                ctype = "application/octet-stream"
+            self._add_bytes(
+                self._part_header(
+                    f'Content-Disposition: form-data; name="{fieldname}"; filename="{filename}"',
+                    ctype,
+                )
+            )
+            if isinstance(content, (Path, ImageFile)):
+                rec = ImageFile.from_path(content)
+                self._segments.append((rec.path, rec.size))
+                self._length += rec.size
+                self._add_bytes(b"\r\n")
+            else:
+                self._add_bytes(content + b"\r\n")
+
+        self._add_bytes(f"--{self.boundary}--\r\n".encode("utf-8"))
+
+    def _part_header(self, disposition: str, ctype: str) -> bytes:
+        return f"--{self.boundary}\r\n{disposition}\r\nContent-Type: {ctype}\r\n\r\n".encode(
+            "utf-8"
+        )
+
+    def _add_bytes(self, data: bytes) -> None:
+        self._segments.append(data)
+        self._length += len(data)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.read_sec = 0.0
+        for seg in self._segments:
+            if isinstance(seg, bytes):
+                yield seg
+                continue
+            path, size = seg
+            remaining = size
+            with open(path, "rb") as f:
+                while remaining > 0:
+                    t0 = time.perf_counter()
+                    buf = f.read(min(self.chunk_size, remaining))
+                    self.read_sec += time.perf_counter() - t0
+                    if not buf:
+                        break
+                    remaining -= len(buf)
+                    yield buf
+                grew = remaining == 0 and f.read(1)
+            if remaining != 0 or grew:
+                # Content-Length was already announced; a short or truncated
+                # attachment must not be sent as if it were complete.
+                raise RuntimeError(f"File changed size while sending: {path}")
+
+
 def build_multipart_formdata(
     payload_json: dict,
     files: List[Tuple[str, bytes, str]],
@@ -180,145 +999,1359 @@ def build_multipart_formdata(
     """
     files: list of (fieldname, content_bytes, filename)
     Returns: (body_bytes, content_type_header_value)
+
+    In-memory variant kept for small payloads; discord_webhook_post streams
+    via MultipartBody instead.
+    """
+    body = MultipartBody(payload_json, list(files))
+    return b"".join(body), body.content_type
+
+
+class DiscordHTTPError(RuntimeError):
+    """Non-2xx response from the webhook. Carries status and response headers."""
+
+    def __init__(self, status: int, reason: str, headers: Mapping[str, str], detail: str = ""):
+        super().__init__(f"Discord webhook HTTPError {status}: {reason}\n{detail}")
+        self.status = status
+        self.headers = headers
+        self.detail = detail
+
+    # 4xx that say "try again later" rather than "this request is wrong".
+    TRANSIENT_STATUSES = (408, 429)
+
+    @property
+    def permanent(self) -> bool:
+        """Sending the same request again will fail the same way (e.g. 404, 413)."""
+        return 400 <= self.status < 500 and self.status not in self.TRANSIENT_STATUSES
+
+    @property
+    def retry_after(self) -> Optional[float]:
+        """Seconds the server asked us to wait (429 body or Retry-After header)."""
+        try:
+            data = json.loads(self.detail)
+            if isinstance(data, dict) and data.get("retry_after") is not None:
+                return float(data["retry_after"])
+        except ValueError:
+            pass
+        for name in ("Retry-After", "X-RateLimit-Reset-After"):
+            value = self.headers.get(name)
+            if value:
+                try:
+                    return float(value)
+                except ValueError:
+                    continue
+        return None
+
+    @property
+    def is_global(self) -> bool:
+        if (self.headers.get("X-RateLimit-Global") or "").lower() == "true":
+            return True
+        try:
+            data = json.loads(self.detail)
+            return isinstance(data, dict) and bool(data.get("global"))
+        except ValueError:
+            return False
+
+
+class DiscordConnectionError(RuntimeError):
+    """
+    The request could not be delivered (DNS, connect or send failed).
+    Discord did not receive a complete body, so resending cannot duplicate the post.
+    """
+
+
+class RequestTiming(NamedTuple):
+    """Wall-clock phases of one HTTP request, in seconds (0 when skipped)."""
+
+    connect: float  # TCP connect (0 on a reused connection)
+    tls: float  # TLS handshake (0 on a reused connection or plain HTTP)
+    upload: float  # request line, headers and body
+    wait: float  # body sent -> response headers received
+    total: float
+    bytes_sent: int
+    reused: bool
+    status: int
+    read: float = 0.0  # part of upload spent reading attachments from disk
+
+
+class _TimedHTTPConnection(http.client.HTTPConnection):
+    connect_sec = 0.0
+    tls_sec = 0.0
+
+    def connect(self) -> None:
+        t0 = time.perf_counter()
+        super().connect()
+        self.connect_sec = time.perf_counter() - t0
+        self.tls_sec = 0.0
+
+
+class _TimedHTTPSConnection(http.client.HTTPSConnection):
+    connect_sec = 0.0
+    tls_sec = 0.0
+
+    def connect(self) -> None:
+        # Same as HTTPSConnection.connect, split so the handshake can be timed.
+        t0 = time.perf_counter()
+        http.client.HTTPConnection.connect(self)
+        t1 = time.perf_counter()
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname)
+        self.connect_sec = t1 - t0
+        self.tls_sec = time.perf_counter() - t1
+
+
+class HTTPConnectionPool:
     """
-    boundary = f"------------------------{uuid.uuid4().hex}"
-    crlf = b"\r\n"
-
-    parts: List[bytes] = []
-
-    # payload_json part
-    payload_bytes = json.dumps(payload_json, ensure_ascii=False).encode("utf-8")
-    parts.append(f"--{boundary}".encode("utf-8"))
-    parts.append(b'Content-Disposition: form-data; name="payload_json"')
-    parts.append(b"Content-Type: application/json; charset=utf-8")
-    parts.append(b"")
-    parts.append(payload_bytes)
-
-    # file parts
-    for fieldname, content, filename in files:
-        ctype, _ = mimetypes.guess_type(filename)
-        if not ctype:
-            ctype = "application/octet-stream"
-        parts.append(f"--{boundary}".encode("utf-8"))
-        parts.append(
-            f'Content-Disposition: form-data; name="{fieldname}"; filename="{filename}"'.encode(
-                "utf-8"
+    Thread-safe keep-alive connections per (scheme, host, port).
+
+    A post checks out an idle connection (or opens one), sends, and returns
+    it once the response is fully read and the server did not ask to close.
+    Idle connections the server already closed are dropped at checkout. A
+    request is only replayed (on a fresh connection) when sending it on a
+    reused connection failed before the whole body was written: a POST is not
+    idempotent, and once the body is out the server may have accepted it even
+    if no response arrives. HTTPS(_PROXY) environment proxies are honoured
+    like urllib.
+    """
+
+    def __init__(self, max_idle_per_host: int = 4, idle_timeout: float = 30.0):
+        self.max_idle_per_host = max_idle_per_host
+        self.idle_timeout = idle_timeout
+        self._idle: Dict[Tuple[str, str, int], List[Tuple[http.client.HTTPConnection, float]]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    @property
+    def last_timing(self) -> Optional[RequestTiming]:
+        """Timing of the last request finished by the calling thread."""
+        return getattr(self._local, "timing", None)
+
+    def _new_conn(self, scheme: str, host: str, port: int, timeout: float) -> http.client.HTTPConnection:
+        proxy = urllib.request.getproxies().get(scheme)
+        if proxy and urllib.request.proxy_bypass(host):
+            proxy = None
+        cls = _TimedHTTPSConnection if scheme == "https" else _TimedHTTPConnection
+        if not proxy:
+            return cls(host, port, timeout=timeout)
+        p = urllib.parse.urlsplit(proxy if "://" in proxy else f"http://{proxy}")
+        conn = cls(p.hostname, p.port or 8080, timeout=timeout)
+        conn.set_tunnel(host, port)
+        return conn
+
+    def _checkout(self, key: Tuple[str, str, int], timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                conn, since = idle.pop()
+                # A readable idle socket means the server sent EOF (or junk).
+                if now - since < self.idle_timeout and conn.sock is not None:
+                    try:
+                        readable = select.select([conn.sock], [], [], 0)[0]
+                    except (OSError, ValueError):
+                        readable = [conn.sock]
+                    if not readable:
+                        conn.sock.settimeout(timeout)
+                        return conn, True
+                conn.close()
+        return self._new_conn(*key, timeout=timeout), False
+
+    def _checkin(self, key: Tuple[str, str, int], conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append((conn, time.monotonic()))
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for idle in self._idle.values():
+                for conn, _ in idle:
+                    conn.close()
+            self._idle.clear()
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        body: Iterable[bytes],
+        headers: Mapping[str, str],
+        timeout: float = 60,
+    ) -> Tuple[http.client.HTTPResponse, bytes]:
+        """
+        Send one request with an iterable body (Content-Length must be in headers).
+        Returns the response (already read) and its body.
+
+        Raises DiscordConnectionError if the request could not be sent;
+        errors after the body was sent (read timeout, ...) propagate as-is
+        because the server may have processed the request.
+        """
+        u = urllib.parse.urlsplit(url)
+        scheme = u.scheme.lower()
+        if scheme not in ("http", "https") or not u.hostname:
+            raise ValueError(f"Unsupported URL: {url}")
+        key = (scheme, u.hostname, u.port or (443 if scheme == "https" else 80))
+        target = u.path or "/"
+        if u.query:
+            target += "?" + u.query
+
+        while True:
+            conn, reused = self._checkout(key, timeout)
+            t0 = time.perf_counter()
+            sent = 0
+            try:
+                try:
+                    if conn.sock is None:
+                        conn.connect()
+                    t_conn = time.perf_counter()
+                    conn.putrequest(method, target, skip_accept_encoding=True)
+                    for name, value in headers.items():
+                        conn.putheader(name, value)
+                    conn.endheaders()
+                    for chunk in body:
+                        conn.send(chunk)
+                        sent += len(chunk)
+                except OSError as e:
+                    if reused:
+                        # The body did not get through (the server closed the idle
+                        # connection), so replaying cannot duplicate it.
+                        conn.close()
+                        continue
+                    raise DiscordConnectionError(f"Discord webhook connection error: {e}") from e
+                t_sent = time.perf_counter()
+                # The full body was sent: a lost response is not retried here.
+                resp = conn.getresponse()
+                t_resp = time.perf_counter()
+                data = resp.read()
+            except BaseException:
+                conn.close()
+                raise
+            t_end = time.perf_counter()
+
+            if resp.will_close:
+                conn.close()
+            else:
+                self._checkin(key, conn)
+            connect_sec = 0.0 if reused else conn.connect_sec
+            tls_sec = 0.0 if reused else conn.tls_sec
+            self._local.timing = RequestTiming(
+                connect=connect_sec,
+                tls=tls_sec,
+                upload=t_sent - t_conn,
+                wait=t_resp - t_sent,
+                total=t_end - t0,
+                bytes_sent=sent,
+                reused=reused,
+                status=resp.status,
+                read=getattr(body, "read_sec", 0.0),
             )
-        )
-        parts.append(f"Content-Type: {ctype}".encode("utf-8"))
-        parts.append(b"")
-        parts.append(content)
+            return resp, data
 
-    parts.append(f"--{boundary}--".encode("utf-8"))
-    parts.append(b"")
 
-    body = crlf.join(parts)
-    content_type = f"multipart/form-data; boundary={boundary}"
-    return body, content_type
+# Shared by all discord_webhook_post calls unless a pool is passed explicitly.
+HTTP_POOL = HTTPConnectionPool()
 
 
 def discord_webhook_post(
     webhook_url: str,
     content: str,
-    file_paths: List[Path],
+    file_paths: List[Union[Path, ImageFile]],
     username: Optional[str] = None,
     timeout_sec: int = 60,
-) -> None:
+    pool: Optional[HTTPConnectionPool] = None,
+) -> Mapping[str, str]:
     """
     Sends one message with multiple attachments using Discord webhook.
+    Attachments are streamed from disk (see MultipartBody) over a pooled
+    keep-alive connection (see HTTPConnectionPool).
+    Returns the response headers (used for rate limit bookkeeping).
     """
     payload: dict = {"content": content}
     if username:
         payload["username"] = username
 
-    files_data: List[Tuple[str, bytes, str]] = []
-    for i, p in enumerate(file_paths):
-        # Discord expects files[n]
-        field = f"files[{i}]"
-        try:
-            data = p.read_bytes()
-        except OSError as e:
-            raise RuntimeError(f"Failed to read file: {p} ({e})") from e
-        files_data.append((field, data, p.name))
-
-    body, content_type = build_multipart_formdata(payload, files_data)
+    # Discord expects files[n]
+    files_data: List[Tuple[str, Union[bytes, Path, ImageFile], str]] = [
+        (f"files[{i}]", p, p.name) for i, p in enumerate(file_paths)
+    ]
+    try:
+        body = MultipartBody(payload, files_data)
+    except OSError as e:
+        raise RuntimeError(f"Failed to read file: {e.filename} ({e})") from e
 
-    req = urllib.request.Request(
+    resp, data = (pool or HTTP_POOL).request(
+        "POST",
         webhook_url,
-        data=body,
-        headers={"Content-Type": content_type, "User-Agent": "vrcSendDiscord-stdlib"},
-        method="POST",
+        body,
+        headers={
+            "Content-Type": body.content_type,
+            "Content-Length": str(len(body)),
+            "User-Agent": "vrcSendDiscord-stdlib",
+        },
+        timeout=timeout_sec,
     )
+    # Discord often returns 204 No Content for webhooks
+    if not 200 <= resp.status < 300:
+        detail = data.decode("utf-8", errors="replace")
+        raise DiscordHTTPError(resp.status, resp.reason, resp.headers, detail)
+    return resp.headers
 
-    try:
-        with urllib.request.urlopen(req, timeout=timeout_sec) as resp:
-            # Discord often returns 204 No Content for webhooks
-            _ = resp.read()
-    except urllib.error.HTTPError as e:
-        detail = ""
+
+class UploadMetrics:
+    """
+    Counters, phase timers and gauges for one run, written as JSON lines
+    (one event per post/phase/retry) and/or Prometheus text format.
+
+    Phases (vrcsend_phase_seconds_total{phase=...}):
+      scan, dedup, ledger, transcode, chunk   - before sending
+      rate_limit_wait, backoff                - scheduler sleeps
+      connect, tls, upload, read, server_wait - per request (read is part of upload)
+
+    All methods are thread-safe; the scheduler calls them from worker threads.
+    """
+
+    _HELP = {
+        "vrcsend_phase_seconds_total": ("counter", "Wall time spent per phase."),
+        "vrcsend_posts_total": ("counter", "Posts finished, by result."),
+        "vrcsend_files_sent_total": ("counter", "Attachments in accepted posts."),
+        "vrcsend_bytes_sent_total": ("counter", "Request bytes of accepted posts."),
+        "vrcsend_retries_total": ("counter", "Post retries, by reason."),
+        "vrcsend_rate_limited_total": ("counter", "429 responses, by scope."),
+        "vrcsend_connections_opened_total": ("counter", "New HTTP connections."),
+        "vrcsend_last_post_bytes_per_second": ("gauge", "Upload throughput of the last post."),
+        "vrcsend_watch_queue_depth": ("gauge", "Files waiting to settle or be sent (watch mode)."),
+    }
+
+    def __init__(self, jsonl_path: Optional[Path] = None, prom_path: Optional[Path] = None):
+        self.jsonl_path = jsonl_path
+        self.prom_path = prom_path
+        self._lock = threading.Lock()
+        # Serializes flush(): every flush shares one .tmp file.
+        self._flush_lock = threading.Lock()
+        self._values: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._jsonl = None
+        if jsonl_path is not None:
+            jsonl_path.parent.mkdir(parents=True, exist_ok=True)
+            self._jsonl = open(jsonl_path, "a", encoding="utf-8")
+        self._server: Optional[http.server.ThreadingHTTPServer] = None
+
+    def _add(self, name: str, value: float, labels: Mapping[str, str], replace: bool = False) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._values[key] = value if replace else self._values.get(key, 0.0) + value
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        self._add(name, value, labels)
+
+    def set_gauge(self, name: str, value: float, **labels: str) -> None:
+        self._add(name, value, labels, replace=True)
+
+    def event(self, kind: str, **fields) -> None:
+        if self._jsonl is None:
+            return
+        line = json.dumps({"ts": round(time.time(), 3), "event": kind, **fields}, ensure_ascii=False)
+        with self._lock:
+            self._jsonl.write(line + "\n")
+            self._jsonl.flush()
+
+    def add_phase(self, phase: str, seconds: float, **fields) -> None:
+        self.inc("vrcsend_phase_seconds_total", seconds, phase=phase)
+        self.event("phase", phase=phase, seconds=round(seconds, 6), **fields)
+
+    @contextlib.contextmanager
+    def phase(self, phase: str, **fields) -> Iterator[None]:
+        t0 = time.perf_counter()
         try:
-            detail = e.read().decode("utf-8", errors="replace")
-        except Exception:
+            yield
+        finally:
+            self.add_phase(phase, time.perf_counter() - t0, **fields)
+
+    def record_post(self, job: "PostJob", timing: Optional[RequestTiming]) -> None:
+        self.inc("vrcsend_posts_total", result="ok")
+        self.inc("vrcsend_files_sent_total", len(job.files))
+        fields: dict = {
+            "index": job.index,
+            "files": len(job.files),
+            "file_bytes": sum(p.size for p in job.files),
+            "attempts": job.attempts,
+            "rate_limited": job.rate_limited,
+        }
+        if timing is not None:
+            self.inc("vrcsend_bytes_sent_total", timing.bytes_sent)
+            if not timing.reused:
+                self.inc("vrcsend_connections_opened_total")
+            for phase, sec in (
+                ("connect", timing.connect),
+                ("tls", timing.tls),
+                ("upload", timing.upload),
+                ("read", timing.read),
+                ("server_wait", timing.wait),
+            ):
+                self.inc("vrcsend_phase_seconds_total", sec, phase=phase)
+            # Throughput of the body transfer itself, excluding handshakes and server time.
+            bps = timing.bytes_sent / timing.upload if timing.upload > 0 else 0.0
+            self.set_gauge("vrcsend_last_post_bytes_per_second", bps)
+            fields.update(
+                {k: round(v, 6) if isinstance(v, float) else v for k, v in timing._asdict().items()},
+                bytes_per_sec=round(bps),
+            )
+        self.event("post", **fields)
+        self.flush()
+
+    def record_failure(self, job: "PostJob", err: BaseException) -> None:
+        self.inc("vrcsend_posts_total", result="failed")
+        self.event("post_failed", index=job.index, files=len(job.files), attempts=job.attempts, error=str(err))
+        self.flush()
+
+    def render_prometheus(self) -> str:
+        with self._lock:
+            items = sorted(self._values.items())
+        lines: List[str] = []
+        seen: Set[str] = set()
+        for (name, labels), value in items:
+            if name not in seen:
+                seen.add(name)
+                kind, text = self._HELP.get(name, ("untyped", name))
+                lines.append(f"# HELP {name} {text}")
+                lines.append(f"# TYPE {name} {kind}")
+            label_s = ",".join(f'{k}="{v}"' for k, v in labels)
+            value_s = str(int(value)) if value.is_integer() else repr(value)
+            lines.append(f"{name}{{{label_s}}} {value_s}" if label_s else f"{name} {value_s}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self) -> None:
+        """Rewrite the Prometheus text file (atomically, for node_exporter's textfile collector)."""
+        if self.prom_path is None:
+            return
+        tmp = self.prom_path.with_name(self.prom_path.name + ".tmp")
+        with self._flush_lock:
+            tmp.write_text(self.render_prometheus(), encoding="utf-8")
+            os.replace(tmp, self.prom_path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> None:
+        """Expose /metrics over HTTP from a daemon thread."""
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        self._server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="vrcSendDiscord-metrics", daemon=True).start()
+
+    def close(self) -> None:
+        self.flush()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+        if self._jsonl is not None:
+            self._jsonl.close()
+
+
+class _RateLimitBucket:
+    """
+    Per-webhook rate limit state fed by X-RateLimit-* response headers.
+
+    Until the first response arrives the limit is unknown, so only one request
+    is let through as a probe. Afterwards requests are granted while
+    `remaining` > 0 and held until the server-announced reset otherwise.
+    """
+
+    def __init__(self, url: str, min_interval: float = 0.0):
+        self.url = url
+        self.min_interval = min_interval
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.next_ok = 0.0
+        self.in_flight = 0
+
+    def delay(self, now: float) -> float:
+        """Seconds until a request may be sent on this bucket (0 = now)."""
+        wait = max(0.0, self.next_ok - now)
+        if self.remaining is None:
+            if self.in_flight > 0:
+                return max(wait, 0.05)
+            return wait
+        if self.remaining <= 0:
+            if now < self.reset_at:
+                return max(wait, self.reset_at - now)
+            # Window elapsed: start over with the last known limit (or probe).
+            self.remaining = self.limit
+            return self.delay(now)
+        return wait
+
+    def acquire(self, now: float) -> None:
+        self.in_flight += 1
+        if self.remaining is not None:
+            self.remaining -= 1
+        self.next_ok = now + self.min_interval
+
+    def release(self, headers: Optional[Mapping[str, str]], now: float) -> None:
+        self.in_flight -= 1
+        if not headers:
+            return
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset_after = headers.get("X-RateLimit-Reset-After")
+        limit = headers.get("X-RateLimit-Limit")
+        try:
+            if limit is not None:
+                self.limit = int(limit)
+            if remaining is not None:
+                # Be conservative: requests still in flight may not be counted yet.
+                self.remaining = max(0, int(remaining) - self.in_flight)
+            if reset_after is not None:
+                self.reset_at = now + float(reset_after)
+        except ValueError:
             pass
-        raise RuntimeError(f"Discord webhook HTTPError {e.code}: {e.reason}\n{detail}") from e
-    except urllib.error.URLError as e:
-        raise RuntimeError(f"Discord webhook URLError: {e.reason}") from e
+
+    def block_for(self, seconds: float, now: float) -> None:
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, now + seconds)
+
+
+class PostJob:
+    """
+    One planned Discord post: a chunk of files plus its message text.
+    sources are the original files (differ from files after --transcode).
+    """
+
+    def __init__(
+        self,
+        index: int,
+        content: str,
+        files: List[ImageFile],
+        sources: Optional[List[ImageFile]] = None,
+    ):
+        self.index = index
+        self.content = content
+        self.files = files
+        self.sources = sources if sources is not None else list(files)
+        self.attempts = 0
+        self.rate_limited = 0
+
+
+class UploadFailed(RuntimeError):
+    """Some posts of a batch failed; the rest were sent."""
+
+    def __init__(self, failed: List[Tuple[PostJob, BaseException]]):
+        lines = [f"  post {job.index}: {str(err).splitlines()[0]}" for job, err in failed]
+        super().__init__(f"{len(failed)} post(s) failed:\n" + "\n".join(lines))
+        self.failed = failed
+
+    @property
+    def failed_sources(self) -> List[ImageFile]:
+        return [src for job, _ in self.failed for src in job.sources]
+
+    @property
+    def retryable_sources(self) -> List[ImageFile]:
+        """Sources of the failed posts that may succeed when sent again."""
+        return [src for job, err in self.failed if not _is_permanent(err) for src in job.sources]
+
+
+def _is_permanent(error: BaseException) -> bool:
+    return isinstance(error, DiscordHTTPError) and error.permanent
+
+
+class UploadScheduler:
+    """
+    Sends PostJobs with up to `concurrency` requests in flight, spread across
+    one or more webhook URLs.
+
+    - Honors X-RateLimit-Remaining / X-RateLimit-Reset-After per webhook and
+      waits exactly retry_after on 429 (all webhooks on a global limit).
+    - Retries 429, 5xx and undelivered requests (connection failures) with
+      jittered exponential backoff; other errors are not retried.
+    - Each job is taken from the queue by exactly one worker and only
+      requeued when the server did not accept it, so a post is never sent twice.
+    """
+
+    # Give up on a post that keeps getting 429 (misconfigured/shared webhook).
+    MAX_RATE_LIMIT_WAITS = 20
+
+    def __init__(
+        self,
+        webhook_urls: List[str],
+        concurrency: int = 1,
+        max_retries: int = 5,
+        min_interval: float = 0.0,
+        username: Optional[str] = None,
+        backoff_base: float = 1.0,
+        post_func: Callable[..., Mapping[str, str]] = discord_webhook_post,
+        metrics: Optional[UploadMetrics] = None,
+    ):
+        if not webhook_urls:
+            raise ValueError("At least one webhook URL is required.")
+        self.buckets = [_RateLimitBucket(u, min_interval=min_interval) for u in webhook_urls]
+        self.concurrency = max(1, concurrency)
+        self.max_retries = max_retries
+        self.username = username
+        self.backoff_base = backoff_base
+        self.post_func = post_func
+        self.metrics = metrics
+        self._cond = threading.Condition()
+        self._global_until = 0.0
+
+    def _acquire_bucket(self) -> _RateLimitBucket:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                global_wait = self._global_until - now
+                best = min(self.buckets, key=lambda b: b.delay(now))
+                wait = max(global_wait, best.delay(now))
+                if wait <= 0:
+                    best.acquire(now)
+                    return best
+                self._cond.wait(timeout=wait)
+
+    def _release_bucket(
+        self, bucket: _RateLimitBucket, headers: Optional[Mapping[str, str]]
+    ) -> None:
+        with self._cond:
+            bucket.release(headers, time.monotonic())
+            self._cond.notify_all()
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_base * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+
+    def _metrics(self, update: Callable[[UploadMetrics], None]) -> None:
+        """Metrics are best-effort: a failing update is logged and never fails a post."""
+        if self.metrics is None:
+            return
+        try:
+            update(self.metrics)
+        except Exception as e:
+            print(f"Warning: metrics update failed: {e}", file=sys.stderr)
+
+    def _phase(self, phase: str, seconds: float) -> None:
+        if seconds < 0.001:
+            # Uncontended bucket: count it, but keep the event log readable.
+            self._metrics(lambda m: m.inc("vrcsend_phase_seconds_total", seconds, phase=phase))
+        else:
+            self._metrics(lambda m: m.add_phase(phase, seconds))
+
+    def _count(self, name: str, event: str, job: PostJob, **labels: str) -> None:
+        def update(m: UploadMetrics) -> None:
+            m.inc(name, **labels)
+            m.event(event, index=job.index, **labels)
+
+        self._metrics(update)
+
+    def _sleep_backoff(self, attempt: int) -> None:
+        wait = self._backoff(attempt)
+        time.sleep(wait)
+        self._phase("backoff", wait)
+
+    def _send_one(self, job: PostJob) -> None:
+        """Send a job until it succeeds, retrying only when it was not accepted."""
+        while True:
+            job.attempts += 1
+            t0 = time.perf_counter()
+            bucket = self._acquire_bucket()
+            self._phase("rate_limit_wait", time.perf_counter() - t0)
+            before = HTTP_POOL.last_timing
+            try:
+                headers = self.post_func(
+                    bucket.url,
+                    content=job.content,
+                    file_paths=job.files,
+                    username=self.username,
+                )
+            except DiscordHTTPError as e:
+                self._release_bucket(bucket, e.headers)
+                if e.status == 429:
+                    wait = e.retry_after if e.retry_after is not None else self._backoff(job.attempts)
+                    with self._cond:
+                        now = time.monotonic()
+                        if e.is_global:
+                            self._global_until = max(self._global_until, now + wait)
+                        else:
+                            bucket.block_for(wait, now)
+                        self._cond.notify_all()
+                    self._count("vrcsend_rate_limited_total", "rate_limited", job, scope="global" if e.is_global else "bucket")
+                    # A 429 was rejected before processing; it does not use up a retry.
+                    job.attempts -= 1
+                    job.rate_limited += 1
+                    if job.rate_limited <= self.MAX_RATE_LIMIT_WAITS:
+                        continue
+                    raise
+                if 500 <= e.status < 600 and job.attempts <= self.max_retries:
+                    print(f"Post {job.index}: HTTP {e.status}, retrying (attempt {job.attempts})")
+                    self._count("vrcsend_retries_total", "retry", job, reason=str(e.status))
+                    self._sleep_backoff(job.attempts)
+                    continue
+                raise
+            except DiscordConnectionError as e:
+                self._release_bucket(bucket, None)
+                if job.attempts <= self.max_retries:
+                    print(f"Post {job.index}: {e}, retrying (attempt {job.attempts})")
+                    self._count("vrcsend_retries_total", "retry", job, reason="connection")
+                    self._sleep_backoff(job.attempts)
+                    continue
+                raise
+            except BaseException:
+                self._release_bucket(bucket, None)
+                raise
+            self._release_bucket(bucket, headers)
+            # Only the default transport records timings; ignore a stale one.
+            timing = HTTP_POOL.last_timing
+            self._metrics(lambda m: m.record_post(job, timing if timing is not before else None))
+            return
+
+    def run(
+        self,
+        jobs: List[PostJob],
+        on_success: Optional[Callable[[PostJob], None]] = None,
+        on_failure: Optional[Callable[[PostJob, BaseException], None]] = None,
+    ) -> None:
+        """
+        Send all jobs. on_success is called (serialized) after each accepted post.
+        If on_failure is given, a post that still fails after its retries is
+        reported there and the remaining jobs continue. Otherwise no further
+        jobs are started; in-flight ones finish and the first error is re-raised.
+        """
+        pending: "queue.Queue[PostJob]" = queue.Queue()
+        for job in jobs:
+            pending.put(job)
+        errors: List[BaseException] = []
+        done_lock = threading.Lock()
+
+        def worker() -> None:
+            while not errors:
+                try:
+                    job = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self._send_one(job)
+                except Exception as e:
+                    if on_failure is None:
+                        errors.append(e)
+                        return
+                    with done_lock:
+                        on_failure(job, e)
+                    continue
+                except BaseException as e:
+                    errors.append(e)
+                    return
+                with done_lock:
+                    if on_success is not None:
+                        on_success(job)
+
+        threads = [
+            threading.Thread(target=worker, name=f"vrcSendDiscord-{i}", daemon=True)
+            for i in range(min(self.concurrency, len(jobs)))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        if errors:
+            raise errors[0]
+
+
+def _record_to_json(r: ImageFile) -> list:
+    return [str(r.path), r.size, r.mtime_ns]
+
+
+def _record_from_json(v: list) -> ImageFile:
+    return ImageFile(Path(v[0]), int(v[1]), int(v[2]))
+
+
+class UploadJournal:
+    """
+    Append-only JSON-lines journal of planned posts, fsynced after every line.
+
+    A plan (every post with its files and message) is written before the
+    first request, then one line per accepted or failed post. If a run dies
+    mid-batch, the next send_batched resumes the plan from its first
+    incomplete post, so already posted chunks are not sent again and chunk
+    boundaries/numbering stay the same. Posts rejected with a 4xx (e.g. 413
+    for an oversized file) are recorded as permanent failures and not retried;
+    408 and 429 are transient and are retried on the next run.
+    The journal is emptied once no plan has unfinished posts.
+
+    Delivery is at-least-once: a post accepted by Discord right before the
+    process died, but not yet journaled, is sent again on resume.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _append(self, rec: dict) -> None:
+        line = json.dumps(rec, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _load(self) -> List[Tuple[dict, Set[int]]]:
+        """[(plan, finished post indexes)] in journal order."""
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return []
+        plans: Dict[str, Tuple[dict, Set[int]]] = {}
+        for line in lines:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # torn last line after a crash; everything before it is intact
+                continue
+            kind = rec.get("type")
+            if kind == "plan":
+                plans[rec["id"]] = (rec, set())
+            elif rec.get("plan") in plans:
+                if kind == "done" or (kind == "failed" and rec.get("permanent")):
+                    plans[rec["plan"]][1].add(rec["index"])
+        return list(plans.values())
+
+    def pending_plans(self) -> List[Tuple[str, List[PostJob], int, Set[Path]]]:
+        """
+        Unfinished plans as (plan_id, unfinished jobs, total posts, every
+        source path in the plan).
+        """
+        out = []
+        for plan, finished in self._load():
+            jobs = [
+                PostJob(
+                    p["index"],
+                    p["content"],
+                    [_record_from_json(v) for v in p["files"]],
+                    [_record_from_json(v) for v in p["sources"]],
+                )
+                for p in plan["posts"]
+                if p["index"] not in finished
+            ]
+            if jobs:
+                planned = {Path(v[0]) for p in plan["posts"] for v in p["sources"]}
+                out.append((plan["id"], jobs, len(plan["posts"]), planned))
+        return out
+
+    def start_plan(self, jobs: List[PostJob]) -> str:
+        plan_id = uuid.uuid4().hex
+        self._append(
+            {
+                "type": "plan",
+                "id": plan_id,
+                "created": time.time(),
+                "posts": [
+                    {
+                        "index": j.index,
+                        "content": j.content,
+                        "files": [_record_to_json(r) for r in j.files],
+                        "sources": [_record_to_json(r) for r in j.sources],
+                    }
+                    for j in jobs
+                ],
+            }
+        )
+        return plan_id
+
+    def mark_done(self, plan_id: str, job: PostJob) -> None:
+        self._append({"type": "done", "plan": plan_id, "index": job.index})
+
+    def mark_failed(self, plan_id: str, job: PostJob, error: BaseException) -> None:
+        self._append(
+            {
+                "type": "failed",
+                "plan": plan_id,
+                "index": job.index,
+                "permanent": _is_permanent(error),
+                "error": str(error)[:500],
+            }
+        )
+
+    def compact(self) -> None:
+        """Empty the journal when every plan in it is finished."""
+        if self.pending_plans():
+            return
+        with self._lock:
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            tmp.write_text("", encoding="utf-8")
+            os.replace(tmp, self.path)
+
+
+class _InotifyWatcher:
+    """
+    Linux inotify through ctypes (stdlib-only). wait() blocks in select() until
+    the kernel reports new entries, so an idle watcher uses no CPU.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    _EVENT = struct.Struct("iIII")
+
+    def __init__(self, root: Path, recursive: bool):
+        import ctypes
+        import ctypes.util
+
+        self.root = root
+        self.recursive = recursive
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd_to_dir: Dict[int, Path] = {}
+        self._rescan: List[Path] = []
+        self._add_tree(root)
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith("linux")
+
+    def _add_watch(self, d: Path) -> None:
+        import ctypes
+
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_MODIFY
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(d)), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            print(f"Warning: cannot watch {d}: {os.strerror(err)}", file=sys.stderr)
+            return
+        self._wd_to_dir[wd] = d
+
+    def _add_tree(self, d: Path) -> None:
+        self._add_watch(d)
+        if not self.recursive:
+            return
+        for dirpath, dirnames, _ in os.walk(d):
+            for name in dirnames:
+                self._add_watch(Path(dirpath) / name)
+
+    def wait(self, timeout: Optional[float]) -> List[Path]:
+        """Return paths created/written since the last call (may repeat a path)."""
+        out: List[Path] = []
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return out
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return out
+        offset = 0
+        while offset + self._EVENT.size <= len(data):
+            wd, mask, _cookie, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                # Events were dropped; rescan every watched directory once.
+                for d in self._wd_to_dir.values():
+                    out.extend(iter_image_files(d, recursive=False))
+                continue
+            if mask & self.IN_IGNORED:
+                self._wd_to_dir.pop(wd, None)
+                continue
+            d = self._wd_to_dir.get(wd)
+            if d is None or not name:
+                continue
+            p = d / os.fsdecode(name)
+            if mask & self.IN_ISDIR:
+                if self.recursive and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    self._add_tree(p)
+                    # Files may have landed before the watch was in place.
+                    out.extend(iter_image_files(p, recursive=True))
+                continue
+            out.append(p)
+        return out
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _PollingWatcher:
+    """
+    Portable fallback: stat only the directories every poll_interval and list
+    a directory again only when its mtime changed (creating a file updates it).
+    """
+
+    def __init__(self, root: Path, recursive: bool, poll_interval: float = 2.0):
+        self.root = root
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self._dirs: Dict[Path, int] = {}
+        self._known: Dict[Path, Set[str]] = {}
+        self._track(root, emit=None)
+
+    def _track(self, d: Path, emit: Optional[List[Path]]) -> None:
+        try:
+            mtime_ns = d.stat().st_mtime_ns
+            entries = list(os.scandir(d))
+        except OSError:
+            return
+        self._dirs[d] = mtime_ns
+        names = self._known.setdefault(d, set())
+        for e in entries:
+            if e.name in names:
+                continue
+            names.add(e.name)
+            try:
+                is_dir = e.is_dir(follow_symlinks=False)
+            except OSError:
+                continue
+            if is_dir:
+                if self.recursive:
+                    self._track(Path(e.path), emit)
+            elif emit is not None and os.path.splitext(e.name)[1].lower() in IMAGE_EXTS:
+                emit.append(Path(e.path))
+
+    def wait(self, timeout: Optional[float]) -> List[Path]:
+        time.sleep(self.poll_interval if timeout is None else min(timeout, self.poll_interval))
+        out: List[Path] = []
+        for d, old_mtime in list(self._dirs.items()):
+            try:
+                mtime_ns = d.stat().st_mtime_ns
+            except OSError:
+                self._dirs.pop(d, None)
+                self._known.pop(d, None)
+                continue
+            if mtime_ns != old_mtime:
+                self._track(d, emit=out)
+        return out
+
+    def close(self) -> None:
+        pass
 
 
 class vrcSendDiscord:
-    def __init__(self, screenshots_dir: Path, webhook_url: str):
+    def __init__(
+        self,
+        screenshots_dir: Path,
+        webhook_url: Union[str, List[str]],
+        ledger: Optional[UploadLedger] = None,
+        transcoder: Optional[Transcoder] = None,
+        journal: Optional[UploadJournal] = None,
+        deduper: Optional[PerceptualDeduper] = None,
+        metrics: Optional[UploadMetrics] = None,
+    ):
         self.screenshots_dir = screenshots_dir
-        self.webhook_url = webhook_url
+        # One or more webhooks (posts are spread across them by UploadScheduler).
+        self.webhook_urls = [webhook_url] if isinstance(webhook_url, str) else list(webhook_url)
+        self.webhook_url = self.webhook_urls[0]
+        self.ledger = ledger
+        self.transcoder = transcoder
+        self.journal = journal
+        self.deduper = deduper
+        self.metrics = metrics
+
+    def _phase(self, phase: str, **fields) -> "contextlib.AbstractContextManager[None]":
+        if self.metrics is None:
+            return contextlib.nullcontext()
+        return self.metrics.phase(phase, **fields)
+
+    def prepare_images(
+        self, images: List[ImageFile], estimate: bool = False
+    ) -> Tuple[List[ImageFile], Dict[ImageFile, ImageFile]]:
+        """
+        Apply the optional transcode stage.
+        Returns (files_to_send, {file_to_send: original_file}).
+        estimate: only look up earlier results (Transcoder.estimate), for --dry-run.
+        """
+        if self.transcoder is None:
+            return images, {p: p for p in images}
+        if estimate:
+            sources = self.transcoder.estimate(images)
+            return list(sources), sources
+        with self._phase("transcode", files=len(images)):
+            sources = self.transcoder.run(images)
+        return list(sources), sources
 
     def collect_images(
         self,
         recursive: bool = True,
         since: Optional[_dt.datetime] = None,
-    ) -> List[Path]:
-        files = list(iter_image_files(self.screenshots_dir, recursive=recursive))
-        return filter_since(files, since=since)
+    ) -> List[ImageFile]:
+        with self._phase("scan"):
+            files = filter_since(scan_image_files(self.screenshots_dir, recursive=recursive), since=since)
+        # Dedup before the ledger filter so a duplicate of an already sent
+        # image is still recognized as one.
+        if self.deduper is not None:
+            with self._phase("dedup", files=len(files)):
+                files = self.deduper.dedup(files)
+        if self.ledger is not None:
+            with self._phase("ledger", files=len(files)):
+                files = self.ledger.filter_unsent(files)
+        return files
 
     def send_batched(
         self,
-        images: List[Path],
+        images: List[ImageFile],
         max_bytes: int,
         max_files_per_post: int,
         message_prefix: str = "",
         username: Optional[str] = None,
         sleep_sec: float = 1.0,
+        concurrency: int = 1,
+        max_retries: int = 5,
+        packing: str = "greedy",
+        pack_window: int = 100,
     ) -> None:
-        if not images:
-            print("No images to send.")
-            return
-
-        chunks = chunk_files_by_size(
-            images, max_bytes=max_bytes, max_files_per_post=max_files_per_post
+        """
+        sleep_sec: minimum spacing between posts on the same webhook; rate limit
+        headers are honored regardless (0 = pace by the headers alone).
+        packing / pack_window: see chunk_files_by_size.
+
+        Failed posts do not stop the batch; they are reported together at the
+        end as UploadFailed. With a journal, an unfinished plan from an earlier
+        run is completed first.
+        """
+        scheduler = UploadScheduler(
+            self.webhook_urls,
+            concurrency=concurrency,
+            max_retries=max_retries,
+            min_interval=sleep_sec,
+            username=username,
+            metrics=self.metrics,
         )
-        total = len(images)
-        print(f"Sending {total} image(s) in {len(chunks)} post(s).")
-        for idx, ch in enumerate(chunks, start=1):
-            size_sum = 0
-            for p in ch:
-                try:
-                    size_sum += p.stat().st_size
-                except OSError:
-                    pass
+        failed: List[Tuple[PostJob, BaseException]] = []
+        images = list(_as_records(images))
+        resumed = False
+
+        if self.journal is not None:
+            for plan_id, jobs, total_posts, planned in self.journal.pending_plans():
+                resumed = True
+                print(f"Resuming {len(jobs)} unfinished post(s) from journal {self.journal.path}")
+                failed += self._run_jobs(scheduler, jobs, total_posts, plan_id)
+                # Everything in an earlier plan is either sent or being retried there.
+                images = [r for r in images if r.path not in planned]
 
-            content = f"{message_prefix}({idx}/{len(chunks)}) {len(ch)} file(s), ~{_human_bytes(size_sum)}"
-            discord_webhook_post(
-                self.webhook_url,
-                content=content,
-                file_paths=ch,
-                username=username,
-            )
-            print(f"Posted {idx}/{len(chunks)}: {len(ch)} file(s)")
-            if idx != len(chunks) and sleep_sec > 0:
-                time.sleep(sleep_sec)
+        if not images:
+            if not resumed:
+                print("No images to send.")
+        else:
+            images, sources = self.prepare_images(images)
+            with self._phase("chunk", files=len(images)):
+                chunks = chunk_files_by_size(
+                    images,
+                    max_bytes=max_bytes,
+                    max_files_per_post=max_files_per_post,
+                    packing=packing,
+                    window=pack_window,
+                )
+            total = len(images)
+            print(f"Sending {total} image(s) in {len(chunks)} post(s).")
+            jobs = []
+            for idx, ch in enumerate(chunks, start=1):
+                size_sum = sum(p.size for p in ch)
+
+                content = f"{message_prefix}({idx}/{len(chunks)}) {len(ch)} file(s), ~{_human_bytes(size_sum)}"
+                jobs.append(PostJob(idx, content, ch, [sources.get(p, p) for p in ch]))
+
+            plan_id = self.journal.start_plan(jobs) if self.journal is not None else None
+            failed += self._run_jobs(scheduler, jobs, len(chunks), plan_id)
+
+        if self.journal is not None:
+            self.journal.compact()
+        if self.metrics is not None:
+            self.metrics.flush()
+        if failed:
+            raise UploadFailed(failed)
+
+    def _run_jobs(
+        self,
+        scheduler: UploadScheduler,
+        jobs: List[PostJob],
+        total_posts: int,
+        plan_id: Optional[str],
+    ) -> List[Tuple[PostJob, BaseException]]:
+        failed: List[Tuple[PostJob, BaseException]] = []
+
+        def on_success(job: PostJob) -> None:
+            # Only record files once Discord accepted the post.
+            if self.journal is not None and plan_id is not None:
+                self.journal.mark_done(plan_id, job)
+            if self.ledger is not None:
+                self.ledger.mark_sent(job.sources)
+            timing = HTTP_POOL.last_timing
+            rate = ""
+            if timing is not None and timing.total > 0:
+                rate = (
+                    f" ({_human_bytes(timing.bytes_sent)} in {timing.total:.1f}s,"
+                    f" {_human_bytes(int(timing.bytes_sent / timing.total))}/s)"
+                )
+            print(f"Posted {job.index}/{total_posts}: {len(job.files)} file(s){rate}")
+
+        def on_failure(job: PostJob, err: BaseException) -> None:
+            if self.journal is not None and plan_id is not None:
+                self.journal.mark_failed(plan_id, job, err)
+            names = ", ".join(p.name for p in job.files[:3])
+            more = f" (+{len(job.files) - 3})" if len(job.files) > 3 else ""
+            print(f"Failed {job.index}/{total_posts} [{names}{more}]: {err}", file=sys.stderr)
+            failed.append((job, err))
+            scheduler._metrics(lambda m: m.record_failure(job, err))
+
+        scheduler.run(jobs, on_success=on_success, on_failure=on_failure)
+        return failed
+
+    def watch(
+        self,
+        max_bytes: int,
+        max_files_per_post: int,
+        recursive: bool = True,
+        settle_sec: float = 1.0,
+        batch_window_sec: float = 1.0,
+        poll_interval: float = 2.0,
+        force_polling: bool = False,
+        retry_delay_sec: float = 30.0,
+        max_attempts: int = 5,
+        **send_kwargs,
+    ) -> None:
+        """
+        Upload new screenshots as they appear, until interrupted (Ctrl-C).
+
+        New files come from inotify on Linux or the directory-mtime poller
+        elsewhere. A file is ready once its size/mtime stayed unchanged for
+        settle_sec; ready files are collected for batch_window_sec (or until a
+        post is full) and sent through send_batched/chunk_files_by_size.
+        send_kwargs are passed through to send_batched. With a deduper, each
+        batch is filtered like collect_images (dedup, then ledger).
+
+        Files of failed posts are sent again after retry_delay_sec, up to
+        max_attempts sends per file. Posts rejected permanently (4xx other than
+        408/429, e.g. a deleted webhook or a file over the size limit) are not
+        retried; their files are reported as abandoned.
+        """
+        watcher: Union[_InotifyWatcher, _PollingWatcher]
+        if not force_polling and _InotifyWatcher.available():
+            try:
+                watcher = _InotifyWatcher(self.screenshots_dir, recursive=recursive)
+            except OSError as e:
+                print(f"inotify unavailable ({e}); falling back to polling.", file=sys.stderr)
+                watcher = _PollingWatcher(self.screenshots_dir, recursive, poll_interval)
+        else:
+            watcher = _PollingWatcher(self.screenshots_dir, recursive, poll_interval)
+        mode = "inotify" if isinstance(watcher, _InotifyWatcher) else "polling"
+        print(f"Watching {self.screenshots_dir} ({mode}). Ctrl-C to stop.")
+
+        # path -> (size, mtime_ns, monotonic time the pair was first seen)
+        pending: Dict[Path, Tuple[int, int, float]] = {}
+        # Images selected so far, so a burst split across batches is still deduped.
+        seen = HammingIndex(self.deduper.max_distance) if self.deduper is not None else None
+        ready: List[ImageFile] = []
+        # path -> failed sends so far
+        attempts: Dict[Path, int] = {}
+        ready_since = 0.0
+        not_before = 0.0
+        last_depth = -1
+        try:
+            while True:
+                if pending:
+                    timeout: Optional[float] = settle_sec / 2
+                elif ready:
+                    timeout = max(0.0, max(ready_since + batch_window_sec, not_before) - time.monotonic())
+                else:
+                    timeout = None
+                for p in watcher.wait(timeout):
+                    if p.suffix.lower() in IMAGE_EXTS and all(r.path != p for r in ready):
+                        pending.setdefault(p, (-1, -1, time.monotonic()))
+
+                now = time.monotonic()
+                for p, (size, mtime_ns, since) in list(pending.items()):
+                    try:
+                        st = p.stat()
+                    except OSError:
+                        del pending[p]
+                        continue
+                    if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                        pending[p] = (st.st_size, st.st_mtime_ns, now)
+                    elif st.st_size > 0 and now - since >= settle_sec:
+                        del pending[p]
+                        if not ready:
+                            ready_since = now
+                        ready.append(ImageFile(p, st.st_size, st.st_mtime_ns))
+
+                if self.metrics is not None:
+                    depth = len(pending) + len(ready)
+                    if depth != last_depth:
+                        last_depth = depth
+                        self.metrics.set_gauge("vrcsend_watch_queue_depth", depth)
+                        self.metrics.event("watch_queue", depth=depth)
+                        self.metrics.flush()
+
+                if not ready or now < not_before:
+                    continue
+                full = len(ready) >= max_files_per_post
+                if not full and now - ready_since < batch_window_sec:
+                    continue
+
+                batch = sorted(ready, key=lambda r: r.mtime_ns)
+                ready = []
+                if self.deduper is not None:
+                    with self._phase("dedup", files=len(batch)):
+                        batch = self.deduper.dedup(batch, index=seen)
+                if self.ledger is not None:
+                    batch = self.ledger.filter_unsent(batch)
+                try:
+                    self.send_batched(batch, max_bytes, max_files_per_post, **send_kwargs)
+                except Exception as e:
+                    print(f"Send failed: {e}", file=sys.stderr)
+                    sent = batch
+                    if isinstance(e, UploadFailed):
+                        # Only the posts that failed and may succeed later; the
+                        # others were delivered or will be rejected again.
+                        batch = e.retryable_sources
+                        for r in e.failed_sources:
+                            if r not in batch:
+                                print(f"Abandoned {r.path} (rejected permanently).", file=sys.stderr)
+                    retry: List[Path] = []
+                    for r in batch:
+                        attempts[r.path] = attempts.get(r.path, 0) + 1
+                        if attempts[r.path] < max_attempts:
+                            retry.append(r.path)
+                        else:
+                            print(f"Abandoned {r.path} after {max_attempts} attempts.", file=sys.stderr)
+                    for r in sent:
+                        if r.path not in retry:
+                            attempts.pop(r.path, None)
+                    # Re-stat: a file touched since it settled would fail again.
+                    batch = list(_as_records(retry))
+                    if self.ledger is not None:
+                        batch = self.ledger.filter_unsent(batch)
+                    if batch:
+                        print(f"Retrying {len(batch)} file(s) in {retry_delay_sec:.0f}s", file=sys.stderr)
+                    ready = batch
+                    ready_since = now
+                    not_before = now + retry_delay_sec
+                else:
+                    for r in batch:
+                        attempts.pop(r.path, None)
+        except KeyboardInterrupt:
+            print("Stopped watching.")
+        finally:
+            watcher.close()
 
 
 def parse_args(argv: List[str]) -> argparse.Namespace:
     p = argparse.ArgumentParser(description="Send VRChat screenshots to Discord Webhook.")
-    p.add_argument("--webhook-url", required=False, help="Discord webhook URL.")
+    p.add_argument(
+        "--webhook-url",
+        action="append",
+        required=False,
+        help="Discord webhook URL. Repeat to spread posts across several webhooks.",
+    )
     p.add_argument(
         "--screenshots-dir",
         required=False,
@@ -347,6 +2380,20 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
         default=10,
         help="Max number of files per Discord post (default: 10).",
     )
+    p.add_argument(
+        "--packing",
+        choices=PACKING_MODES,
+        default="greedy",
+        help="How files are grouped into posts: greedy (strict mtime order) or "
+        "binpack (size-sorted packing within --pack-window files; fewer posts).",
+    )
+    p.add_argument(
+        "--pack-window",
+        type=int,
+        default=100,
+        help="Files per packing window for --packing binpack; a file moves at most "
+        "about one window from its mtime position (default: 100).",
+    )
     p.add_argument(
         "--username",
         type=str,
@@ -362,20 +2409,147 @@ def parse_args(argv: List[str]) -> argparse.Namespace:
     p.add_argument(
         "--dry-run",
         action="store_true",
-        help="Do not send; only show what would be sent.",
+        help="Do not send; only show what would be sent (with --transcode, sizes come from the cache; nothing is encoded).",
     )
     p.add_argument(
         "--sleep-sec",
         type=float,
         default=1.0,
-        help="Sleep seconds between posts to avoid rate limits (default: 1.0).",
+        help="Minimum seconds between posts on the same webhook (default: 1.0). "
+        "Discord rate limit headers are always honored; 0 paces by the headers alone.",
+    )
+    p.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Number of posts in flight at once (default: 1).",
+    )
+    p.add_argument(
+        "--max-retries",
+        type=int,
+        default=5,
+        help="Retries per post on 5xx/connection errors (default: 5).",
+    )
+    p.add_argument(
+        "--journal",
+        type=str,
+        default=None,
+        help="Journal file for resuming an interrupted batch without re-posting "
+        "finished chunks (fsynced after every post).",
+    )
+    p.add_argument(
+        "--dedup",
+        action="store_true",
+        help="Skip near-identical images (perceptual hash, needs Pillow).",
+    )
+    p.add_argument(
+        "--dedup-distance",
+        type=int,
+        default=4,
+        help="Max differing bits (of 64) to treat two images as duplicates (default: 4).",
+    )
+    p.add_argument(
+        "--dedup-index",
+        type=str,
+        default=str(Path.home() / ".cache" / "vrcSendDiscord" / "dhash.sqlite3"),
+        help="Hash cache for --dedup (default: ~/.cache/vrcSendDiscord/dhash.sqlite3).",
+    )
+    p.add_argument(
+        "--metrics-jsonl",
+        type=str,
+        default=None,
+        help="Append structured events (phases, posts, retries, 429s) to this JSON lines file.",
+    )
+    p.add_argument(
+        "--metrics-prom",
+        type=str,
+        default=None,
+        help="Keep Prometheus text-format metrics in this file (node_exporter textfile collector).",
+    )
+    p.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running.",
+    )
+    p.add_argument(
+        "--transcode",
+        choices=Transcoder.FORMATS,
+        default=None,
+        help="Recompress images before packing posts (originals are never modified). "
+        "png = lossless optimize (stdlib); webp/webp-lossless/jpeg need Pillow.",
+    )
+    p.add_argument(
+        "--quality",
+        type=int,
+        default=85,
+        help="Quality for --transcode webp/jpeg (default: 85).",
+    )
+    p.add_argument(
+        "--max-dim",
+        type=int,
+        default=None,
+        help="Downscale so the longest side is at most N pixels (needs Pillow).",
+    )
+    p.add_argument(
+        "--transcode-cache",
+        type=str,
+        default=str(Path.home() / ".cache" / "vrcSendDiscord" / "transcode"),
+        help="Directory for transcoded files (default: ~/.cache/vrcSendDiscord/transcode).",
+    )
+    p.add_argument(
+        "--transcode-workers",
+        type=int,
+        default=None,
+        help="Worker processes for --transcode and --dedup (default: CPU count).",
+    )
+    p.add_argument(
+        "--watch",
+        action="store_true",
+        help="Keep running and upload new images as they appear (inotify on Linux, "
+        "directory polling elsewhere). With --ledger, unsent images are sent first.",
+    )
+    p.add_argument(
+        "--watch-settle-sec",
+        type=float,
+        default=1.0,
+        help="Seconds a new file must stop changing before it is sent (default: 1.0).",
+    )
+    p.add_argument(
+        "--watch-batch-sec",
+        type=float,
+        default=1.0,
+        help="Seconds to collect ready files into one post (default: 1.0).",
+    )
+    p.add_argument(
+        "--watch-poll-sec",
+        type=float,
+        default=2.0,
+        help="Directory poll interval when inotify is unavailable (default: 2.0).",
+    )
+    p.add_argument(
+        "--watch-polling",
+        action="store_true",
+        help="Use directory polling even when inotify is available.",
+    )
+    p.add_argument(
+        "--ledger",
+        type=str,
+        default=None,
+        help="SQLite file recording already-sent images; only unsent images are posted.",
+    )
+    p.add_argument(
+        "--ledger-hash",
+        action="store_true",
+        help="Also match ledger entries by content hash (detects renamed/moved files).",
     )
 
     args = p.parse_args(argv)
 
     # Also allow env var for webhook
     if not args.webhook_url:
-        args.webhook_url = os.environ.get("DISCORD_WEBHOOK_URL")
+        env_url = os.environ.get("DISCORD_WEBHOOK_URL")
+        args.webhook_url = [env_url] if env_url else None
 
     return args
 
@@ -407,32 +2581,142 @@ def main(argv: List[str]) -> int:
     if args.since_days is not None:
         since = _now() - _dt.timedelta(days=int(args.since_days))
 
-    sender = vrcSendDiscord(screenshots_dir=screenshots_dir, webhook_url=args.webhook_url)
+    deduper = None
+    if args.dedup:
+        try:
+            deduper = PerceptualDeduper(
+                Path(args.dedup_index).expanduser(),
+                max_distance=args.dedup_distance,
+                workers=args.transcode_workers,
+            )
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    ledger = None
+    if args.ledger:
+        ledger = UploadLedger(Path(args.ledger).expanduser(), use_hash=args.ledger_hash)
+
+    metrics = None
+    if args.metrics_jsonl or args.metrics_prom or args.metrics_port is not None:
+        metrics = UploadMetrics(
+            jsonl_path=Path(args.metrics_jsonl).expanduser() if args.metrics_jsonl else None,
+            prom_path=Path(args.metrics_prom).expanduser() if args.metrics_prom else None,
+        )
+        if args.metrics_port is not None:
+            metrics.serve(args.metrics_port)
+
+    try:
+        return _run(args, screenshots_dir, since, ledger, metrics, deduper)
+    finally:
+        if ledger is not None:
+            ledger.close()
+        if deduper is not None:
+            deduper.close()
+        if metrics is not None:
+            metrics.close()
+
+
+def _run(
+    args: argparse.Namespace,
+    screenshots_dir: Path,
+    since: Optional[_dt.datetime],
+    ledger: Optional[UploadLedger],
+    metrics: Optional[UploadMetrics] = None,
+    deduper: Optional[PerceptualDeduper] = None,
+) -> int:
+    transcoder = None
+    if args.transcode:
+        try:
+            transcoder = Transcoder(
+                args.transcode,
+                cache_dir=Path(args.transcode_cache).expanduser(),
+                quality=args.quality,
+                max_dim=args.max_dim,
+                workers=args.transcode_workers,
+            )
+        except RuntimeError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+
+    sender = vrcSendDiscord(
+        screenshots_dir=screenshots_dir,
+        webhook_url=args.webhook_url,
+        ledger=ledger,
+        transcoder=transcoder,
+        journal=UploadJournal(Path(args.journal).expanduser()) if args.journal else None,
+        deduper=deduper,
+        metrics=metrics,
+    )
+    send_kwargs = dict(
+        message_prefix=args.message_prefix,
+        username=args.username,
+        sleep_sec=args.sleep_sec,
+        concurrency=args.concurrency,
+        max_retries=args.max_retries,
+        packing=args.packing,
+        pack_window=args.pack_window,
+    )
+
+    if args.watch and not args.dry_run:
+        # Without a ledger there is no way to tell what was already sent,
+        # so only files that appear from now on are uploaded.
+        if ledger is not None or sender.journal is not None:
+            backlog = []
+            if ledger is not None:
+                backlog = sender.collect_images(recursive=args.recursive, since=since)
+            try:
+                sender.send_batched(backlog, args.max_bytes, args.max_files, **send_kwargs)
+            except UploadFailed as e:
+                print(f"Warning: backlog incomplete, continuing to watch.\n{e}", file=sys.stderr)
+        sender.watch(
+            max_bytes=args.max_bytes,
+            max_files_per_post=args.max_files,
+            recursive=args.recursive,
+            settle_sec=args.watch_settle_sec,
+            batch_window_sec=args.watch_batch_sec,
+            poll_interval=args.watch_poll_sec,
+            force_polling=args.watch_polling,
+            **send_kwargs,
+        )
+        return 0
+
     images = sender.collect_images(recursive=args.recursive, since=since)
 
-    if not images:
-        print("No images matched.")
+    resume = sender.journal is not None and bool(sender.journal.pending_plans())
+    if not images and not resume:
+        print("No images matched." if ledger is None else "No unsent images matched.")
         return 0
 
-    chunks = chunk_files_by_size(images, max_bytes=args.max_bytes, max_files_per_post=args.max_files)
+    if args.dry_run:
+        images, _ = sender.prepare_images(images, estimate=True)
+    chunks = chunk_files_by_size(
+        images,
+        max_bytes=args.max_bytes,
+        max_files_per_post=args.max_files,
+        packing=args.packing,
+        window=args.pack_window,
+    )
     if args.dry_run:
         print(f"[DRY RUN] screenshots_dir={screenshots_dir}")
         print(f"[DRY RUN] matched {len(images)} image(s), will send {len(chunks)} post(s)")
         for i, ch in enumerate(chunks, start=1):
-            sz = sum((p.stat().st_size for p in ch if p.exists()), 0)
+            sz = sum(p.size for p in ch)
             print(f"[DRY RUN] Post {i}/{len(chunks)}: {len(ch)} file(s), ~{_human_bytes(sz)}")
             for p in ch:
                 print(f"  - {p.name}")
         return 0
 
-    sender.send_batched(
-        images=images,
-        max_bytes=args.max_bytes,
-        max_files_per_post=args.max_files,
-        message_prefix=args.message_prefix,
-        username=args.username,
-        sleep_sec=args.sleep_sec,
-    )
+    try:
+        sender.send_batched(
+            images=images,
+            max_bytes=args.max_bytes,
+            max_files_per_post=args.max_files,
+            **send_kwargs,
+        )
+    except UploadFailed as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
     return 0
 
 